@@ -1,176 +1,258 @@
-import requests
 from stats.champions import Champions
+from stats.checkpoint import Checkpoint
+from stats.ddragon import static_data
+from stats.download import download_all, session
+from stats.formatting import IMAGE, PERCENT, ROUND2, TIME, format_columns
+from stats.leagues import League, load_leagues, run_leagues
 from stats.players import Players
-from stats.roster import Roster
+from stats.profiler import stage, start
+from stats.roster import (
+    ROSTER_REFRESH_TIMEOUT,
+    Roster,
+    share_quota as share_riot_quota,
+)
+from stats.sheets import (
+    SHEETS_WORKERS,
+    TRANSIENT_RETRIES,
+    SheetWriter,
+    share_quota,
+)
+from stats.snapshot import read_frame
+from stats.store import PerformanceStore
+from stats.stream import Payload
+from stats.teamdirectory import TeamDirectory
 from stats.teams import Teams
 from stats.teampage import TeamPage
-import pygsheets
+import argparse
+import datetime
+import functools
 import json
 import os
-import pandas
+import pygsheets
 import threading
-import random
-
-
-def download_data(url, filename):
-    print(f"Downloading matches from {url} to {filename}")
-    matches = requests.get(url).json()
-    with open(filename, "w") as f:
-        json.dump(matches, f, indent=4)
-    return matches
-
-
-def get_data(url, filename):
-    if os.path.exists(filename):
-        print(f"Importing matches from {filename}")
-        with open(filename, "r", encoding="utf-8") as f:
-            return json.load(f)
-    else:
-        return download_data(url, filename)
-
-
-def get_property(team: str, property: str, teams: dict[str, any]):
-    if team == "":
-        return ""
-    return list(filter(lambda item: item["code"] == team, teams))[0][property]
-
-
-def percent(column):
-    return column.apply(lambda x: "{:.0%}".format(x) if x != "" else "")
-
-
-def time(x):
-    return f"{x.components.hours:02d}:{x.components.minutes:02d}:{x.components.seconds:02d}"
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+# Default location of the --profile report
+PROFILE_REPORT = "data/profile.json"
+
+
+CHAMPION_DISPLAY = [
+    ("Name", "Name", None),
+    ("Picks", "Picks", None),
+    ("Bans", "Bans", None),
+    ("Presence", "Presence", PERCENT),
+    ("Wins", "Wins", None),
+    ("Losses", "Losses", None),
+    ("Winrate", "Winrate", PERCENT),
+    ("KDA", "KDA", None),
+    ("AVG BT", "AVG BT", None),
+    ("GT", "GT", TIME),
+    ("CS/M", "CS/M", None),
+    ("DPM", "DPM", None),
+    ("GPM", "GPM", None),
+    ("CSD@8", "CSD@8", None),
+    ("GD@8", "GD@8", None),
+    ("XPD@8", "XPD@8", None),
+    ("CSD@14", "CSD@14", None),
+    ("GD@14", "GD@14", None),
+    ("XPD@14", "XPD@14", None),
+    ("Best Player", "BP Team", IMAGE),
+    ("BP", "Best Player", None),
+    ("BP Picks", "BP Picks", None),
+    ("BP Win%", "BP Win%", PERCENT),
+    ("BP KDA", "BP KDA", None),
+]
+
+TEAM_DISPLAY = [
+    ("Team", "logo", IMAGE),
+    ("Team Code", "team", None),
+    ("Team Name", "name", None),
+    ("Games", "n", None),
+    ("Win Rate", "win%", PERCENT),
+    ("Time", "gt", TIME),
+    ("Blue Wins", "bluewins", None),
+    ("Blue Win%", "bwin%", PERCENT),
+    ("Red Wins", "redwins", None),
+    ("Red Win%", "rwin%", PERCENT),
+    ("K/D", "kd", ROUND2),
+    ("Kills/g", "k/g", ROUND2),
+    ("Deaths/g", "d/g", ROUND2),
+    ("Assists/g", "a/g", ROUND2),
+    ("Kills@15", "k15/g", ROUND2),
+    ("Kills@25", "k25/g", ROUND2),
+    ("FB%", "fb%", PERCENT),
+    ("DMG/min", "dmg/m", ROUND2),
+    ("Gold/min", "g/m", ROUND2),
+    ("GD@14", "gd14/g", ROUND2),
+    ("CS/min", "cs/m", ROUND2),
+    ("CSD@14", "csd14/g", ROUND2),
+    ("XP/min", "xp/m", ROUND2),
+    ("XPD@14", "xpd14/g", ROUND2),
+    ("VS/min", "vs/m", ROUND2),
+    ("Ward/min", "w/m", ROUND2),
+    ("CW/min", "cw/m", ROUND2),
+    ("WC/min", "wc/m", ROUND2),
+    ("WC%", "wc%", PERCENT),
+    ("FT%", "ft%", PERCENT),
+    ("Tower/g", "t/g", ROUND2),
+    ("TG/g", "ot/g", ROUND2),
+    ("FD%", "fd%", PERCENT),
+    ("Drag%", "drag%", PERCENT),
+    ("Drag/g", "drag/g", ROUND2),
+    ("Rift%", "rift%", PERCENT),
+    ("Rift/g", "rift%", ROUND2),
+    ("Baron/g", "b/g", ROUND2),
+    ("Baron%", "baron%", PERCENT),
+]
 
 
 def update_champs(
-    champions: Champions, sheet: pygsheets.Spreadsheet, sheet_name: str, teams
+    champions: Champions,
+    sheet: pygsheets.Spreadsheet,
+    sheet_name: str,
+    teams: TeamDirectory,
 ):
-    df = champions.dataframe().fillna("")
-    df["Presence"] = df["Presence"].apply(
-        lambda x: "{:.0%}".format(x) if x != "" else ""
-    )
-    df["Winrate"] = df["Winrate"].apply(
-        lambda x: "{:.0%}".format(x) if x != "" else ""
-    )
-    df["BP Win%"] = df["BP Win%"].apply(
-        lambda x: "{:.0%}".format(x) if x != "" else ""
-    )
-    df["GT"] = df["GT"].apply(
-        lambda x: f"{x.components.hours:02d}:{x.components.minutes:02d}:{x.components.seconds:02d}"
-        if x != ""
-        else ""
-    )
-    df["BP Team"] = df["BP Team"].apply(
-        lambda x: f'=IMAGE("{get_property(x, "logo", teams)}")'
-    )
-    df.replace(float("inf"), "Perfect", inplace=True)
+    with stage("format"):
+        df = champions.dataframe().fillna("")
+        df["BP Team"] = teams.map_logos(df["BP Team"])
 
-    roster = Roster()
-    roster.load_data()
-    df["Best Player"] = df["Best Player"].apply(roster.get_name)
-    roster.dump_data()
+        roster = Roster()
+        roster.prefetch(df["Best Player"])
+        df["Best Player"] = df["Best Player"].apply(roster.get_name)
+        roster.dump_data()
 
-    df.rename(
-        columns={"BP Team": "Best Player", "Best Player": "BP"}, inplace=True
-    )
+        df = format_columns(df, CHAMPION_DISPLAY)
+        df.replace(float("inf"), "Perfect", inplace=True)
     print(df)
 
     wks = sheet.worksheet_by_title(sheet_name)
-    wks.set_dataframe(df, (1, 1))
+    writer = SheetWriter(sheet)
+    writer.set_dataframe(wks, df, (1, 1))
+    writer.flush()
 
 
 def update_teams(
-    teams: Teams, sheet: pygsheets.Spreadsheet, sheet_name: str, team_data
+    teams: Teams,
+    sheet: pygsheets.Spreadsheet,
+    sheet_name: str,
+    team_data: TeamDirectory,
 ):
-    df = teams.dataframe()
-    nf = pandas.DataFrame()
-
-    nf["Team"] = df["team"].apply(
-        lambda x: f'=IMAGE("{get_property(x, "logo", team_data)}")'
-    )
-    nf["Team Code"] = df["team"]
-    nf["Team Name"] = df["team"].apply(
-        lambda x: get_property(x, "name", team_data)
-    )
-    nf["Games"] = df["n"]
-    nf["Win Rate"] = percent(df["win%"])
-    nf["Time"] = df["gt"].apply(time)
-    nf["Blue Wins"] = df["bluewins"]
-    nf["Blue Win%"] = percent(df["bwin%"])
-    nf["Red Wins"] = df["redwins"]
-    nf["Red Win%"] = percent(df["rwin%"])
-    nf["K/D"] = df["kd"].apply(lambda x: round(x, 2))
-    nf["Kills/g"] = df["k/g"].apply(lambda x: round(x, 2))
-    nf["Deaths/g"] = df["d/g"].apply(lambda x: round(x, 2))
-    nf["Assists/g"] = df["a/g"].apply(lambda x: round(x, 2))
-    nf["Kills@15"] = df["k15/g"].apply(lambda x: round(x, 2))
-    nf["Kills@25"] = df["k25/g"].apply(lambda x: round(x, 2))
-    nf["FB%"] = percent(df["fb%"])
-    nf["DMG/min"] = df["dmg/m"].apply(lambda x: round(x, 2))
-    nf["Gold/min"] = df["g/m"].apply(lambda x: round(x, 2))
-    nf["GD@14"] = df["gd14/g"].apply(lambda x: round(x, 2))
-    nf["CS/min"] = df["cs/m"].apply(lambda x: round(x, 2))
-    nf["CSD@14"] = df["csd14/g"].apply(lambda x: round(x, 2))
-    nf["XP/min"] = df["xp/m"].apply(lambda x: round(x, 2))
-    nf["XPD@14"] = df["xpd14/g"].apply(lambda x: round(x, 2))
-    nf["VS/min"] = df["vs/m"].apply(lambda x: round(x, 2))
-    nf["Ward/min"] = df["w/m"].apply(lambda x: round(x, 2))
-    nf["CW/min"] = df["cw/m"].apply(lambda x: round(x, 2))
-    nf["WC/min"] = df["wc/m"].apply(lambda x: round(x, 2))
-    nf["WC%"] = percent(df["wc%"])
-    nf["FT%"] = percent(df["ft%"])
-    nf["Tower/g"] = df["t/g"].apply(lambda x: round(x, 2))
-    nf["TG/g"] = df["ot/g"].apply(lambda x: round(x, 2))
-    nf["FD%"] = percent(df["fd%"])
-    nf["Drag%"] = percent(df["drag%"])
-    nf["Drag/g"] = df["drag/g"].apply(lambda x: round(x, 2))
-    nf["Rift%"] = percent(df["rift%"])
-    nf["Rift/g"] = df["rift%"].apply(lambda x: round(x, 2))
-    nf["Baron/g"] = df["b/g"].apply(lambda x: round(x, 2))
-    nf["Baron%"] = percent(df["baron%"])
-
-    nf = nf.sort_values(
-        ["Win Rate", "Time"],
-        ascending=[False, True],
-        ignore_index=True,
-    )
+    with stage("format"):
+        df = teams.dataframe()
+        df["logo"] = team_data.map_logos(df["team"])
+        df["name"] = team_data.map_names(df["team"])
+
+        nf = format_columns(df, TEAM_DISPLAY)
+        nf = nf.sort_values(
+            ["Win Rate", "Time", "Team Code"],
+            ascending=[False, True, True],
+            ignore_index=True,
+        )
     wks = sheet.worksheet_by_title(sheet_name)
-    wks.set_dataframe(nf, (1, 1))
+    writer = SheetWriter(sheet)
+    writer.set_dataframe(wks, nf, (1, 1))
+    writer.flush()
 
 
 def update_players(
     players: Players, sheet: pygsheets.Spreadsheet, sheet_name: str, team_data
 ):
-    df = players.dataframe()
+    with stage("format"):
+        df = players.dataframe()
 
     wks = sheet.worksheet_by_title(sheet_name)
-    wks.set_dataframe(df, (1, 1))
+    writer = SheetWriter(sheet)
+    writer.set_dataframe(wks, df, (1, 1))
+    writer.flush()
 
 
 def update_teampages(
-    teampage: TeamPage, players: Players, sheet: pygsheets.Spreadsheet
+    teampage: TeamPage,
+    players: Players,
+    sheet: pygsheets.Spreadsheet,
+    workers: int = SHEETS_WORKERS,
+    pages_per_request: int = None,
 ):
-    # threads = []
-    codes = teampage.team_codes()
-    for team_code in codes:
+    """Renders every team page in parallel and writes them through one
+    shared SheetWriter, so the Sheets quota is the only limit.
+
+    Args:
+        teampage (TeamPage): League team page data
+        players (Players): League player stats
+        sheet (pygsheets.Spreadsheet): League spreadsheet
+        workers (int, optional): Pages rendered at once. Defaults to
+            SHEETS_WORKERS.
+        pages_per_request (int, optional): Flush after this many pages
+            instead of once at the end. Defaults to None.
+    """
+    writer = SheetWriter(sheet)
+    with stage("prepare"):
+        teampage.prepare()
+        players.dataframe()
+        # pygsheets' client is not thread-safe, so workers only buffer values
+        worksheets = team_worksheets(teampage, sheet, writer)
+    codes = list(worksheets)
+    lock = threading.Lock()
+    done = []
+
+    def render(team_code):
         print(f"Updating team page for {team_code}")
-        update_teampage(teampage, players, sheet, team_code)
-    #     threads.append(
-    #         threading.Thread(
-    #             target=update_teampage,
-    #             args=(
-    #                 teampage,
-    #                 players,
-    #                 sheet,
-    #                 team_code,
-    #             ),
-    #         )
-    #     )
-    # for t in threads:
-    #     t.start()
-    # for t in threads:
-    #     t.join()
+        with stage("teampage", team=team_code):
+            update_teampage(
+                teampage,
+                players,
+                sheet,
+                team_code,
+                writer,
+                worksheets[team_code],
+            )
+        with lock:
+            done.append(team_code)
+            flush = (
+                pages_per_request is not None
+                and len(done) % pages_per_request == 0
+            )
+        if flush:
+            writer.flush()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(render, codes))
+    writer.flush()
+
+
+def team_worksheets(
+    teampage: TeamPage, sheet: pygsheets.Spreadsheet, writer: SheetWriter
+) -> dict[str, pygsheets.Worksheet]:
+    """Looks up the worksheet of every team page.
+
+    Titles missing from the spreadsheet's cached sheet list are fetched
+    again through the writer's rate limiter.
+
+    Args:
+        teampage (TeamPage): League team page data
+        sheet (pygsheets.Spreadsheet): League spreadsheet
+        writer (SheetWriter): Writer whose limiter the lookups wait for
+
+    Returns:
+        dict[str, pygsheets.Worksheet]: Worksheet by team code, leaving out
+            teams without a page
+    """
+    cached = {wks.title: wks for wks in sheet.worksheets()}
+    worksheets = {}
+    for code in teampage.team_codes():
+        team_name = teampage.team_name(code)
+        wks = cached.get(team_name)
+        if wks is None:
+            try:
+                wks = writer.execute(
+                    functools.partial(sheet.worksheets, "title", team_name)
+                )[0]
+            except pygsheets.exceptions.WorksheetNotFound:
+                print(f"No template page found for {team_name}")
+                continue
+        worksheets[code] = wks
+    return worksheets
 
 
 def update_teampage(
@@ -178,34 +260,47 @@ def update_teampage(
     players: Players,
     sheet: pygsheets.Spreadsheet,
     code: str,
+    writer: SheetWriter = None,
+    wks: pygsheets.Worksheet = None,
 ):
 
     team_name = teampage.team_name(code)
-    wks = None
 
-    try:
-        wks = sheet.worksheet_by_title(team_name)
-    except pygsheets.exceptions.WorksheetNotFound:
-        print(f"No template page found for {team_name}")
-        return
+    if wks is None:
+        try:
+            wks = sheet.worksheet_by_title(team_name)
+        except pygsheets.exceptions.WorksheetNotFound:
+            print(f"No template page found for {team_name}")
+            return
 
-    wks.cell((2, 7)).value = code
-    wks.cell((1, 1)).value = teampage.logo(code)
+    # Without a shared writer the page is sent as soon as it is complete
+    own_writer = writer is None
+    if own_writer:
+        writer = SheetWriter(sheet)
+
+    writer.set_value(wks, (2, 7), code)
+    writer.set_value(wks, (1, 1), teampage.logo(code))
     print(f"Adding match history for {team_name}")
-    match_history(code, teampage, wks, 21, 1)
+    match_history(code, teampage, wks, 21, 1, writer)
     print(f"Adding bans for {team_name}")
-    wks.set_dataframe(
-        teampage.banned_by(code).head(15),
+    writer.set_dataframe(
+        wks,
+        teampage.banned_by(code, 15),
         (2, 10),
         copy_head=False,
     )
-    wks.set_dataframe(
-        teampage.banned_against(code).head(15), (2, 13), copy_head=False
+    writer.set_dataframe(
+        wks, teampage.banned_against(code, 15), (2, 13), copy_head=False
     )
     print(f"Adding player list for {team_name}")
-    wks.set_dataframe(
-        teampage.playerlist(code, players).head(15), (2, 17), copy_head=False
+    writer.set_dataframe(
+        wks,
+        teampage.playerlist(code, players).head(15),
+        (2, 17),
+        copy_head=False,
     )
+    if own_writer:
+        writer.flush()
     print(f"Added {team_name}")
 
     #     for column in range(0, 15):
@@ -215,38 +310,20 @@ def update_teampage(
     # wks.update_cells(win_cells, "userEnteredFormat/textFormat/bold")
 
 
-def banned_by(
-    code: str,
-    teampage: TeamPage,
-    wks: pygsheets.Worksheet,
-    base_row: int,
-    base_column: int,
-):
-    df = teampage.banned_by(code).head(15)
-    wks.set_dataframe(df, (base_row, base_column), copy_head=False)
-
-
-def banned_against(
-    code: str,
-    teampage: TeamPage,
-    wks: pygsheets.Worksheet,
-    base_row: int,
-    base_column: int,
-):
-    df = teampage.banned_against(code).head(15)
-    wks.set_dataframe(df, (base_row, base_column), copy_head=False)
-
-
 def match_history(
     code: str,
     teampage: TeamPage,
     wks: pygsheets.Worksheet,
     base_row: int,
     base_column: int,
+    writer: SheetWriter = None,
 ):
     df = teampage.short_history(code)
 
-    wks.set_dataframe(df, (base_row, base_column), copy_head=False)
+    if writer is not None:
+        writer.set_dataframe(wks, df, (base_row, base_column), copy_head=False)
+    else:
+        wks.set_dataframe(df, (base_row, base_column), copy_head=False)
 
     # for row in df.index:
     #     result = df.loc[row, "result"]
@@ -254,59 +331,172 @@ def match_history(
     #     cell.color = (0, 1, 0, 0.3) if result == "Win" else (1, 0, 0, 0.4)
 
 
-def main():
-    plat_performances = download_data(
-        "http://api.brycenaddison.com/performances/plat",
-        "data/platperformances.json",
-    )
-    plat_teamperformances = download_data(
-        "http://api.brycenaddison.com/teamperformances/plat",
-        "data/platteamperformances.json",
-    )
-    dia_performances = download_data(
-        "http://api.brycenaddison.com/performances/fri",
-        "data/diaperformances.json",
+def run_league(league: League, processes: int = 1) -> list[str]:
+    """Downloads, aggregates and publishes one league.
+
+    Args:
+        league (League): League from the registry
+        processes (int, optional): Leagues running at the same time, which
+            share the Sheets quota. Defaults to 1.
+
+    Returns:
+        list[str]: Outputs that were refreshed
+    """
+    share_quota(processes)
+    share_riot_quota(processes)
+    with stage("download"):
+        data = download_all({league.teams: league.endpoints()[league.teams]})
+        teamdata = TeamDirectory(data[league.teams])
+    if len(league.outputs) == 0:
+        print("No outputs enabled")
+        return []
+
+    with stage("auth"):
+        # Quota errors are retried by SheetWriter, not pygsheets' fixed sleep
+        gc = pygsheets.authorize(
+            service_file="client_secret.json",
+            retries=TRANSIENT_RETRIES,
+            check=False,
+        )
+        sheet = gc.open_by_key(league.sheet)
+
+    with stage("aggregate"), session() as s:
+        # Matches are streamed in batches, so the aggregate outputs never
+        # hold a whole payload in memory
+        endpoints = league.endpoints()
+        players = Players(None, teamdata)
+        teams = Teams()
+        champions = Champions()
+        Checkpoint(league.name).apply(
+            Payload(endpoints[league.performances], league.performances, s),
+            Payload(
+                endpoints[league.teamperformances], league.teamperformances, s
+            ),
+            players,
+            teams,
+            champions,
+        )
+
+    if "teampages" in league.outputs:
+        with stage("teampages"):
+            # Team pages look up single matches, so they need the full frames
+            store = PerformanceStore.from_frames(
+                read_frame(league.performances),
+                read_frame(league.teamperformances),
+            )
+            teampage = TeamPage(store, teams=teamdata)
+            update_teampages(teampage, players, sheet)
+    if "players" in league.outputs:
+        with stage("players"):
+            update_players(players, sheet, "Players", teamdata)
+    if "champions" in league.outputs:
+        with stage("champions"):
+            update_champs(champions, sheet, "Champions", teamdata)
+    if "teams" in league.outputs:
+        with stage("teams"):
+            update_teams(teams, sheet, "Teams", teamdata)
+    return league.outputs
+
+
+def profile_league(
+    league: League,
+    processes: int = 1,
+    capture: str = None,
+    memory: bool = False,
+) -> dict[str, Any]:
+    """Runs run_league with stage timing on.
+
+    Args:
+        league (League): League from the registry
+        processes (int, optional): Leagues running at the same time.
+            Defaults to 1.
+        capture (str, optional): Stage to run under cProfile. Defaults to
+            None.
+        memory (bool, optional): Trace allocations of the captured stage.
+            Defaults to False.
+
+    Returns:
+        dict[str, Any]: Refreshed outputs and the league's timing report
+    """
+    profiler = start(league.name, capture, memory)
+    outputs = run_league(league, processes)
+    return {"outputs": outputs} | profiler.report()
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(
+        prog="python -m stats",
+        description="Refresh the stats spreadsheets of every league.",
     )
-    dia_teamperformances = download_data(
-        "http://api.brycenaddison.com/teamperformances/fri",
-        "data/diateamperformances.json",
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=PROFILE_REPORT,
+        metavar="REPORT",
+        help="time every stage per league and team and write a json "
+        f"report (default {PROFILE_REPORT})",
     )
-    plat_teamdata = download_data(
-        "http://api.brycenaddison.com/teams/plat", "data/plat_teams.json"
+    parser.add_argument(
+        "--capture",
+        metavar="STAGE",
+        help="run the first occurrence of a stage under cProfile, e.g. "
+        "aggregate or teampage",
     )
-    dia_teamdata = download_data(
-        "http://api.brycenaddison.com/teams/fri", "data/dia_teams.json"
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="trace allocations of the captured stage with tracemalloc",
     )
-
-    gc = pygsheets.authorize(
-        service_file="client_secret.json", retries=1000, seconds_per_quota=10
-    )
-    plat_sheet = gc.open_by_key("17bzMtkinBMWADMarb0gM1BBSGt_O4GPhQR7ANAOh-4g")
-    dia_sheet = gc.open_by_key("1gdjQQycmcA25PraEaTn16O1tpL20I9edYN_Y_o67nMA")
-
-    plat_players = Players(plat_performances, plat_teamdata)
-    plat_champs = Champions(plat_performances, plat_teamperformances)
-    plat_teams = Teams(plat_teamperformances)
-    plat_page = TeamPage(
-        plat_performances, plat_teamperformances, plat_teamdata
+    parser.add_argument(
+        "--full-write",
+        action="store_true",
+        help="write every sheet in full instead of only the changed cells, "
+        "overwriting values edited by hand",
     )
-
-    dia_players = Players(dia_performances, dia_teamdata)
-    dia_champs = Champions(dia_performances, dia_teamperformances)
-    dia_teams = Teams(dia_teamperformances)
-    dia_page = TeamPage(dia_performances, dia_teamperformances, dia_teamdata)
-
-    # update_teampages(plat_page, plat_players, plat_sheet)
-    update_teampages(dia_page, dia_players, dia_sheet)
-
-    # update_players(plat_players, plat_sheet, "Players", plat_teamdata)
-    # update_players(dia_players, dia_sheet, "Players", dia_teamdata)
-
-    # update_champs(plat_champs, plat_sheet, "Champions", plat_teamdata)
-    # update_champs(dia_champs, dia_sheet, "Champions", dia_teamdata)
-
-    # update_teams(plat_teams, plat_sheet, "Teams", plat_teamdata)
-    # update_teams(dia_teams, dia_sheet, "Teams", dia_teamdata)
+    args = parser.parse_args(argv)
+    if args.profile is None and (args.capture or args.memory):
+        parser.error("--capture and --memory need --profile")
+
+    if args.full_write:
+        # Read by every SheetWriter, including those of the league processes
+        os.environ["SHEETS_FULL_WRITE"] = "1"
+
+    leagues, processes = load_leagues()
+    target = run_league
+    if args.profile is not None:
+        profiler = start("main", args.capture, args.memory)
+        target = functools.partial(
+            profile_league, capture=args.capture, memory=args.memory
+        )
+
+    # Fetched once here so the league processes find it cached
+    with stage("static"):
+        static_data()
+
+    results = run_leagues(leagues, target, processes)
+
+    # Only once the league processes are done, so it has the whole key
+    with stage("refresh"):
+        refresh = Roster().refresh_stale()
+        refresh.join(ROSTER_REFRESH_TIMEOUT)
+        if refresh.is_alive():
+            print("Leaving the remaining stale names for the next run")
+
+    if args.profile is not None:
+        report = {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "main": profiler.report(),
+            "leagues": results,
+            "failed": [
+                league.name for league in leagues if league.name not in results
+            ],
+        }
+        print(f"Writing profile report to {args.profile}")
+        with open(args.profile, "w") as f:
+            json.dump(report, f, indent=4)
+
+    if len(results) < len(leagues):
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
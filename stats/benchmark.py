@@ -0,0 +1,214 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import stats.ddragon as ddragon
+from stats.champions import Champions
+from stats.ddragon import StaticData
+from stats.players import Players
+from stats.rosterstore import default_store
+from stats.store import PerformanceStore
+from stats.synthetic import SyntheticLeague
+from stats.teampage import TeamPage
+from stats.teams import Teams
+from typing import Any, Callable, Optional
+
+# Slowdown over the baseline reported as a regression
+TOLERANCE = 0.25
+
+
+@contextlib.contextmanager
+def offline(league: SyntheticLeague):
+    """Runs in a scratch directory whose data/ caches already hold Data
+    Dragon's champion list and a summoner name for every puuid of league,
+    so that nothing calls Data Dragon or Riot.
+
+    Args:
+        league (SyntheticLeague): League to provide static data for
+    """
+    cwd = os.getcwd()
+    shared = ddragon._static_data
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            os.makedirs("data")
+            with open(f"data/ddragon-{ddragon.VERSION}.json", "w") as f:
+                json.dump(league.champion_data(), f)
+            ddragon._static_data = StaticData(offline=True, directory="data")
+
+            store = default_store()
+            for puuid, name in league.names().items():
+                store.put(puuid, {"summonerName": name, "puuids": [puuid]})
+            store.flush()
+            yield
+        finally:
+            ddragon._static_data = shared
+            os.chdir(cwd)
+
+
+def measure(target: Callable[[], Any], repeat: int) -> tuple[list[float], Any]:
+    """Times target, silencing its progress messages.
+
+    Args:
+        target (Callable[[], Any]): Code to time
+        repeat (int): Number of runs
+
+    Returns:
+        tuple[list[float], Any]: Seconds taken by each run, and the result
+            of the last run
+    """
+    times = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = target()
+            times.append(time.perf_counter() - start)
+    return times, result
+
+
+def run(league: SyntheticLeague, repeat: int = 3) -> dict[str, list[float]]:
+    """Times building and rendering every table from a league.
+
+    Args:
+        league (SyntheticLeague): League to process
+        repeat (int, optional): Runs per case. Defaults to 3.
+
+    Returns:
+        dict[str, list[float]]: Seconds of every run, by case
+    """
+    results = {}
+
+    def case(name: str, target: Callable[[], Any]) -> Any:
+        print(f"Timing {name}...")
+        results[name], result = measure(target, repeat)
+        return result
+
+    perfs, tperfs = league.performances, league.teamperformances
+    store = case(
+        "store.from_frames",
+        lambda: PerformanceStore.from_frames(perfs, tperfs),
+    )
+    players = case("players.add", lambda: Players(store, league.teams))
+    case("players.dataframe", players.build_dataframe)
+    teams = case("teams.add", lambda: Teams(store))
+    case("teams.dataframe", teams.build_dataframe)
+    champions = case("champions.add", lambda: Champions(store))
+    case("champions.dataframe", champions.build_dataframe)
+
+    page = case("teampage.init", lambda: TeamPage(store, teams=league.teams))
+    codes = page.team_codes()
+    case(
+        "teampage.short_history",
+        lambda: [page.short_history(code) for code in codes],
+    )
+    case("teampage.banned_by", lambda: [page.banned_by(c) for c in codes])
+    case(
+        "teampage.playerlist",
+        lambda: [page.playerlist(code, players) for code in codes],
+    )
+    return results
+
+
+def report(
+    results: dict[str, list[float]],
+    baseline: Optional[dict[str, float]] = None,
+    tolerance: float = TOLERANCE,
+) -> list[str]:
+    """Prints the best and median time of every case.
+
+    Args:
+        results (dict[str, list[float]]): Times from run
+        baseline (dict[str, float], optional): Best times of a previous
+            run to compare with. Defaults to None.
+        tolerance (float, optional): Slowdown over the baseline reported as
+            a regression. Defaults to TOLERANCE.
+
+    Returns:
+        list[str]: Cases slower than the baseline allows
+    """
+    regressions = []
+    print(f"{'case':<24}{'best ms':>10}{'median ms':>11}{'vs base':>9}")
+    for name, times in results.items():
+        best = min(times)
+        line = (
+            f"{name:<24}{best * 1000:>10.1f}"
+            f"{statistics.median(times) * 1000:>11.1f}"
+        )
+        if baseline is not None and baseline.get(name):
+            ratio = best / baseline[name]
+            line += f"{ratio:>8.2f}x"
+            if ratio > 1 + tolerance:
+                line += "  slower"
+                regressions.append(name)
+        print(line)
+    return regressions
+
+
+def main(argv: list[str] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m stats.benchmark",
+        description="Time every aggregator and team page table on a "
+        "generated league, without network access.",
+    )
+    size = parser.add_mutually_exclusive_group()
+    size.add_argument("--weeks", type=int, default=1, help="league length")
+    size.add_argument(
+        "--rows", type=int, help="player performances, instead of --weeks"
+    )
+    parser.add_argument("--teams", type=int, default=10)
+    parser.add_argument("--games", type=int, default=2, help="per series")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", help="write best times to a json file")
+    parser.add_argument(
+        "--compare", help="json file from --save to check for regressions"
+    )
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    print("Generating league...")
+    options = {"teams": args.teams, "games": args.games, "seed": args.seed}
+    if args.rows is not None:
+        league = SyntheticLeague.for_rows(args.rows, **options)
+    else:
+        league = SyntheticLeague(weeks=args.weeks, **options)
+    print(
+        f"{len(league.performances)} performances, "
+        f"{len(league.teamperformances)} team performances"
+    )
+
+    with offline(league):
+        results = run(league, args.repeat)
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["best"]
+    regressions = report(results, baseline, args.tolerance)
+
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump(
+                {
+                    "league": options
+                    | {"performances": len(league.performances)},
+                    "best": {
+                        name: min(times) for name, times in results.items()
+                    },
+                },
+                f,
+                indent=4,
+            )
+    if len(regressions) > 0:
+        print(f"Slower than baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
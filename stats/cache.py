@@ -0,0 +1,40 @@
+import pandas
+from typing import Callable
+
+
+class FrameCache:
+    """Memoizes a derived DataFrame until the underlying data changes.
+
+    Aggregators call invalidate() whenever they ingest data, which bumps the
+    data version. get() only rebuilds the frame when the version it was
+    built from is stale.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.frame = None
+        self.frame_version = None
+        self.hits = 0
+        self.misses = 0
+
+    def invalidate(self) -> None:
+        """Marks the cached frame as stale."""
+        self.version += 1
+
+    def get(self, build: Callable[[], pandas.DataFrame]) -> pandas.DataFrame:
+        """Returns the cached frame, rebuilding it if the data changed.
+
+        Args:
+            build (Callable[[], pandas.DataFrame]): Builds the frame on a miss
+
+        Returns:
+            pandas.DataFrame: Copy of the cached frame, safe to modify
+        """
+        if self.frame is not None and self.frame_version == self.version:
+            self.hits += 1
+            print(f"Using cached dataframe ({self.hits} hits).")
+        else:
+            self.misses += 1
+            self.frame = build()
+            self.frame_version = self.version
+        return self.frame.copy()
@@ -1,12 +1,44 @@
-import requests
 import json
-import statistics
 import datetime
+import numpy
 import pandas
+from stats.cache import FrameCache
+from stats.counters import CounterTable, native_columns
+from stats.ddragon import static_data
+from stats.formatting import exact_round
 from typing import Any, Union, Optional
+from stats.store import PerformanceStore
+
+# Counters of every player on every champion, for the best player columns
+PLAYER_COUNTERS = ["wins", "losses", "kills", "deaths", "assists"]
+
+
+def mean(total: int, count: int) -> Union[int, float]:
+    """Averages count integers summing to total like statistics.mean,
+    which keeps a whole mean as an int.
+
+    Args:
+        total (int): Sum of the values
+        count (int): Number of values, not 0
+
+    Returns:
+        Union[int, float]: The mean
+    """
+    return total // count if total % count == 0 else total / count
 
 
 class Champions:
+    # Raw counters saved by stats.checkpoint, everything else is derived
+    CHECKPOINT = [
+        "n",
+        "champions",
+        "matchids",
+        "picked",
+        "banned",
+        "players",
+        "duplicates",
+    ]
+
     def __init__(
         self, performances: dict = None, team_performances: dict = None
     ):
@@ -14,44 +46,261 @@ class Champions:
         dict[matchId, MatchDTO] from Riot Games match-v5 API
 
         Args:
-            data (dict, optional): _description_. Defaults to None.
+            performances (dict, optional): Performances, or a
+                PerformanceStore holding both tables. Defaults to None.
+            team_performances (dict, optional): Team performances. Defaults
+                to None.
         """
 
         self.n = 0
         self.champions = {}
-        self.matchids = []
-        self.names = {
-            int(v["key"]): v["name"]
-            for (k, v) in requests.get(
-                "http://ddragon.leagueoflegends.com/cdn/12.13.1/data/en_US/champion.json"
+        self.cache = FrameCache()
+        self.matchids = set()
+        # Matches whose picks and bans were counted, to drop repeats
+        self.picked = set()
+        self.banned = set()
+        # Games, wins and kda of every player on every champion
+        self.players = CounterTable(
+            ["championId", "puuid", "team"], PLAYER_COUNTERS
+        )
+        self.player_positions = self.players.positions(PLAYER_COUNTERS)
+        self.duplicates = 0
+        self.names = static_data().names
+        if isinstance(performances, PerformanceStore):
+            self.add_frame(performances.performances)
+            self.add_team_frame(
+                performances.teamperformances, performances.bans
             )
-            .json()["data"]
-            .items()
-        }
-        if performances is not None and team_performances is not None:
+        elif performances is not None and team_performances is not None:
             self.add_performances(performances)
             self.add_team_performances(team_performances)
 
-    def add_performances(self, performances: dict[str, Any]):
+    def add_performances(self, performances: list[dict[str, Any]]):
+        """Counts the picks of a batch of performances.
+
+        A batch must hold every performance of its matches. Repeated
+        (matchId, puuid) rows, and rows of matches counted by an earlier
+        batch, are dropped as duplicates.
+
+        Args:
+            performances (list[dict[str, Any]]): Player performances
+        """
         print("Extracting picks from performances...")
+        seen = set()
+        dropped = 0
         for performance in performances:
+            key = (performance["matchId"], performance["puuid"])
+            if key in seen or key[0] in self.picked:
+                dropped += 1
+                continue
+            seen.add(key)
             self.add_pick(performance)
+        self.picked.update(matchId for matchId, _ in seen)
+        self.report_duplicates(dropped, "performances")
         print("Picks extracted.")
 
-    def add_team_performances(self, team_performances: dict[str, Any]):
+    def add_team_performances(self, team_performances: list[dict[str, Any]]):
+        """Counts the bans of a batch of team performances.
+
+        A batch must hold every team performance of its matches. Repeated
+        (matchId, team) rows, and rows of matches counted by an earlier
+        batch, are dropped as duplicates.
+
+        Args:
+            team_performances (list[dict[str, Any]]): Team performances
+        """
         print("Extracting bans from team performances...")
+        seen = set()
+        dropped = 0
         for team_performance in team_performances:
-            if team_performance["matchId"] not in self.matchids:
-                self.n += 1
-                self.matchids.append(team_performance["matchId"])
+            key = (team_performance["matchId"], team_performance["team"])
+            if key in seen or key[0] in self.banned:
+                dropped += 1
+                continue
+            seen.add(key)
+            self.add_match(team_performance["matchId"])
             for ban in team_performance["bans"]:
                 self.add_ban(
                     ban["championId"],
                     ban["pickTurn"],
                     team_performance["blueside"],
                 )
+        self.banned.update(matchId for matchId, _ in seen)
+        self.report_duplicates(dropped, "team performances")
         print("Bans extracted.")
 
+    def add_frame(self, performances: pandas.DataFrame) -> None:
+        """Counts the picks of a batch of performances with one grouped sum
+        per champion and per (champion, player).
+
+        Produces the same counters as add_performances on the same rows.
+
+        Args:
+            performances (pandas.DataFrame): Player performances, holding
+                every performance of their matches
+        """
+        if len(performances) == 0:
+            return
+        self.cache.invalidate()
+        matchIds = performances["matchId"].astype(object)
+        keep = ~matchIds.isin(self.picked) & ~performances.duplicated(
+            ["matchId", "puuid"]
+        )
+        self.report_duplicates(int((~keep).sum()), "performances")
+        frame = performances[keep]
+        for matchId in matchIds[keep].unique():
+            self.add_match(matchId)
+        self.picked.update(matchIds[keep].unique())
+
+        championIds = frame["champid"].astype("int64")
+        win = frame["win"].astype(bool)
+        blue = frame["blueside"].astype(bool)
+        picks = pandas.DataFrame(
+            {
+                "championId": championIds,
+                "win": win,
+                "loss": ~win,
+                "blue": blue,
+                "red": ~blue,
+                "kills": frame["kills"],
+                "deaths": frame["deaths"],
+                "assists": frame["assists"],
+                "cs": frame["cs"],
+                "timePlayed": frame["time"],
+                "damage": frame["dmg"],
+                "gold": frame["gold"],
+            }
+        )
+        # Missing lane differences count as 0, like add_pick
+        for diff in ["csd8", "xpd8", "gd8", "csd14", "xpd14", "gd14"]:
+            picks[diff] = frame[diff].fillna(0)
+        totals = picks.groupby("championId", sort=False).sum()
+        for championId, row in zip(
+            totals.index.tolist(), zip(*native_columns(totals))
+        ):
+            self.verify_champion(championId)
+            pick_stats = self.champions[championId]["picks"]
+            for counter, value in zip(totals.columns, row):
+                pick_stats[counter] += value
+
+        games = pandas.DataFrame(
+            {
+                "championId": championIds,
+                "puuid": frame["puuid"].astype(object),
+                "team": frame["team"].astype(object),
+                "wins": win,
+                "losses": ~win,
+                "kills": frame["kills"],
+                "deaths": frame["deaths"],
+                "assists": frame["assists"],
+            }
+        )
+        players = games.groupby(["championId", "puuid"], sort=False).agg(
+            team=("team", "first"),
+            **{counter: (counter, "sum") for counter in PLAYER_COUNTERS},
+        )
+        self.players.add_rows(
+            [
+                self.players.row(key, (*key, team))
+                for key, team in zip(players.index, players["team"])
+            ],
+            self.player_positions,
+            players[PLAYER_COUNTERS].to_numpy(dtype="float64"),
+        )
+
+    def add_team_frame(
+        self, team_performances: pandas.DataFrame, bans: pandas.DataFrame
+    ) -> None:
+        """Counts the bans of a batch of team performances with one grouped
+        sum per champion.
+
+        Produces the same counters as add_team_performances on the same
+        rows.
+
+        Args:
+            team_performances (pandas.DataFrame): Team performances,
+                holding every team performance of their matches
+            bans (pandas.DataFrame): Their flattened bans, as in
+                PerformanceStore.bans
+        """
+        if len(team_performances) == 0:
+            return
+        self.cache.invalidate()
+        matchIds = team_performances["matchId"].astype(object)
+        keep = ~matchIds.isin(self.banned) & ~team_performances.duplicated(
+            ["matchId", "team"]
+        )
+        self.report_duplicates(int((~keep).sum()), "team performances")
+        for matchId in matchIds[keep].unique():
+            self.add_match(matchId)
+
+        # A repeated team performance repeats its bans too
+        bans = bans[
+            ~bans["matchId"].astype(object).isin(self.banned)
+            & ~bans.duplicated(["matchId", "team", "pickTurn"])
+        ]
+        self.banned.update(matchIds[keep].unique())
+        if len(bans) == 0:
+            return
+
+        blue = bans["blueside"].astype(bool)
+        totals = (
+            pandas.DataFrame(
+                {
+                    "championId": bans["championId"].astype("int64"),
+                    "blue": blue,
+                    "red": ~blue,
+                    "turns": bans["pickTurn"],
+                }
+            )
+            .groupby("championId", sort=False)
+            .sum()
+        )
+        for championId, row in zip(
+            totals.index.tolist(), zip(*native_columns(totals))
+        ):
+            self.verify_champion(championId)
+            ban_stats = self.champions[championId]["bans"]
+            for counter, value in zip(totals.columns, row):
+                ban_stats[counter] += value
+
+    def subtract(self, other: "Champions") -> None:
+        """Takes away the picks and bans of matches counted by other, e.g.
+        the old rows of a corrected match, so they can be counted again.
+
+        Args:
+            other (Champions): Stats of matches counted here before
+        """
+        self.cache.invalidate()
+        self.n -= other.n
+        self.matchids -= other.matchids
+        self.picked -= other.picked
+        self.banned -= other.banned
+        for championId, champion in other.champions.items():
+            mine = self.champions[championId]
+            for kind in ["picks", "bans"]:
+                for counter, value in champion[kind].items():
+                    mine[kind][counter] -= value
+            picks, bans = mine["picks"], mine["bans"]
+            if picks["win"] + picks["loss"] + bans["blue"] + bans["red"] == 0:
+                del self.champions[championId]
+        self.players.subtract(other.players)
+
+    def report_duplicates(self, dropped: int, kind: str) -> None:
+        if dropped > 0:
+            self.duplicates += dropped
+            print(f"Dropped {dropped} duplicate {kind}.")
+
+    def add_match(self, matchId: str) -> None:
+        """Counts a match towards presence if it has not been seen yet.
+
+        Args:
+            matchId (str): matchId from Riot
+        """
+        if matchId not in self.matchids:
+            self.n += 1
+            self.matchids.add(matchId)
+
     def verify_champion(self, championId: int) -> bool:
         """If champion is not in database, creates a new entry.
 
@@ -65,7 +314,7 @@ class Champions:
         if championId not in self.champions:
             self.champions[championId] = {
                 "name": self.names[championId],
-                "bans": {"blue": 0, "red": 0, "pickTurns": []},
+                "bans": {"blue": 0, "red": 0, "turns": 0},
                 "picks": {
                     "win": 0,
                     "loss": 0,
@@ -84,7 +333,6 @@ class Champions:
                     "xpd14": 0,
                     "gd14": 0,
                     "csd14": 0,
-                    "games": [],
                 },
             }
             return False
@@ -99,9 +347,10 @@ class Champions:
             pickTurn (int): pickTurn of ban from Riot
         """
 
+        self.cache.invalidate()
         self.verify_champion(championId)
         self.champions[championId]["bans"]["blue" if blueside else "red"] += 1
-        self.champions[championId]["bans"]["pickTurns"].append(pickTurn)
+        self.champions[championId]["bans"]["turns"] += pickTurn
 
     def add_pick(self, performance: dict[str, Any]) -> None:
         """Updates pick stats for a champion with stats from performance from API.
@@ -109,9 +358,8 @@ class Champions:
         Args:
             performance (dict[str, Any]): performance of champion pick
         """
-        if performance["matchId"] not in self.matchids:
-            self.n += 1
-            self.matchids.append(performance["matchId"])
+        self.cache.invalidate()
+        self.add_match(performance["matchId"])
         championId = performance["champid"]
         team = "blue" if performance["blueside"] else "red"
         win = performance["win"]
@@ -148,17 +396,17 @@ class Champions:
             performance["gd14"] if type(performance["gd14"]) is int else 0
         )
 
-        pick_stats["games"].append(
-            {
-                "puuid": performance["puuid"],
-                "position": performance["role"],
-                "team": performance["team"],
-                "matchId": performance["matchId"],
-                "win": win,
-                "kills": performance["kills"],
-                "deaths": performance["deaths"],
-                "assists": performance["assists"],
-            }
+        key = (championId, performance["puuid"])
+        self.players.add(
+            self.players.row(key, (*key, performance["team"])),
+            self.player_positions,
+            (
+                win,
+                not win,
+                performance["kills"],
+                performance["deaths"],
+                performance["assists"],
+            ),
         )
 
     def dump_data(self, filename: str = "output.json") -> None:
@@ -174,7 +422,7 @@ class Champions:
             json.dump(self.champions, f, indent=4)
 
     def get_best_player(self, championId: int) -> Optional[dict[str, Any]]:
-        """Calculates most prolific player on a champion from a list of games
+        """Calculates most prolific player on a champion from their games
 
         Args:
             championId (int): championId from Riot data
@@ -193,38 +441,16 @@ class Champions:
         if total_picks == 0:
             return None
 
-        players = {}
-        game_list = self.champions[championId]["picks"]["games"]
-
-        for game in game_list:
-            players.setdefault(
-                game["puuid"],
-                {
-                    "puuid": game["puuid"],
-                    "team": game["team"],
-                    "wins": 0,
-                    "losses": 0,
-                    "kills": 0,
-                    "deaths": 0,
-                    "assists": 0,
-                },
-            )
-
-            pd = players[game["puuid"]]
-            pd["wins" if game["win"] else "losses"] += 1
-            pd["kills"] += game["kills"]
-            pd["deaths"] += game["deaths"]
-            pd["assists"] += game["assists"]
-
-        df = pandas.DataFrame.from_records(list(players.values()))
+        df = self.players.frame()
+        df = df[df["championId"] == championId]
 
         df["kda"] = round((df["kills"] + df["assists"]) / df["deaths"], 1)
         df["games"] = df["wins"] + df["losses"]
         df["winrate"] = df["wins"] / df["games"]
 
         df = df.sort_values(
-            ["wins", "kda", "losses", "kills"],
-            ascending=[False, False, True, False],
+            ["wins", "kda", "losses", "kills", "puuid"],
+            ascending=[False, False, True, False, True],
             ignore_index=True,
         )
 
@@ -248,7 +474,7 @@ class Champions:
         data = self.champions[championId]
         total_picks = data["picks"]["blue"] + data["picks"]["red"]
         total_bans = data["bans"]["blue"] + data["bans"]["red"]
-        bt = data["bans"]["pickTurns"]
+        turns = data["bans"]["turns"]
 
         if total_picks == 0:
             return {
@@ -260,9 +486,11 @@ class Champions:
                 "losses": pandas.NA,
                 "winrate": pandas.NA,
                 "kda": pandas.NA,
-                "avg_ban": round(statistics.mean(bt), 1)
-                if len(bt) != 0
-                else pandas.NA,
+                "avg_ban": (
+                    round(mean(turns, total_bans), 1)
+                    if total_bans != 0
+                    else pandas.NA
+                ),
                 "gametime": pandas.NA,
                 "csm": pandas.NA,
                 "dpm": pandas.NA,
@@ -290,16 +518,20 @@ class Champions:
             "wins": data["picks"]["win"],
             "losses": data["picks"]["loss"],
             "winrate": data["picks"]["win"] / total_picks,
-            "kda": float("inf")
-            if data["picks"]["deaths"] == 0
-            else round(
-                (data["picks"]["kills"] + data["picks"]["assists"])
-                / data["picks"]["deaths"],
-                1,
+            "kda": (
+                float("inf")
+                if data["picks"]["deaths"] == 0
+                else round(
+                    (data["picks"]["kills"] + data["picks"]["assists"])
+                    / data["picks"]["deaths"],
+                    1,
+                )
+            ),
+            "avg_ban": (
+                round(mean(turns, total_bans), 1)
+                if total_bans != 0
+                else pandas.NA
             ),
-            "avg_ban": round(statistics.mean(bt), 1)
-            if len(bt) != 0
-            else pandas.NA,
             "gametime": datetime.timedelta(
                 seconds=(data["picks"]["timePlayed"] / total_picks)
             ),
@@ -325,27 +557,155 @@ class Champions:
             "best_kda": player["kda"],
         }
 
+    def best_players(self) -> pandas.DataFrame:
+        """Calculates the most prolific player on every champion at once.
+
+        Equivalent to calling get_best_player for each champion, using a
+        single sort-then-first-per-group over the player counters.
+
+        Returns:
+            pandas.DataFrame: puuid, team, games, winrate and kda indexed
+                by championId, only for champions with picks
+        """
+        df = self.players.frame()
+
+        df["kda"] = round((df["kills"] + df["assists"]) / df["deaths"], 1)
+        df["games"] = df["wins"] + df["losses"]
+        df["winrate"] = df["wins"] / df["games"]
+
+        df = df.sort_values(
+            ["wins", "kda", "losses", "kills", "puuid"],
+            ascending=[False, False, True, False, True],
+        ).drop_duplicates("championId")
+
+        return df.set_index("championId")[
+            ["puuid", "team", "games", "winrate", "kda"]
+        ]
+
+    def summaries(self) -> pandas.DataFrame:
+        """Returns summarized data for every champion at once.
+
+        Equivalent to concatenating get_stat_summary for every champion in
+        self.names, computed with column-wise reductions.
+
+        Returns:
+            pandas.DataFrame: One row per champion, same keys as
+                get_stat_summary
+        """
+        empty = {"picks": {}, "bans": {"blue": 0, "red": 0, "turns": 0}}
+        rows = []
+        for championId, name in self.names.items():
+            data = self.champions.get(championId, empty)
+            picks = data["picks"]
+            bans = data["bans"]
+            rows.append(
+                {
+                    "championId": championId,
+                    "name": name,
+                    "picks": picks.get("blue", 0) + picks.get("red", 0),
+                    "bans": bans["blue"] + bans["red"],
+                    "bt_sum": bans["turns"],
+                    "bt_count": bans["blue"] + bans["red"],
+                    "wins": picks.get("win", 0),
+                    "losses": picks.get("loss", 0),
+                    "kills": picks.get("kills", 0),
+                    "deaths": picks.get("deaths", 0),
+                    "assists": picks.get("assists", 0),
+                    "cs": picks.get("cs", 0),
+                    "timePlayed": picks.get("timePlayed", 0),
+                    "damage": picks.get("damage", 0),
+                    "gold": picks.get("gold", 0),
+                    "csd8": picks.get("csd8", 0),
+                    "gd8": picks.get("gd8", 0),
+                    "xpd8": picks.get("xpd8", 0),
+                    "csd14": picks.get("csd14", 0),
+                    "gd14": picks.get("gd14", 0),
+                    "xpd14": picks.get("xpd14", 0),
+                }
+            )
+        t = pandas.DataFrame.from_records(rows).set_index("championId")
+
+        picked = t["picks"] > 0
+        picks = t["picks"].where(picked, 1)
+        time = t["timePlayed"].where(picked, 1)
+
+        def per_pick(column, digits=None):
+            value = t[column] / picks
+            return exact_round(value, digits) if digits is not None else value
+
+        def per_pick_int(column):
+            return numpy.trunc(per_pick(column)).astype(int)
+
+        def per_minute(column):
+            return numpy.trunc(t[column] * 60 / time)
+
+        def when_picked(column):
+            return column.astype(object).where(picked, pandas.NA)
+
+        kda = exact_round((t["kills"] + t["assists"]) / t["deaths"], 1)
+        kda[t["deaths"] == 0] = float("inf")
+
+        banned = t["bt_count"] > 0
+        bans = t["bt_count"].where(banned, 1)
+        avg_ban = exact_round(t["bt_sum"] / bans, 1).astype(object)
+        # statistics.mean keeps a whole mean of ints as an int
+        whole = banned & (t["bt_sum"] % bans == 0)
+        avg_ban[whole] = (t["bt_sum"][whole] // bans[whole]).astype(object)
+
+        best = self.best_players().astype(object).reindex(t.index)
+
+        df = pandas.DataFrame(
+            {
+                "name": t["name"],
+                "picks": t["picks"],
+                "bans": t["bans"],
+                "presence": exact_round((t["picks"] + t["bans"]) / self.n, 2),
+                "wins": when_picked(t["wins"]),
+                "losses": when_picked(t["losses"]),
+                "winrate": when_picked(t["wins"] / picks),
+                "kda": when_picked(kda),
+                "avg_ban": avg_ban.where(banned, pandas.NA),
+                "gametime": when_picked(
+                    pandas.to_timedelta(
+                        t["timePlayed"] / picks, unit="s"
+                    ).dt.round("us")
+                ),
+                "csm": when_picked(exact_round(t["cs"] * 60 / time, 1)),
+                "dpm": when_picked(per_minute("damage").astype(int)),
+                "gpm": when_picked(per_minute("gold").astype(int)),
+                "csd8": when_picked(per_pick("csd8", 1)),
+                "gd8": when_picked(per_pick_int("gd8")),
+                "xpd8": when_picked(per_pick_int("xpd8")),
+                "csd14": when_picked(per_pick("csd14", 1)),
+                "gd14": when_picked(per_pick_int("gd14")),
+                "xpd14": when_picked(per_pick_int("xpd14")),
+                "best_team": when_picked(best["team"]),
+                "best_puuid": when_picked(best["puuid"]),
+                "best_games": when_picked(best["games"]),
+                "best_winrate": when_picked(best["winrate"]),
+                "best_kda": when_picked(best["kda"]),
+            }
+        )
+
+        return df.reset_index(drop=True)
+
     def dataframe(self) -> pandas.DataFrame:
+        """Outputs the summary dataframe, rebuilt only after new data is
+        added
+
+        Returns:
+            pandas.DataFrame: Copy of the cached dataframe
+        """
+        return self.cache.get(self.build_dataframe)
+
+    def build_dataframe(self) -> pandas.DataFrame:
         """Outputs champion stat summary as a dataframe
 
         Returns:
             pandas.DataFrame: Dataframe of champion summary stats
         """
         print("Exporting dataframe...")
-        df = pandas.DataFrame()
-
-        for champion in self.names.keys():
-            summary = {
-                x: [y] for x, y in self.get_stat_summary(champion).items()
-            }
-
-            df = pandas.concat(
-                [
-                    df,
-                    pandas.DataFrame.from_dict(summary),
-                ],
-                ignore_index=True,
-            )
+        df = self.summaries()
 
         df.columns = [
             "Name",
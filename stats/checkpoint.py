@@ -0,0 +1,495 @@
+import copy
+import os
+import pickle
+import pandas
+from pandas.util import hash_pandas_object
+from stats.champions import Champions
+from stats.players import Players
+from stats.store import PerformanceStore
+from stats.stream import BATCH_SIZE, stream_league
+from stats.teams import Teams
+from typing import Any, Callable, Iterable, Optional
+
+# Bump whenever the counters kept by an aggregator change
+CHECKPOINT_VERSION = 6
+
+# Set STATS_REBUILD=1 to ignore checkpoints and recount every match
+REBUILD = os.getenv("STATS_REBUILD", "") not in ("", "0")
+
+# Fields ordering the matches of a league, the high-water mark is the last
+ORDER = ["week", "game", "startTime"]
+
+
+class RowLog:
+    def __init__(self, filename: str):
+        """Append-only log of the rows counted into a checkpoint, so that a
+        match can be taken out of the counters again when it is corrected or
+        removed from the payload.
+
+        Args:
+            filename (str): Log file
+        """
+        self.filename = filename
+        self.file = None
+
+    def open(self, truncate: bool = False) -> None:
+        """Opens the log for appending, emptying it first if truncate."""
+        self.close()
+        self.file = open(self.filename, "wb" if truncate else "ab")
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def write(self, kind: str, frame: pandas.DataFrame) -> None:
+        """Appends counted rows.
+
+        Args:
+            kind (str): "performances", "teamperformances" or "bans"
+            frame (pandas.DataFrame): Rows of whole matches
+        """
+        if self.file is not None and len(frame) > 0:
+            pickle.dump(
+                (kind, frame), self.file, protocol=pickle.HIGHEST_PROTOCOL
+            )
+
+    def read(self, matchIds: set[str]) -> dict[str, pandas.DataFrame]:
+        """Finds the rows last logged for some matches.
+
+        Args:
+            matchIds (set[str]): Matches to look up
+
+        Returns:
+            dict[str, pandas.DataFrame]: Their rows by kind
+        """
+        if self.file is not None:
+            self.file.flush()
+        found = {}
+        if not os.path.exists(self.filename):
+            return found
+        with open(self.filename, "rb") as f:
+            while True:
+                try:
+                    kind, frame = pickle.load(f)
+                except EOFError:
+                    break
+                except (pickle.UnpicklingError, ValueError) as e:
+                    print(f"Could not read {self.filename} to the end: {e}")
+                    break
+                ids = frame["matchId"].astype(object)
+                keep = ids.isin(matchIds)
+                # A later entry holds a recount of the same match
+                for matchId, rows in frame[keep].groupby(
+                    ids[keep].to_numpy(), sort=False
+                ):
+                    found.setdefault(kind, {})[matchId] = rows
+        return {
+            kind: pandas.concat(list(matches.values()))
+            for kind, matches in found.items()
+        }
+
+
+class Checkpoint:
+    def __init__(self, league: str, directory: str = "data"):
+        """Saves the raw counters of a league's Players, Teams and Champions
+        along with a digest of every match already counted, so that later
+        runs only count new matches.
+
+        Args:
+            league (str): League name, e.g. "plat" or "dia"
+            directory (str, optional): Checkpoint directory. Defaults to
+                "data".
+        """
+        self.league = league
+        self.filename = os.path.join(directory, f"{league}checkpoint.pkl")
+        self.rows = RowLog(os.path.join(directory, f"{league}checkpoint.rows"))
+
+    def load(self) -> Optional[dict[str, Any]]:
+        """Reads the checkpoint.
+
+        Returns:
+            Optional[dict[str, Any]]: Saved state, or None if there is no
+                usable checkpoint
+        """
+        if not os.path.exists(self.filename):
+            return None
+        try:
+            with open(self.filename, "rb") as f:
+                state = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            print(f"Could not read checkpoint {self.filename}: {e}")
+            return None
+        if state.get("version") != CHECKPOINT_VERSION:
+            print(f"Checkpoint {self.filename} is outdated, ignoring it")
+            return None
+        return state
+
+    def save(
+        self,
+        players: Players,
+        teams: Teams,
+        champions: Champions,
+        digests: dict[str, int],
+        newest: Optional[dict[str, Any]] = None,
+    ) -> None:
+        """Writes the counters of every aggregator, the digests of the
+        matches they counted and the league's high-water mark.
+
+        Args:
+            players (Players): League player stats
+            teams (Teams): League team stats
+            champions (Champions): League champion stats
+            digests (dict[str, int]): Digest of every counted match, from
+                match_digests
+            newest (Optional[dict[str, Any]], optional): Week, game,
+                startTime and matchId of the newest match. Defaults to None.
+        """
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "digests": digests,
+            "newest": newest,
+            "players": counters(players),
+            "teams": counters(teams),
+            "champions": counters(champions),
+        }
+        print(f"Saving checkpoint to {self.filename}")
+        part = self.filename + ".part"
+        with open(part, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(part, self.filename)
+
+    def changes(
+        self, state: dict[str, Any], digests: dict[str, int]
+    ) -> tuple[set[str], set[str]]:
+        """Compares a checkpoint with the current payload.
+
+        Args:
+            state (dict[str, Any]): State from load
+            digests (dict[str, int]): Digest of every match in the payload
+
+        Returns:
+            tuple[set[str], set[str]]: Checkpointed matches whose digest
+                changed, and those missing from the payload
+        """
+        changed = set()
+        missing = set()
+        for matchId, digest in state["digests"].items():
+            current = digests.get(matchId)
+            if current is None:
+                missing.add(matchId)
+            elif current != digest:
+                changed.add(matchId)
+        if len(missing) > 0:
+            print(
+                f"Checkpoint has {len(missing)} matches missing from the "
+                "payload"
+            )
+        if len(changed) > 0:
+            print(f"{len(changed)} checkpointed matches were corrected")
+        return changed, missing
+
+    def take_out(
+        self,
+        aggregators: dict[str, Any],
+        empty: dict[str, dict[str, Any]],
+        digests: dict[str, int],
+        matchIds: set[str],
+    ) -> bool:
+        """Subtracts the counted rows of some matches from the aggregators.
+
+        The rows are read back from the row log, and only used if they
+        still digest to what the checkpoint counted.
+
+        Args:
+            aggregators (dict[str, Any]): Players, Teams and Champions by
+                name
+            empty (dict[str, dict[str, Any]]): Their counters when empty
+            digests (dict[str, int]): Checkpointed digest of every match
+            matchIds (set[str]): Matches to take out
+
+        Returns:
+            bool: False if the log does not hold the counted rows
+        """
+        old = self.rows.read(matchIds)
+        found = {}
+        for frame in old.values():
+            combine(found, match_digests(frame))
+        if any(found.get(matchId) != digests[matchId] for matchId in matchIds):
+            print(f"{self.rows.filename} does not hold the counted rows")
+            return False
+
+        counted = {}
+        for name, aggregator in aggregators.items():
+            counted[name] = copy.copy(aggregator)
+            restore(counted[name], copy.deepcopy(empty[name]))
+        if "performances" in old:
+            counted["players"].add_frame(old["performances"])
+            counted["champions"].add_frame(old["performances"])
+        if "teamperformances" in old:
+            counted["teams"].add_frame(old["teamperformances"])
+            counted["champions"].add_team_frame(
+                old["teamperformances"],
+                old.get("bans", PerformanceStore.ban_frame([])),
+            )
+        for name, aggregator in aggregators.items():
+            aggregator.subtract(counted[name])
+        print(f"Took {len(matchIds)} matches out of the checkpoint")
+        return True
+
+    def apply(
+        self,
+        performances: Callable[[], Iterable[dict[str, Any]]],
+        teamperformances: Callable[[], Iterable[dict[str, Any]]],
+        players: Players,
+        teams: Teams,
+        champions: Champions,
+        force: bool = REBUILD,
+        batch_size: int = BATCH_SIZE,
+    ) -> set[str]:
+        """Streams a league's payload into empty aggregators, counting only
+        the matches the checkpoint has not counted yet.
+
+        The checkpoint is restored first, and every batch is digested as it
+        streams past. Checkpointed matches that were corrected or removed
+        since are taken out of the counters again, and corrected ones are
+        counted from a second pass over the payload. Only if their counted
+        rows cannot be found are the aggregators emptied and every match
+        counted again. A new checkpoint is saved whenever something was
+        counted.
+
+        Args:
+            performances (Callable[[], Iterable[dict[str, Any]]]): Returns
+                the player performances on every call, e.g. a
+                stream.Payload
+            teamperformances (Callable[[], Iterable[dict[str, Any]]]):
+                Returns the team performances on every call
+            players (Players): Empty player stats
+            teams (Teams): Empty team stats
+            champions (Champions): Empty champion stats
+            force (bool, optional): Ignore the checkpoint and count every
+                match. Defaults to REBUILD.
+            batch_size (int, optional): Records per batch. Defaults to
+                stream.BATCH_SIZE.
+
+        Returns:
+            set[str]: matchIds that were counted in this run
+        """
+        aggregators = {
+            "players": players,
+            "teams": teams,
+            "champions": champions,
+        }
+        empty = copy.deepcopy(
+            {name: counters(a) for name, a in aggregators.items()}
+        )
+
+        checkpointed = {}
+        previous = None
+        state = None if force else self.load()
+        if state is not None:
+            for name, aggregator in aggregators.items():
+                restore(aggregator, state[name])
+            checkpointed = state["digests"]
+            previous = state["newest"]
+        elif force:
+            print(f"Rebuilding {self.league} stats from every match")
+
+        print(f"Streaming matches ({len(checkpointed)} checkpointed)")
+        changed = missing = set()
+        self.rows.open(truncate=state is None)
+        try:
+            digests, newest = count(
+                performances(),
+                teamperformances(),
+                aggregators,
+                self.rows,
+                batch_size,
+                skip=checkpointed,
+            )
+            if state is not None:
+                changed, missing = self.changes(state, digests)
+            removed = changed | missing
+            if len(removed) > 0 and not self.take_out(
+                aggregators, empty, checkpointed, removed
+            ):
+                print(f"Rebuilding {self.league} stats from every match")
+                for name, aggregator in aggregators.items():
+                    restore(aggregator, copy.deepcopy(empty[name]))
+                checkpointed = {}
+                self.rows.open(truncate=True)
+                digests, newest = count(
+                    performances(),
+                    teamperformances(),
+                    aggregators,
+                    self.rows,
+                    batch_size,
+                )
+            elif len(changed) > 0:
+                count(
+                    performances(),
+                    teamperformances(),
+                    aggregators,
+                    self.rows,
+                    batch_size,
+                    only=changed,
+                )
+        finally:
+            self.rows.close()
+
+        new = set(digests) - set(checkpointed)
+        print(f"Counted {len(new)} new matches")
+        if newest is not None and newest != previous:
+            print(
+                f"Newest match is week {newest['week']} game "
+                f"{newest['game']} ({newest['matchId']})"
+            )
+        if (
+            len(new | changed | missing) > 0
+            or len(checkpointed) == 0
+            or newest != previous
+        ):
+            self.save(players, teams, champions, digests, newest)
+        return new | changed
+
+
+def count(
+    performances: Iterable[dict[str, Any]],
+    teamperformances: Iterable[dict[str, Any]],
+    aggregators: dict[str, Any],
+    rows: RowLog,
+    batch_size: int,
+    skip: Iterable[str] = (),
+    only: Optional[set[str]] = None,
+) -> tuple[dict[str, int], Optional[dict[str, Any]]]:
+    """Streams a payload into aggregators, logging the rows it counts.
+
+    Args:
+        performances (Iterable[dict[str, Any]]): Player performances
+        teamperformances (Iterable[dict[str, Any]]): Team performances
+        aggregators (dict[str, Any]): Players, Teams and Champions by name
+        rows (RowLog): Receives the counted rows
+        batch_size (int): Records per batch
+        skip (Iterable[str], optional): Matches already counted. Defaults
+            to none.
+        only (Optional[set[str]], optional): Count only these matches.
+            Defaults to every match not skipped.
+
+    Returns:
+        tuple[dict[str, int], Optional[dict[str, Any]]]: Digest of every
+            match in the payload, and its newest match from high_water
+    """
+    digests = {}
+    newest = [None]
+    skip = set(skip)
+
+    def select(kind: str, frame: pandas.DataFrame) -> pandas.DataFrame:
+        combine(digests, match_digests(frame))
+        if kind == "teamperformances":
+            newest[0] = high_water(frame, newest[0])
+        matchIds = frame["matchId"].astype(object)
+        if only is not None:
+            frame = frame[matchIds.isin(only)]
+        elif len(skip) > 0:
+            frame = frame[~matchIds.isin(skip)]
+        rows.write(kind, frame)
+        return frame
+
+    stream_league(
+        performances,
+        teamperformances,
+        aggregators["players"],
+        aggregators["teams"],
+        aggregators["champions"],
+        batch_size,
+        select,
+    )
+    return digests, newest[0]
+
+
+def high_water(
+    frame: pandas.DataFrame, mark: Optional[dict[str, Any]] = None
+) -> Optional[dict[str, Any]]:
+    """Returns the later of mark and the newest match of a batch of team
+    performances, ordered by week, game and startTime.
+
+    Args:
+        frame (pandas.DataFrame): Team performances
+        mark (Optional[dict[str, Any]], optional): Newest match so far.
+            Defaults to None.
+
+    Returns:
+        Optional[dict[str, Any]]: week, game, startTime and matchId of the
+            newest match
+    """
+    frame = frame.dropna(subset=ORDER)
+    if len(frame) == 0:
+        return mark
+    latest = frame.sort_values(ORDER, kind="stable").iloc[-1]
+    newest = {field: int(latest[field]) for field in ORDER}
+    newest["matchId"] = str(latest["matchId"])
+    if mark is not None and [mark[f] for f in ORDER] >= [
+        newest[f] for f in ORDER
+    ]:
+        return mark
+    return newest
+
+
+def match_digests(table: pandas.DataFrame) -> dict[str, int]:
+    """Fingerprints the rows of every match in a table.
+
+    Columns are hashed in name order, numbers as floats and everything
+    else as objects, so a record hashes the same whatever dtypes the rest
+    of its table gave it. The digest of a match is the sum of its row
+    hashes modulo 2**64, which does not depend on the order of the rows.
+
+    Args:
+        table (pandas.DataFrame): Rows with a matchId column
+
+    Returns:
+        dict[str, int]: Digest of every match in table
+    """
+    if len(table) == 0:
+        return {}
+    columns = {}
+    for name in sorted(table.columns):
+        column = table[name]
+        if pandas.api.types.is_bool_dtype(
+            column
+        ) or pandas.api.types.is_numeric_dtype(column):
+            columns[name] = column.astype("float64")
+        else:
+            columns[name] = column.astype(object)
+    hashes = hash_pandas_object(pandas.DataFrame(columns), index=False)
+    sums = hashes.groupby(
+        table["matchId"].astype(object).to_numpy(), sort=False
+    ).sum()
+    return dict(zip(sums.index, sums.tolist()))
+
+
+def combine(digests: dict[str, int], more: dict[str, int]) -> None:
+    """Adds the digests of more rows of the same matches into digests.
+
+    Args:
+        digests (dict[str, int]): Digests to update in place
+        more (dict[str, int]): Digests from match_digests
+    """
+    for matchId, digest in more.items():
+        digests[matchId] = (digests.get(matchId, 0) + digest) % 2**64
+
+
+def counters(aggregator) -> dict[str, Any]:
+    """Returns the raw counters an aggregator lists in CHECKPOINT."""
+    return {name: getattr(aggregator, name) for name in aggregator.CHECKPOINT}
+
+
+def restore(aggregator, state: dict[str, Any]) -> None:
+    """Replaces an aggregator's counters with saved ones.
+
+    Args:
+        aggregator: Players, Teams or Champions
+        state (dict[str, Any]): Counters from counters()
+    """
+    for name in aggregator.CHECKPOINT:
+        setattr(aggregator, name, state[name])
+    aggregator.cache.invalidate()
@@ -0,0 +1,192 @@
+import numpy
+import pandas
+from typing import Any, Hashable, Sequence, Union
+
+
+def whole(values: numpy.ndarray) -> numpy.ndarray:
+    """Returns float counters as int64 if every value is a whole number.
+
+    Args:
+        values (numpy.ndarray): Counter values
+
+    Returns:
+        numpy.ndarray: values, as int64 when nothing would be truncated
+    """
+    if numpy.array_equal(values, numpy.round(values)):
+        return values.astype(numpy.int64)
+    return values
+
+
+def native_columns(totals: pandas.DataFrame) -> list[list[Union[int, float]]]:
+    """Returns the columns of grouped totals as lists of Python numbers,
+    ints where a column holds only whole numbers.
+
+    Args:
+        totals (pandas.DataFrame): Grouped sums
+
+    Returns:
+        list[list[Union[int, float]]]: Values of every column
+    """
+    return [
+        whole(totals[column].to_numpy(dtype=numpy.float64)).tolist()
+        for column in totals.columns
+    ]
+
+
+class CounterTable:
+    def __init__(
+        self, labels: list[str], columns: list[str], capacity: int = 64
+    ):
+        """Counters for many entities, one row of a preallocated float64
+        matrix per entity.
+
+        Entities are mapped to row ids once, and batches are added as whole
+        blocks instead of one dict lookup per counter. Counters whose totals
+        are all whole numbers come back as ints, the others as floats, so
+        fractional fields like jgmins are never truncated.
+
+        Args:
+            labels (list[str]): Fields identifying an entity, e.g. ["team"]
+            columns (list[str]): Counter names, in output order
+            capacity (int, optional): Rows to allocate up front, doubled
+                when full. Defaults to 64.
+        """
+        self.labels = labels
+        self.columns = columns
+        self.column = {column: i for i, column in enumerate(columns)}
+        self.ids = {}
+        self.keys = []
+        self.values = numpy.zeros(
+            (capacity, len(columns)), dtype=numpy.float64
+        )
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.ids
+
+    def row(self, key: Hashable, labels: tuple) -> int:
+        """Returns the row id of an entity, adding a zeroed row if needed.
+
+        Args:
+            key (Hashable): Entity key
+            labels (tuple): Values of the label fields for a new entity
+
+        Returns:
+            int: Row id
+        """
+        row = self.ids.get(key)
+        if row is None:
+            row = len(self.keys)
+            if row == len(self.values):
+                grown = numpy.zeros(
+                    (2 * len(self.values), len(self.columns)),
+                    dtype=numpy.float64,
+                )
+                grown[:row] = self.values
+                self.values = grown
+            self.ids[key] = row
+            self.keys.append(labels)
+        return row
+
+    def positions(self, columns: Sequence[str]) -> numpy.ndarray:
+        """Returns the column indices of counter names.
+
+        Args:
+            columns (Sequence[str]): Counter names
+
+        Returns:
+            numpy.ndarray: Index of each counter
+        """
+        return numpy.array([self.column[c] for c in columns], dtype=numpy.intp)
+
+    def add(
+        self, row: int, positions: numpy.ndarray, values: Sequence[float]
+    ) -> None:
+        """Adds values to some counters of one entity.
+
+        Args:
+            row (int): Row id from row()
+            positions (numpy.ndarray): Counter indices from positions()
+            values (Sequence[float]): Amount to add to each counter
+        """
+        self.values[row][positions] += numpy.fromiter(
+            values, numpy.float64, len(positions)
+        )
+
+    def add_rows(
+        self,
+        rows: Sequence[int],
+        positions: numpy.ndarray,
+        values: numpy.ndarray,
+    ) -> None:
+        """Adds a block of values to several entities at once.
+
+        Args:
+            rows (Sequence[int]): Distinct row ids
+            positions (numpy.ndarray): Counter indices from positions()
+            values (numpy.ndarray): len(rows) x len(positions) amounts
+        """
+        self.values[numpy.ix_(rows, positions)] += values
+
+    def subtract(self, other: "CounterTable") -> None:
+        """Takes away the counters of another table's entities, dropping the
+        entities left with nothing counted.
+
+        Args:
+            other (CounterTable): Counters of entities already in this table
+        """
+        rows = [self.ids[key] for key in other.ids]
+        values = self.values[rows] - other.counts()
+        # Leftovers of adding and taking away fractions are zero
+        values[numpy.isclose(values, 0)] = 0
+        self.values[rows] = values
+
+        keep = numpy.flatnonzero(self.counts().any(axis=1))
+        if len(keep) == len(self):
+            return
+        ids = list(self.ids)
+        self.ids = {ids[row]: i for i, row in enumerate(keep.tolist())}
+        self.keys = [self.keys[row] for row in keep.tolist()]
+        values = numpy.zeros_like(self.values)
+        values[: len(keep)] = self.values[keep]
+        self.values = values
+
+    def counts(self) -> numpy.ndarray:
+        """Returns the counter matrix, one row per entity."""
+        return self.values[: len(self)]
+
+    def count_columns(self) -> dict[str, numpy.ndarray]:
+        """Returns every counter column, as int64 if all of its values are
+        whole numbers and as float64 otherwise."""
+        return {
+            column: whole(values)
+            for column, values in zip(self.columns, self.counts().T)
+        }
+
+    def total(self, column: str) -> Union[int, float]:
+        """Sums one counter over every entity."""
+        return whole(self.counts()[:, self.column[column]]).sum().item()
+
+    def records(self) -> list[dict[str, Any]]:
+        """Returns one dict of labels and counters per entity, in the order
+        the entities were added."""
+        counts = zip(
+            *(values.tolist() for values in self.count_columns().values())
+        )
+        return [
+            dict(zip(self.labels, labels)) | dict(zip(self.columns, row))
+            for labels, row in zip(self.keys, counts)
+        ]
+
+    def to_dict(self) -> dict[Hashable, dict[str, Any]]:
+        """Returns the records keyed by entity key."""
+        return dict(zip(self.ids, self.records()))
+
+    def frame(self) -> pandas.DataFrame:
+        """Returns the label and counter columns as a DataFrame, one row per
+        entity."""
+        df = pandas.DataFrame.from_records(self.keys, columns=self.labels)
+        counts = pandas.DataFrame(self.count_columns())
+        return pandas.concat([df, counts], axis=1)
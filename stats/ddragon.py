@@ -0,0 +1,94 @@
+import requests
+import json
+import os
+from typing import Optional
+
+VERSION = "12.16.1"
+CDN = "http://ddragon.leagueoflegends.com/cdn"
+
+# Set DDRAGON_OFFLINE=1 to only ever read the on-disk cache
+OFFLINE = os.getenv("DDRAGON_OFFLINE", "") not in ("", "0")
+
+
+class StaticData:
+    def __init__(
+        self,
+        version: str = VERSION,
+        directory: str = "data",
+        offline: bool = OFFLINE,
+    ):
+        """Champion static data from Data Dragon for a pinned version.
+
+        The champion list is downloaded at most once per version and cached
+        on disk as a compact {key: [id, name]} map.
+
+        Args:
+            version (str, optional): Data Dragon version. Defaults to
+                VERSION.
+            directory (str, optional): Cache directory. Defaults to "data".
+            offline (bool, optional): Never touch the network. Defaults to
+                the DDRAGON_OFFLINE environment variable.
+        """
+        self.version = version
+        self.filename = os.path.join(directory, f"ddragon-{version}.json")
+        self.offline = offline
+        self.ids = {}
+        self.names = {}
+        self.load()
+
+    def load(self) -> None:
+        """Loads champion maps from the cache, downloading them if needed.
+
+        Raises:
+            FileNotFoundError: If offline and the version is not cached
+        """
+        if os.path.exists(self.filename):
+            print(f"Loading champion data from {self.filename}")
+            with open(self.filename, "r", encoding="utf-8") as f:
+                champions = json.load(f)
+        elif self.offline:
+            raise FileNotFoundError(
+                f"No cached champion data for {self.version} at "
+                f"{self.filename} and offline mode is on"
+            )
+        else:
+            champions = self.fetch()
+            self.dump(champions)
+
+        for key, (id, name) in champions.items():
+            self.ids[int(key)] = id
+            self.names[int(key)] = name
+
+    def fetch(self) -> dict[str, list[str]]:
+        print(f"Downloading champion data {self.version}")
+        data = requests.get(
+            f"{CDN}/{self.version}/data/en_US/champion.json"
+        ).json()["data"]
+        return {v["key"]: [v["id"], v["name"]] for v in data.values()}
+
+    def dump(self, champions: dict[str, list[str]]) -> None:
+        os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+        with open(self.filename, "w") as f:
+            json.dump(champions, f, separators=(",", ":"))
+
+    def image(self, key: int) -> str:
+        """Returns the champion square URL for a champion key.
+
+        Args:
+            key (int): championId from Riot
+
+        Returns:
+            str: Image URL on the same version as the champion data
+        """
+        return f"{CDN}/{self.version}/img/champion/{self.ids[key]}.png"
+
+
+_static_data: Optional[StaticData] = None
+
+
+def static_data() -> StaticData:
+    """Returns the StaticData instance shared by the whole process."""
+    global _static_data
+    if _static_data is None:
+        _static_data = StaticData()
+    return _static_data
@@ -0,0 +1,138 @@
+import requests
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from stats.snapshot import read_frame, write_snapshot
+from typing import Any
+
+API = "http://api.brycenaddison.com"
+
+
+def session(workers: int = 8) -> requests.Session:
+    """Creates a session whose connection pool fits workers threads.
+
+    Args:
+        workers (int, optional): Concurrent requests. Defaults to 8.
+
+    Returns:
+        requests.Session: Pooled session that accepts gzip
+    """
+    s = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=workers, pool_maxsize=workers
+    )
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    s.headers["Accept-Encoding"] = "gzip"
+    return s
+
+
+def conditional_headers(filename: str) -> dict[str, str]:
+    """Builds If-None-Match/If-Modified-Since headers from the
+    <filename>.meta sidecar of a cached download.
+
+    Args:
+        filename (str): Cache file
+
+    Returns:
+        dict[str, str]: Request headers, empty if nothing is cached
+    """
+    meta_file = filename + ".meta"
+    meta = {}
+    if os.path.exists(filename) and os.path.exists(meta_file):
+        with open(meta_file, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+
+    headers = {}
+    if "etag" in meta:
+        headers["If-None-Match"] = meta["etag"]
+    if "modified" in meta:
+        headers["If-Modified-Since"] = meta["modified"]
+    return headers
+
+
+def save_meta(response: requests.Response, filename: str) -> None:
+    """Records the ETag and Last-Modified of a download in
+    <filename>.meta.
+
+    Args:
+        response (requests.Response): Response that was written to filename
+        filename (str): Cache file
+    """
+    meta = {}
+    if "ETag" in response.headers:
+        meta["etag"] = response.headers["ETag"]
+    if "Last-Modified" in response.headers:
+        meta["modified"] = response.headers["Last-Modified"]
+    with open(filename + ".meta", "w") as f:
+        json.dump(meta, f)
+
+
+def fetch(
+    s: requests.Session, url: str, filename: str, frame: bool = False
+) -> Any:
+    """Conditionally downloads url to filename.
+
+    The ETag and Last-Modified of the last download are kept next to the
+    file in <filename>.meta. If the server answers 304 the cached file is
+    reused without being rewritten.
+
+    Args:
+        s (requests.Session): Session to send the request on
+        url (str): Endpoint to download
+        filename (str): Cache file for the response body
+        frame (bool, optional): Keep an Arrow snapshot of the payload and
+            return it as a DataFrame. Defaults to False.
+
+    Returns:
+        Any: Parsed json payload, or a DataFrame if frame is set
+    """
+    start = time.perf_counter()
+    response = s.get(url, headers=conditional_headers(filename))
+    response.raise_for_status()
+    elapsed = time.perf_counter() - start
+
+    if response.status_code == 304:
+        print(f"{url}: not modified ({elapsed * 1000:.0f} ms)")
+        if frame:
+            return read_frame(filename)
+        with open(filename, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    size = response.headers.get("Content-Length", len(response.content))
+    print(f"{url}: {size} bytes in {elapsed * 1000:.0f} ms")
+    with open(filename, "wb") as f:
+        f.write(response.content)
+
+    save_meta(response, filename)
+
+    if frame:
+        write_snapshot(response.json(), filename)
+        return read_frame(filename)
+    return response.json()
+
+
+def download_all(
+    endpoints: dict[str, str], workers: int = 8, frames: set[str] = ()
+) -> dict[str, Any]:
+    """Downloads every endpoint concurrently over one pooled session.
+
+    Args:
+        endpoints (dict[str, str]): Cache filename to url
+        workers (int, optional): Concurrent requests. Defaults to 8.
+        frames (set[str], optional): Cache filenames to return as
+            DataFrames backed by Arrow snapshots. Defaults to ().
+
+    Returns:
+        dict[str, Any]: Cache filename to parsed json payload or DataFrame
+    """
+    print(f"Downloading {len(endpoints)} endpoints...")
+    with session(workers) as s, ThreadPoolExecutor(workers) as pool:
+        futures = {
+            filename: pool.submit(fetch, s, url, filename, filename in frames)
+            for filename, url in endpoints.items()
+        }
+        return {
+            filename: future.result() for filename, future in futures.items()
+        }
@@ -0,0 +1,135 @@
+import numpy
+import pandas
+from typing import Callable, Optional
+
+# Format kinds of a display column
+ROUND2 = "round2"
+PERCENT = "percent"
+TIME = "time"
+IMAGE = "image"
+
+# (display name, source column, format kind or None to copy as is)
+Spec = list[tuple[str, str, Optional[str]]]
+
+
+def blanks(column: pandas.Series) -> numpy.ndarray:
+    """Finds cells left empty with "" by fillna(""), which every format
+    keeps empty.
+
+    Args:
+        column (pandas.Series): Column to check
+
+    Returns:
+        numpy.ndarray: True for every "" cell
+    """
+    if pandas.api.types.is_numeric_dtype(
+        column
+    ) or pandas.api.types.is_timedelta64_dtype(column):
+        return numpy.zeros(len(column), dtype=bool)
+    return column.eq("").to_numpy(dtype=bool)
+
+
+def exact_round(column: pandas.Series, digits: int) -> pandas.Series:
+    """Rounds like Python's round(x, digits) on every cell.
+
+    numpy rounds x * 10**digits, which is inexact, so the few values that
+    land next to a tie are rounded again by Python.
+
+    Args:
+        column (pandas.Series): Numbers to round
+        digits (int): Decimal digits to keep
+
+    Returns:
+        pandas.Series: Rounded floats
+    """
+    values = column.to_numpy(dtype=numpy.float64)
+    rounded = numpy.round(values, digits)
+    scaled = values * 10.0**digits
+    with numpy.errstate(invalid="ignore"):
+        tie = numpy.abs(scaled - numpy.floor(scaled) - 0.5)
+        near = tie < 1e-9 * numpy.maximum(1, numpy.abs(scaled))
+    for i in numpy.flatnonzero(near):
+        rounded[i] = round(float(values[i]), digits)
+    return pandas.Series(rounded, index=column.index, name=column.name)
+
+
+def round2(column: pandas.Series) -> pandas.Series:
+    """Rounds to 2 decimals, like round(x, 2). Integers are kept as is."""
+    if pandas.api.types.is_integer_dtype(column):
+        return column
+    return exact_round(column, 2)
+
+
+def percent(column: pandas.Series) -> pandas.Series:
+    """Formats ratios as whole percentages, like "{:.0%}".format(x)."""
+    blank = blanks(column)
+    values = column.where(~blank).to_numpy(dtype=numpy.float64)
+    scaled = values * 100
+    text = numpy.empty(len(values), dtype=object)
+
+    # Python formats round(x * 100) with ties to even, as numpy.rint does
+    whole = numpy.isfinite(scaled) & (numpy.abs(scaled) < 2**53)
+    rounded = numpy.rint(scaled[whole])
+    digits = numpy.where(
+        numpy.signbit(rounded) & (rounded == 0),
+        "-0",
+        rounded.astype(numpy.int64).astype(str),
+    )
+    text[whole] = numpy.char.add(digits, "%")
+    text[~whole] = ["{:.0%}".format(x) for x in values[~whole]]
+    text[blank] = ""
+    return pandas.Series(text, index=column.index, name=column.name)
+
+
+def clock(column: pandas.Series) -> pandas.Series:
+    """Formats durations as hh:mm:ss."""
+    blank = blanks(column)
+    parts = (
+        pandas.to_timedelta(column.where(~blank))
+        .dt.components[["hours", "minutes", "seconds"]]
+        .fillna(0)
+        .astype(numpy.int64)
+        .astype(str)
+    )
+    text = (
+        parts["hours"].str.zfill(2)
+        + ":"
+        + parts["minutes"].str.zfill(2)
+        + ":"
+        + parts["seconds"].str.zfill(2)
+    )
+    return text.where(~blank, "").rename(column.name)
+
+
+def image(column: pandas.Series) -> pandas.Series:
+    """Turns image urls into =IMAGE() formulas."""
+    return '=IMAGE("' + column.astype(str) + '")'
+
+
+FORMATS: dict[str, Callable[[pandas.Series], pandas.Series]] = {
+    ROUND2: round2,
+    PERCENT: percent,
+    TIME: clock,
+    IMAGE: image,
+}
+
+
+def format_columns(df: pandas.DataFrame, spec: Spec) -> pandas.DataFrame:
+    """Builds the display table of a stats table, one whole column at a
+    time.
+
+    Args:
+        df (pandas.DataFrame): Source columns
+        spec (Spec): (display name, source column, format kind) of every
+            output column, in order
+
+    Returns:
+        pandas.DataFrame: Formatted columns under their display names
+    """
+    return pandas.DataFrame(
+        {
+            name: df[source] if kind is None else FORMATS[kind](df[source])
+            for name, source, kind in spec
+        },
+        index=df.index,
+    )
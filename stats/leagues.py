@@ -0,0 +1,196 @@
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from stats.download import API
+from typing import Any, Callable, Optional
+
+try:
+    import tomllib
+except ModuleNotFoundError:
+    import tomli as tomllib
+
+OUTPUTS = ["teampages", "players", "champions", "teams"]
+
+
+class League:
+    def __init__(
+        self,
+        name: str,
+        api: str,
+        prefix: str = None,
+        sheet: str = None,
+        outputs: list[str] = None,
+        enabled: bool = True,
+    ):
+        """One division from the league registry.
+
+        Args:
+            name (str): Name of the league in the registry
+            api (str): League name in the stats API
+            prefix (str, optional): Prefix of the cached files in data/.
+                Defaults to name.
+            sheet (str, optional): Google Sheet key. Defaults to None.
+            outputs (list[str], optional): Tabs to refresh, from OUTPUTS.
+                Defaults to None.
+            enabled (bool, optional): Whether to process the league.
+                Defaults to True.
+        """
+        self.name = name
+        self.api = api
+        self.prefix = prefix or name
+        self.sheet = sheet
+        self.outputs = outputs or []
+        self.enabled = enabled
+
+        unknown = set(self.outputs) - set(OUTPUTS)
+        if len(unknown) > 0:
+            raise ValueError(
+                f"Unknown outputs for league {name}: {', '.join(unknown)}"
+            )
+        if len(self.outputs) > 0 and sheet is None:
+            raise ValueError(f"League {name} has outputs but no sheet")
+
+    @property
+    def performances(self) -> str:
+        return f"data/{self.prefix}performances.json"
+
+    @property
+    def teamperformances(self) -> str:
+        return f"data/{self.prefix}teamperformances.json"
+
+    @property
+    def teams(self) -> str:
+        return f"data/{self.prefix}_teams.json"
+
+    def endpoints(self) -> dict[str, str]:
+        """Returns the cache filename and url of every endpoint of the
+        league."""
+        return {
+            self.performances: f"{API}/performances/{self.api}",
+            self.teamperformances: f"{API}/teamperformances/{self.api}",
+            self.teams: f"{API}/teams/{self.api}",
+        }
+
+
+def load_leagues(filename: str = "leagues.toml") -> tuple[list[League], int]:
+    """Reads the league registry.
+
+    Args:
+        filename (str, optional): Registry path. Defaults to
+            "leagues.toml".
+
+    Returns:
+        tuple[list[League], int]: Enabled leagues and the number of
+            processes to run them in
+    """
+    with open(filename, "rb") as f:
+        config = tomllib.load(f)
+    leagues = [
+        League(name, **options)
+        for name, options in config.get("leagues", {}).items()
+    ]
+    processes = config.get("runner", {}).get("processes", len(leagues))
+    return [league for league in leagues if league.enabled], processes
+
+
+class PrefixedOutput:
+    def __init__(self, stream, prefix: str):
+        """Prefixes every line written to stream, so that the output of
+        leagues running side by side can be told apart.
+
+        Args:
+            stream: Stream to write to, e.g. sys.stdout
+            prefix (str): Prefix for every line
+        """
+        self.stream = stream
+        self.prefix = prefix
+        self.buffer = ""
+        self.lock = threading.Lock()
+
+    def write(self, text: str) -> int:
+        with self.lock:
+            self.buffer += text
+            *lines, self.buffer = self.buffer.split("\n")
+            for line in lines:
+                self.stream.write(f"{self.prefix}{line}\n")
+        return len(text)
+
+    def flush(self) -> None:
+        with self.lock:
+            if self.buffer != "":
+                self.stream.write(f"{self.prefix}{self.buffer}\n")
+                self.buffer = ""
+        self.stream.flush()
+
+
+def work(
+    target: Callable[[League, int], Any], league: League, processes: int
+) -> tuple[Any, float]:
+    """Runs target for one league inside a worker process.
+
+    Args:
+        target (Callable[[League, int], Any]): Processes a league, given
+            the number of leagues sharing quotas with it
+        league (League): League to process
+        processes (int): Number of worker processes
+
+    Returns:
+        tuple[Any, float]: Result of target and its run time in seconds
+    """
+    sys.stdout = PrefixedOutput(sys.__stdout__, f"[{league.name}] ")
+    start = time.perf_counter()
+    try:
+        return target(league, processes), time.perf_counter() - start
+    finally:
+        sys.stdout.flush()
+
+
+def run_leagues(
+    leagues: list[League],
+    target: Callable[[League, int], Any],
+    processes: Optional[int] = None,
+) -> dict[str, Any]:
+    """Processes every league in its own worker process.
+
+    A failing league is reported and does not stop the others.
+
+    Args:
+        leagues (list[League]): Leagues to process
+        target (Callable[[League, int], Any]): Module-level function that
+            processes one league
+        processes (int, optional): Leagues processed at once. Defaults to
+            one process per league.
+
+    Returns:
+        dict[str, Any]: League name to the result of target, for every
+            league that succeeded
+    """
+    if len(leagues) == 0:
+        return {}
+    processes = min(processes or len(leagues), len(leagues))
+    print(f"Processing {len(leagues)} leagues in {processes} processes...")
+
+    results = {}
+    failed = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {
+            pool.submit(work, target, league, processes): league
+            for league in leagues
+        }
+        for future in as_completed(futures):
+            league = futures[future]
+            try:
+                result, elapsed = future.result()
+            except Exception:
+                failed.append(league.name)
+                print(f"[{league.name}] failed:")
+                traceback.print_exc()
+                continue
+            results[league.name] = result
+            print(f"[{league.name}] done in {elapsed:.1f} s")
+
+    if len(failed) > 0:
+        print(f"Failed leagues: {', '.join(failed)}")
+    return results
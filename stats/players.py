@@ -1,150 +1,306 @@
 import json
+import operator
 import pandas
+from stats.cache import FrameCache
+from stats.counters import CounterTable
+from stats.formatting import IMAGE, PERCENT, ROUND2, format_columns
+from collections import Counter
 from stats.roster import Roster
+from stats.store import PerformanceStore
+from stats.teamdirectory import TeamDirectory
+
+# Counters that are plain sums of a performance field of the same name
+SUMS = [
+    "time",
+    "kills",
+    "deaths",
+    "assists",
+    "cs",
+    "gold",
+    "xp",
+    "dmg",
+    "vs",
+    "w",
+    "cw",
+    "wc",
+    "solokills",
+    "doubles",
+    "triples",
+    "quadras",
+    "pentas",
+    "gold8",
+    "xp8",
+    "cs8",
+    "gold14",
+    "xp14",
+    "cs14",
+    "gd8",
+    "xpd8",
+    "csd8",
+    "gd14",
+    "xpd14",
+    "csd14",
+    "k15",
+    "a15",
+    "d15",
+    "k25",
+    "a25",
+    "d25",
+    "jgmins",
+    "tk",
+    "td",
+    "ta",
+    "tgold",
+    "tdmg",
+    "tvs",
+    "tk15",
+    "td15",
+    "ta15",
+    "tk25",
+    "td25",
+    "ta25",
+]
+
+# Counters that count the performances where a flag is set
+FLAGS = ["fb", "fbv"]
+
+# Every counter kept per player, in output order
+COLUMNS = [
+    "n",
+    "wins",
+    "losses",
+    "time",
+    "kills",
+    "deaths",
+    "assists",
+    "cs",
+    "gold",
+    "xp",
+    "dmg",
+    "vs",
+    "w",
+    "cw",
+    "wc",
+    "solokills",
+    "fb",
+    "fbv",
+    "doubles",
+    "triples",
+    "quadras",
+    "pentas",
+    "gold8",
+    "xp8",
+    "cs8",
+    "gold14",
+    "xp14",
+    "cs14",
+    "gd8",
+    "xpd8",
+    "csd8",
+    "gd14",
+    "xpd14",
+    "csd14",
+    "k15",
+    "a15",
+    "d15",
+    "k25",
+    "a25",
+    "d25",
+    "jgmins",
+    "tk",
+    "td",
+    "ta",
+    "tgold",
+    "tdmg",
+    "tvs",
+    "tk15",
+    "td15",
+    "ta15",
+    "tk25",
+    "td25",
+    "ta25",
+]
+
+# Columns of the Players tab: (display name, source column, format kind)
+DISPLAY = [
+    ("Team", "logo", IMAGE),
+    ("Team Code", "team", None),
+    ("Name", "name", None),
+    ("Role", "role", None),
+    ("Games", "n", None),
+    ("Win Rate", "win%", PERCENT),
+    ("KDA", "kda", ROUND2),
+    ("Kills", "kills", None),
+    ("Deaths", "deaths", None),
+    ("Assists", "assists", None),
+    ("Avg Kills", "k/g", ROUND2),
+    ("Avg Deaths", "d/g", ROUND2),
+    ("Avg Assists", "a/g", ROUND2),
+    ("CS/min", "cs/m", ROUND2),
+    ("Gold/min", "g/m", ROUND2),
+    ("Gold%", "gold%", PERCENT),
+    ("KP%", "kp", PERCENT),
+    ("JP%", "jp%", PERCENT),
+    ("DMG%", "dmg%", PERCENT),
+    ("DMG/Gold", "dmg/gold", ROUND2),
+    ("DMG/min", "dmg/m", ROUND2),
+    ("VS/min", "vs/m", ROUND2),
+    ("W/min", "w/m", ROUND2),
+    ("WC/min", "wc/m", ROUND2),
+    ("CW/min", "cw/m", ROUND2),
+    ("VS%", "vs%", PERCENT),
+    ("GD@8", "gd8/g", ROUND2),
+    ("CSD@8", "csd8/g", ROUND2),
+    ("XPD@8", "xpd8/g", ROUND2),
+    ("GD@14", "gd14/g", ROUND2),
+    ("CSD@14", "csd14/g", ROUND2),
+    ("XPD@14", "xpd14/g", ROUND2),
+    ("K+A@15", "ka15/g", ROUND2),
+    ("KP%@15", "kp15", PERCENT),
+    ("K+A@25", "ka25/g", ROUND2),
+    ("KP%@25", "kp25", PERCENT),
+    ("FB%", "fb%", PERCENT),
+    ("FB Victim", "fbv%", PERCENT),
+    ("Kill%", "kill%", PERCENT),
+    ("Death%", "death%", PERCENT),
+    ("Solo Kills", "solokills", None),
+    ("Doubles", "doubles", None),
+    ("Triples", "triples", None),
+    ("Quadras", "quadras", None),
+    ("Pentakills", "pentas", None),
+]
 
 
 class Players:
+    # Raw counters saved by stats.checkpoint, everything else is derived
+    CHECKPOINT = ["counters", "picks"]
+
     def __init__(self, data: dict = None, teams: dict = None):
         """Initializes champion stats, can process data from
         dict[matchId, MatchDTO] from Riot Games match-v5 API
 
         Args:
-            data (dict, optional): _description_. Defaults to None.
+            data (dict, optional): Performances or a PerformanceStore.
+                Defaults to None.
+            teams (dict, optional): Team metadata or a TeamDirectory.
+                Defaults to None.
         """
-        self.players = {}
-        self.teams = teams
+        self.counters = CounterTable(["puuid", "team", "role"], COLUMNS)
+        # jgmins is None for players who never jungled
+        sums = [counter for counter in SUMS if counter != "jgmins"]
+        self.positions = self.counters.positions(
+            ["n", "wins", "losses"] + sums + ["jgmins"] + FLAGS
+        )
+        self.sums = operator.itemgetter(*sums)
+        self.flags = operator.itemgetter(*FLAGS)
+        self.cache = FrameCache()
+        self.picks = Counter()
+        self.teams = TeamDirectory.of(teams)
         self.roster = Roster()
-        self.roster.load_data()
         if data is not None:
             self.add_all_performances(data)
 
-    def verify_player(self, puuid, team, role):
+    def verify_player(self, puuid, team, role) -> int:
         key = "" + puuid + team + role
-        if key not in self.players:
-            self.players[key] = {
-                "puuid": puuid,
-                "team": team,
-                "role": role,
-                "n": 0,
-                "wins": 0,
-                "losses": 0,
-                "time": 0,
-                "kills": 0,
-                "deaths": 0,
-                "assists": 0,
-                "cs": 0,
-                "gold": 0,
-                "xp": 0,
-                "dmg": 0,
-                "vs": 0,
-                "w": 0,
-                "cw": 0,
-                "wc": 0,
-                "solokills": 0,
-                "fb": 0,
-                "fbv": 0,
-                "doubles": 0,
-                "triples": 0,
-                "quadras": 0,
-                "pentas": 0,
-                "gold8": 0,
-                "xp8": 0,
-                "cs8": 0,
-                "gold14": 0,
-                "xp14": 0,
-                "cs14": 0,
-                "gd8": 0,
-                "xpd8": 0,
-                "csd8": 0,
-                "gd14": 0,
-                "xpd14": 0,
-                "csd14": 0,
-                "k15": 0,
-                "a15": 0,
-                "d15": 0,
-                "k25": 0,
-                "a25": 0,
-                "d25": 0,
-                "jgmins": 0,
-                "tk": 0,
-                "td": 0,
-                "ta": 0,
-                "tgold": 0,
-                "tdmg": 0,
-                "tvs": 0,
-                "tk15": 0,
-                "td15": 0,
-                "ta15": 0,
-                "tk25": 0,
-                "td25": 0,
-                "ta25": 0,
-                "picks": {},
-            }
+        return self.counters.row(key, (puuid, team, role))
 
     def add_performance(self, p):
+        self.cache.invalidate()
         key = "" + p["puuid"] + p["team"] + p["role"]
-        d = self.players[key]
-        d["n"] += 1
-        d["wins" if p["win"] else "losses"] += 1
-        d["time"] += p["time"]
-        d["kills"] += p["kills"]
-        d["deaths"] += p["deaths"]
-        d["assists"] += p["assists"]
-        d["cs"] += p["cs"]
-        d["gold"] += p["gold"]
-        d["xp"] += p["xp"]
-        d["dmg"] += p["dmg"]
-        d["vs"] += p["vs"]
-        d["w"] += p["w"]
-        d["cw"] += p["cw"]
-        d["wc"] += p["wc"]
-        d["solokills"] += p["solokills"]
-        d["fb"] += 1 if p["fb"] else 0
-        d["fbv"] += 1 if p["fbv"] else 0
-        d["doubles"] += p["doubles"]
-        d["triples"] += p["triples"]
-        d["quadras"] += p["quadras"]
-        d["pentas"] += p["pentas"]
-        d["gold8"] += p["gold8"]
-        d["xp8"] += p["xp8"]
-        d["cs8"] += p["cs8"]
-        d["gold14"] += p["gold14"]
-        d["xp14"] += p["xp14"]
-        d["cs14"] += p["cs14"]
-        d["gd8"] += p["gd8"]
-        d["xpd8"] += p["xpd8"]
-        d["csd8"] += p["csd8"]
-        d["gd14"] += p["gd14"]
-        d["xpd14"] += p["xpd14"]
-        d["csd14"] += p["csd14"]
-        d["k15"] += p["k15"]
-        d["a15"] += p["a15"]
-        d["d15"] += p["d15"]
-        d["k25"] += p["k25"]
-        d["a25"] += p["a25"]
-        d["d25"] += p["d25"]
-        d["jgmins"] += p["jgmins"] if p["jgmins"] is not None else 0
-        d["tk"] += p["tk"]
-        d["td"] += p["td"]
-        d["ta"] += p["ta"]
-        d["tgold"] += p["tgold"]
-        d["tdmg"] += p["tdmg"]
-        d["tvs"] += p["tvs"]
-        d["tk15"] += p["tk15"]
-        d["td15"] += p["td15"]
-        d["ta15"] += p["ta15"]
-        d["tk25"] += p["tk25"]
-        d["td25"] += p["td25"]
-        d["ta25"] += p["ta25"]
-        if p["champid"] not in d["picks"]:
-            d["picks"][p["champid"]] = 1
-        else:
-            d["picks"][p["champid"]] += 1
+        win = p["win"]
+        self.counters.add(
+            self.counters.ids[key],
+            self.positions,
+            (
+                1,
+                win,
+                not win,
+                *self.sums(p),
+                p["jgmins"] or 0,
+                *map(bool, self.flags(p)),
+            ),
+        )
+        self.picks[(key, p["champid"])] += 1
 
     def add_all_performances(self, data):
-        for p in data:
-            self.verify_player(p["puuid"], p["team"], p["role"])
-            self.add_performance(p)
+        if isinstance(data, PerformanceStore):
+            frame = data.performances
+        else:
+            frame = PerformanceStore.frame(data)
+        self.add_frame(frame)
+
+    def add_frame(self, frame: pandas.DataFrame) -> None:
+        """Adds a batch of performances with one grouped sum over
+        (puuid, team, role).
+
+        Produces the same counters as calling add_performance for every row.
+
+        Args:
+            frame (pandas.DataFrame): Performances, one row each
+        """
+        if len(frame) == 0:
+            return
+        self.cache.invalidate()
+
+        win = frame["win"].astype(bool)
+
+        counters = pandas.DataFrame(
+            {
+                "puuid": frame["puuid"].astype(object),
+                "team": frame["team"].astype(object),
+                "role": frame["role"].astype(object),
+                "champid": frame["champid"],
+                "n": 1,
+                "wins": win,
+                "losses": ~win,
+            }
+        )
+        for counter in SUMS:
+            counters[counter] = frame[counter]
+        counters["jgmins"] = counters["jgmins"].fillna(0)
+        for counter in FLAGS:
+            counters[counter] = frame[counter].astype(bool)
+
+        keys = ["puuid", "team", "role"]
+        totals = (
+            counters.drop(columns="champid").groupby(keys, sort=False).sum()
+        )
+        self.counters.add_rows(
+            [self.verify_player(*key) for key in totals.index],
+            self.counters.positions(totals.columns),
+            totals.to_numpy(dtype="float64"),
+        )
+
+        picks = counters.groupby(keys + ["champid"], sort=False).size()
+        for (puuid, team, role, champid), count in picks.items():
+            self.picks[("" + puuid + team + role, champid)] += count
+
+    def subtract(self, other: "Players") -> None:
+        """Takes away performances counted by other, e.g. the old rows of a
+        corrected match.
+
+        Args:
+            other (Players): Stats of performances counted here before
+        """
+        self.cache.invalidate()
+        self.counters.subtract(other.counters)
+        self.picks.subtract(other.picks)
+        self.picks = +self.picks
+
+    def pick_matrix(self) -> pandas.DataFrame:
+        """Champion pick counts per player.
+
+        Returns:
+            pandas.DataFrame: Sparse player x champion count matrix, indexed
+                by player key with one column per championId
+        """
+        if len(self.picks) == 0:
+            return pandas.DataFrame(dtype=pandas.SparseDtype("int64", 0))
+        return (
+            pandas.Series(self.picks, dtype="int64")
+            .unstack(fill_value=0)
+            .astype(pandas.SparseDtype("int64", 0))
+        )
 
     def dump_data(self, filename: str = "output.json") -> None:
         """Dumps champion stats dict to json file.
@@ -156,9 +312,18 @@ class Players:
 
         print(f"Dumping data to {filename}")
         with open(filename, "w") as f:
-            json.dump(self.players, f, indent=4)
+            json.dump(self.counters.to_dict(), f, indent=4)
 
     def dataframe(self) -> pandas.DataFrame:
+        """Outputs the summary dataframe, rebuilt only after new data is
+        added
+
+        Returns:
+            pandas.DataFrame: Copy of the cached dataframe
+        """
+        return self.cache.get(self.build_dataframe)
+
+    def build_dataframe(self) -> pandas.DataFrame:
         """Outputs champion stat summary as a dataframe
 
         Returns:
@@ -166,27 +331,7 @@ class Players:
         """
         print("Exporting dataframe...")
 
-        def get_property(team: str, property: str, teams: dict[str, any]):
-            if team == "":
-                return ""
-            try:
-                return list(filter(lambda item: item["code"] == team, teams))[
-                    0
-                ][property]
-            except IndexError:
-                print(json.dumps(teams, indent=4))
-                print(team)
-                raise IndexError
-
-        def percent(column):
-            return column.apply(
-                lambda x: "{:.0%}".format(x) if x != "" else ""
-            )
-
-        def time(x):
-            return f"{x.components.hours:02d}:{x.components.minutes:02d}:{x.components.seconds:02d}"
-
-        df = pandas.DataFrame().from_records(list(self.players.values()))
+        df = self.counters.frame()
 
         df["kda"] = (df["kills"] + df["assists"]) / df["deaths"]
         df["dmg/gold"] = df["dmg"] / df["gold"]
@@ -230,63 +375,23 @@ class Players:
 
         df["role"] = df["role"].apply(lambda x: roles[x])
 
-        nf = pandas.DataFrame()
+        df["win%"] = df["wins"] / df["n"]
+        df["logo"] = self.teams.map_logos(df["team"])
 
-        nf["Team"] = df["team"].apply(
-            lambda x: f'=IMAGE("{get_property(x, "logo", self.teams)}")'
-        )
-        nf["Team Code"] = df["team"]
-
-        nf["Name"] = df["puuid"].apply(self.roster.get_name)
+        self.roster.prefetch(df["puuid"])
+        df["name"] = df["puuid"].apply(self.roster.get_name)
         self.roster.dump_data()
 
-        nf["Role"] = df["role"]
-        nf["Games"] = df["n"]
-        nf["Win Rate"] = percent(df["wins"] / df["n"])
-        nf["KDA"] = df["kda"].apply(lambda x: round(x, 2))
-        nf["Kills"] = df["kills"]
-        nf["Deaths"] = df["deaths"]
-        nf["Assists"] = df["assists"]
-        nf["Avg Kills"] = df["k/g"].apply(lambda x: round(x, 2))
-        nf["Avg Deaths"] = df["d/g"].apply(lambda x: round(x, 2))
-        nf["Avg Assists"] = df["a/g"].apply(lambda x: round(x, 2))
-        nf["CS/min"] = df["cs/m"].apply(lambda x: round(x, 2))
-        nf["Gold/min"] = df["g/m"].apply(lambda x: round(x, 2))
-        nf["Gold%"] = percent(df["gold%"])
-        nf["KP%"] = percent(df["kp"])
-        nf["JP%"] = percent(df["jp%"])
-        nf["DMG%"] = percent(df["dmg%"])
-        nf["DMG/Gold"] = df["dmg/gold"].apply(lambda x: round(x, 2))
-        nf["DMG/min"] = df["dmg/m"].apply(lambda x: round(x, 2))
-        nf["VS/min"] = df["vs/m"].apply(lambda x: round(x, 2))
-        nf["W/min"] = df["w/m"].apply(lambda x: round(x, 2))
-        nf["WC/min"] = df["wc/m"].apply(lambda x: round(x, 2))
-        nf["CW/min"] = df["cw/m"].apply(lambda x: round(x, 2))
-        nf["VS%"] = percent(df["vs%"])
-        nf["GD@8"] = df["gd8/g"].apply(lambda x: round(x, 2))
-        nf["CSD@8"] = df["csd8/g"].apply(lambda x: round(x, 2))
-        nf["XPD@8"] = df["xpd8/g"].apply(lambda x: round(x, 2))
-        nf["GD@14"] = df["gd14/g"].apply(lambda x: round(x, 2))
-        nf["CSD@14"] = df["csd14/g"].apply(lambda x: round(x, 2))
-        nf["XPD@14"] = df["xpd14/g"].apply(lambda x: round(x, 2))
-        nf["K+A@15"] = df["ka15/g"].apply(lambda x: round(x, 2))
-        nf["KP%@15"] = percent(df["kp15"])
-        nf["K+A@25"] = df["ka25/g"].apply(lambda x: round(x, 2))
-        nf["KP%@25"] = percent(df["kp25"])
-        nf["FB%"] = percent(df["fb%"])
-        nf["FB Victim"] = percent(df["fbv%"])
-        nf["Kill%"] = percent(df["kill%"])
-        nf["Death%"] = percent(df["death%"])
-        nf["Solo Kills"] = df["solokills"]
-        nf["Doubles"] = df["doubles"]
-        nf["Triples"] = df["triples"]
-        nf["Quadras"] = df["quadras"]
-        nf["Pentakills"] = df["pentas"]
-
-        nf = nf.sort_values(
-            ["Kills", "Games", "Win Rate"],
-            ascending=[False, False, False],
-            ignore_index=True,
+        nf = format_columns(df, DISPLAY)
+        # Ties are ordered by player, not by when the player was first seen
+        nf = (
+            nf.assign(puuid=df["puuid"])
+            .sort_values(
+                ["Kills", "Games", "Win Rate", "Team Code", "Role", "puuid"],
+                ascending=[False, False, False, True, True, True],
+                ignore_index=True,
+            )
+            .drop(columns="puuid")
         )
         nf.replace(float("inf"), "Perfect", inplace=True)
 
@@ -0,0 +1,227 @@
+import contextlib
+import cProfile
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from typing import Any, Iterator, Optional
+
+# Functions and allocation sites listed for a captured stage
+TOP = 20
+
+
+class Profiler:
+    def __init__(
+        self,
+        enabled: bool = False,
+        name: str = "",
+        capture: Optional[str] = None,
+        memory: bool = False,
+        directory: str = "data",
+    ):
+        """Times named stages of a run, such as download, aggregate or
+        sheets.
+
+        Stages nest: a stage entered inside another is recorded under a
+        path like "teampage/roster". Stages entered on a worker thread
+        start their own path. A disabled profiler records nothing.
+
+        Args:
+            enabled (bool, optional): Record stages. Defaults to False.
+            name (str, optional): Name of the run, e.g. the league name,
+                used in capture filenames. Defaults to "".
+            capture (str, optional): Stage name or path to run under
+                cProfile the first time it is entered. Defaults to None.
+            memory (bool, optional): Trace allocations of the captured
+                stage with tracemalloc. Defaults to False.
+            directory (str, optional): Directory of the cProfile dumps.
+                Defaults to "data".
+        """
+        self.enabled = enabled
+        self.name = name
+        self.capture = capture
+        self.memory = memory
+        self.directory = directory
+        self.records = []
+        self.captures = []
+        self.captured = False
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.perf_counter()
+
+    @contextlib.contextmanager
+    def stage(self, name: str, team: Optional[str] = None) -> Iterator[None]:
+        """Times the body of a with block as a stage.
+
+        Args:
+            name (str): Stage name
+            team (str, optional): Team the stage works on, inherited by
+                nested stages. Defaults to None.
+        """
+        if not self.enabled:
+            yield
+            return
+        parent = getattr(self.local, "stack", ())
+        path = name
+        if len(parent) > 0:
+            path = f"{parent[-1][0]}/{name}"
+            team = team if team is not None else parent[-1][1]
+        self.local.stack = parent + ((path, team),)
+
+        with self.lock:
+            capture = not self.captured and self.capture in (name, path)
+            self.captured = self.captured or capture
+        profile = self.begin_capture() if capture else None
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            if profile is not None:
+                self.end_capture(profile, path, team, seconds)
+            self.local.stack = parent
+            with self.lock:
+                self.records.append((path, team, seconds))
+
+    def begin_capture(self) -> cProfile.Profile:
+        if self.memory:
+            tracemalloc.start()
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def end_capture(
+        self,
+        profile: cProfile.Profile,
+        path: str,
+        team: Optional[str],
+        seconds: float,
+    ) -> None:
+        """Saves the cProfile dump of a captured stage and summarizes it,
+        with its allocations if traced, in the report."""
+        profile.disable()
+        os.makedirs(self.directory, exist_ok=True)
+        parts = [self.name, path.replace("/", "-")]
+        filename = os.path.join(
+            self.directory,
+            "profile-" + "-".join(part for part in parts if part) + ".prof",
+        )
+        profile.dump_stats(filename)
+
+        # pstats rows are (primitive calls, calls, own, cumulative, callers)
+        stats = pstats.Stats(profile).stats
+        functions = []
+        for (file, line, function), row in sorted(
+            stats.items(), key=lambda item: -item[1][3]
+        )[:TOP]:
+            functions.append(
+                {
+                    "function": f"{file}:{line}({function})",
+                    "calls": row[1],
+                    "seconds": round(row[3], 4),
+                    "own": round(row[2], 4),
+                }
+            )
+        capture = {
+            "stage": path,
+            "team": team,
+            "seconds": round(seconds, 4),
+            "profile": filename,
+            "functions": functions,
+        }
+
+        if self.memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            capture["memory"] = {
+                "current": current,
+                "peak": peak,
+                "top": [
+                    {
+                        "line": f"{stat.traceback[0].filename}:"
+                        f"{stat.traceback[0].lineno}",
+                        "size": stat.size,
+                        "count": stat.count,
+                    }
+                    for stat in snapshot.statistics("lineno")[:TOP]
+                ],
+            }
+        print(f"Captured {path} profile in {filename}")
+        with self.lock:
+            self.captures.append(capture)
+
+    def report(self) -> dict[str, Any]:
+        """Summarizes the recorded stages.
+
+        Returns:
+            dict[str, Any]: Total seconds, calls and seconds of every stage
+                path, seconds of every stage path per team, and captures
+        """
+        stages = {}
+        teams = {}
+        with self.lock:
+            records = list(self.records)
+            captures = list(self.captures)
+        for path, team, seconds in records:
+            stage = stages.setdefault(path, {"calls": 0, "seconds": 0.0})
+            stage["calls"] += 1
+            stage["seconds"] += seconds
+            if team is not None:
+                team_stages = teams.setdefault(team, {})
+                team_stages[path] = team_stages.get(path, 0.0) + seconds
+
+        return {
+            "seconds": round(time.perf_counter() - self.started, 4),
+            "stages": {
+                path: {
+                    "calls": stage["calls"],
+                    "seconds": round(stage["seconds"], 4),
+                }
+                for path, stage in sorted(stages.items())
+            },
+            "teams": {
+                team: {
+                    path: round(seconds, 4)
+                    for path, seconds in sorted(team_stages.items())
+                }
+                for team, team_stages in sorted(teams.items())
+            },
+            "captures": captures,
+        }
+
+
+# Used by stage(), replaced by start() in a profiled process
+PROFILER = Profiler()
+
+
+def start(
+    name: str = "",
+    capture: Optional[str] = None,
+    memory: bool = False,
+    directory: str = "data",
+) -> Profiler:
+    """Turns on stage timing for this process.
+
+    Args:
+        name (str, optional): Name of the run. Defaults to "".
+        capture (str, optional): Stage to run under cProfile. Defaults to
+            None.
+        memory (bool, optional): Trace allocations of the captured stage.
+            Defaults to False.
+        directory (str, optional): Directory of the cProfile dumps.
+            Defaults to "data".
+
+    Returns:
+        Profiler: The process profiler
+    """
+    global PROFILER
+    PROFILER = Profiler(True, name, capture, memory, directory)
+    return PROFILER
+
+
+def stage(name: str, team: Optional[str] = None):
+    """Times a with block as a stage of the process profiler."""
+    return PROFILER.stage(name, team)
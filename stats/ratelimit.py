@@ -0,0 +1,67 @@
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, capacity: int, period: float):
+        """Allows at most capacity requests per period seconds, refilled
+        continuously.
+
+        Args:
+            capacity (int): Requests allowed per period
+            period (float): Length of the period in seconds
+        """
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Blocks until a token is available and takes it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + (now - self.updated) * self.rate,
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimiter:
+    def __init__(self, limits: list[tuple[int, float]]):
+        """Combines several token buckets, e.g. per-second and per-two-minute
+        limits, and lets callers pause everyone after a 429.
+
+        Args:
+            limits (list[tuple[int, float]]): (requests, seconds) pairs
+        """
+        self.buckets = [TokenBucket(n, period) for n, period in limits]
+        self.resume = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Blocks until every bucket allows another request."""
+        while True:
+            with self.lock:
+                wait = self.resume - time.monotonic()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        for bucket in self.buckets:
+            bucket.acquire()
+
+    def pause(self, seconds: float) -> None:
+        """Holds back all callers for the given number of seconds.
+
+        Args:
+            seconds (float): Time to wait, e.g. from a Retry-After header
+        """
+        with self.lock:
+            self.resume = max(self.resume, time.monotonic() + seconds)
@@ -1,16 +1,56 @@
 import requests
-import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from stats.profiler import stage
+from stats.ratelimit import RateLimiter
+from stats.rosterstore import default_store
 
 load_dotenv(os.path.join(os.path.abspath(os.path.dirname(__file__)), ".env"))
 
 RIOT_KEY = os.getenv("RIOT_KEY")
 
+# Riot development key limits as (requests, seconds)
+RIOT_LIMITS = [(20, 1), (100, 120)]
+MAX_RETRIES = 5
+
+# Names verified longer ago than this are refreshed by refresh_stale
+ROSTER_TTL = 7 * 24 * 60 * 60
+# Stale names refreshed per run, the rest wait for later runs
+ROSTER_REFRESH_LIMIT = int(os.getenv("ROSTER_REFRESH_LIMIT", "100"))
+# Seconds main waits for the refresh before exiting without it
+ROSTER_REFRESH_TIMEOUT = float(os.getenv("ROSTER_REFRESH_TIMEOUT", "150"))
+
+# Shared by every Roster so concurrent lookups stay under the key's limits
+LIMITER = RateLimiter(RIOT_LIMITS)
+
+
+def share_quota(processes: int) -> None:
+    """Gives this process its share of the key's limits when several
+    processes call Riot with the same key.
+
+    Args:
+        processes (int): Number of processes sharing the key
+    """
+    global LIMITER
+    LIMITER = RateLimiter(
+        [(max(1, n // processes), seconds) for n, seconds in RIOT_LIMITS]
+    )
+
 
 class Roster:
-    def __init__(self, data: dict = None):
+    def __init__(self, data: dict = None, store=None):
+        """Caches summoner names by puuid.
+
+        Args:
+            data (dict, optional): Unused. Defaults to None.
+            store (optional): Persistent roster store, JsonRosterStore or
+                SqliteRosterStore. Defaults to the one picked by
+                ROSTER_STORE.
+        """
         self.rosters = {}
+        self.store = store if store is not None else default_store()
 
     def get_name(self, puuid: str):
         if type(puuid) is not str:
@@ -18,41 +58,119 @@ class Roster:
         if puuid == "":
             return puuid
 
-        if puuid not in self.rosters.keys():
-            self.rosters[puuid] = {
-                "summonerName": self.fetch_summoner(puuid),
-                "puuids": [puuid],
-            }
+        if not self.known(puuid):
+            self.add(puuid, self.fetch_summoner(puuid))
 
         return self.rosters[puuid]["summonerName"]
 
-    def dump_data(self, filename: str = "data/rosters.json") -> None:
-        """Dumps champion stats dict to json file.
+    def known(self, puuid: str) -> bool:
+        """Checks memory, then the store, for a puuid.
 
-        Args:S
-            filename (str, optional): File to output to. Defaults to
-                "output.json".
+        Args:
+            puuid (str): puuid to look up
+
+        Returns:
+            bool: True if the name is known without calling Riot
         """
+        if puuid in self.rosters.keys():
+            return True
+        entry = self.store.get(puuid)
+        if entry is None:
+            return False
+        self.rosters[puuid] = entry
+        return True
 
-        print(f"Dumping data to {filename}")
-        with open(filename, "w") as f:
-            json.dump(self.rosters, f, indent=4)
+    def add(self, puuid: str, name: str) -> None:
+        self.rosters[puuid] = {"summonerName": name, "puuids": [puuid]}
+        self.store.put(puuid, self.rosters[puuid])
 
-    def load_data(self, filename: str = "data/rosters.json") -> None:
-        """Loads roster data from json file
+    def prefetch(self, puuids, workers: int = 8) -> None:
+        """Resolves every unknown puuid concurrently so later get_name calls
+        are plain dict reads.
 
         Args:
-            filename (str, optional): File path. Defaults to "data/rosters.json".
+            puuids (Iterable[str]): puuids to resolve, duplicates allowed
+            workers (int, optional): Concurrent requests. Defaults to 8.
         """
-        if not os.path.exists(filename):
-            return
-        print(f"Loading data from {filename}")
-        with open(filename, "r", encoding="utf-8") as f:
-            self.rosters = json.load(f)
+        with stage("roster"):
+            missing = [
+                puuid
+                for puuid in dict.fromkeys(puuids)
+                if type(puuid) is str and puuid != "" and not self.known(puuid)
+            ]
+            if len(missing) == 0:
+                return
+
+            print(f"Fetching {len(missing)} summoners...")
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                names = pool.map(self.fetch_summoner, missing)
+                for puuid, name in zip(missing, names):
+                    self.add(puuid, name)
+
+    def refresh_stale(
+        self,
+        ttl: float = ROSTER_TTL,
+        limit: int = ROSTER_REFRESH_LIMIT,
+        workers: int = 2,
+    ) -> threading.Thread:
+        """Re-fetches the oldest names older than ttl on a background
+        thread.
+
+        A name that cannot be fetched is logged and left stale, so it is
+        tried again on a later run.
+
+        Args:
+            ttl (float, optional): Maximum age in seconds. Defaults to
+                ROSTER_TTL.
+            limit (int, optional): Names to refresh at most. Defaults to
+                ROSTER_REFRESH_LIMIT.
+            workers (int, optional): Concurrent requests. Defaults to 2.
+
+        Returns:
+            threading.Thread: The started daemon thread
+        """
+
+        def refresh_one(puuid: str) -> None:
+            try:
+                name = self.fetch_summoner(puuid)
+            except Exception as e:
+                print(f"Could not refresh {puuid}: {e}")
+                return
+            entry = self.store.get(puuid) or {"puuids": [puuid]}
+            entry["summonerName"] = name
+            self.store.put(puuid, entry)
+
+        def refresh():
+            stale = self.store.stale(ttl, limit)
+            if len(stale) == 0:
+                return
+            print(f"Refreshing {len(stale)} stale summoner names...")
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(refresh_one, stale))
+
+        thread = threading.Thread(target=refresh, daemon=True)
+        thread.start()
+        return thread
+
+    def dump_data(self) -> None:
+        """Writes pending roster changes to the store."""
+        self.store.flush()
+
+    def load_data(self) -> None:
+        """Loads every known roster entry from the store."""
+        self.rosters = self.store.load()
 
     def fetch_summoner(self, puuid: str) -> str:
         print(f"Fetching {puuid}")
-        summoner = requests.get(
-            f"https://na1.api.riotgames.com/lol/summoner/v4/summoners/by-puuid/{puuid}?api_key={RIOT_KEY}"
-        ).json()
-        return summoner["name"]
+        for attempt in range(MAX_RETRIES):
+            LIMITER.acquire()
+            response = requests.get(
+                f"https://na1.api.riotgames.com/lol/summoner/v4/summoners/by-puuid/{puuid}?api_key={RIOT_KEY}"
+            )
+            if response.status_code != 429:
+                break
+            delay = float(response.headers.get("Retry-After", 2**attempt))
+            print(f"Rate limited, retrying in {delay} seconds")
+            LIMITER.pause(delay)
+        response.raise_for_status()
+        return response.json()["name"]
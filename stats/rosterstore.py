@@ -0,0 +1,221 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+# Set ROSTER_STORE=json to keep using data/rosters.json
+ROSTER_STORE = os.getenv("ROSTER_STORE", "sqlite")
+
+
+class JsonRosterStore:
+    def __init__(self, filename: str = "data/rosters.json"):
+        """Roster store backed by a single json file.
+
+        The file is only rewritten by flush(), and only if something
+        changed since it was loaded.
+
+        Args:
+            filename (str, optional): File path. Defaults to
+                "data/rosters.json".
+        """
+        self.filename = filename
+        self.rosters = None
+        self.dirty = False
+
+    def load(self) -> dict[str, dict[str, Any]]:
+        if self.rosters is None:
+            self.rosters = {}
+            if os.path.exists(self.filename):
+                print(f"Loading data from {self.filename}")
+                with open(self.filename, "r", encoding="utf-8") as f:
+                    self.rosters = json.load(f)
+        return dict(self.rosters)
+
+    def get(self, puuid: str) -> Optional[dict[str, Any]]:
+        self.load()
+        return self.rosters.get(puuid)
+
+    def put(self, puuid: str, entry: dict[str, Any]) -> None:
+        self.load()
+        self.rosters[puuid] = entry
+        self.dirty = True
+
+    def stale(self, ttl: float, limit: Optional[int] = None) -> list[str]:
+        # No verification times are kept in the json format
+        return []
+
+    def flush(self) -> None:
+        if not self.dirty:
+            return
+        print(f"Dumping data to {self.filename}")
+        with open(self.filename, "w") as f:
+            json.dump(self.rosters, f, indent=4)
+        self.dirty = False
+
+
+class SqliteRosterStore:
+    def __init__(
+        self,
+        filename: str = "data/rosters.db",
+        legacy: str = "data/rosters.json",
+    ):
+        """Roster store backed by SQLite, one row per puuid.
+
+        Every put() is an upsert of a single row, so concurrent league runs
+        never rewrite each other's data. Each row records when its name was
+        last verified against the Riot API. An existing json roster is
+        imported the first time the database is created.
+
+        Args:
+            filename (str, optional): Database path. Defaults to
+                "data/rosters.db".
+            legacy (str, optional): json roster to import into an empty
+                database. Defaults to "data/rosters.json".
+        """
+        self.filename = filename
+        self.legacy = legacy
+        self.lock = threading.Lock()
+        self.opening = threading.RLock()
+        self.connection = None
+
+    def connect(self) -> sqlite3.Connection:
+        """Opens the database on first use, creating its directory and
+        table, so that building a Roster does not touch the disk.
+
+        Returns:
+            sqlite3.Connection: Connection shared by every thread
+        """
+        with self.opening:
+            if self.connection is not None:
+                return self.connection
+            directory = os.path.dirname(self.filename)
+            if directory != "":
+                os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(
+                self.filename, timeout=30, check_same_thread=False
+            )
+            with self.lock, self.connection:
+                self.connection.execute("PRAGMA journal_mode=WAL")
+                self.connection.execute("""
+                    CREATE TABLE IF NOT EXISTS rosters (
+                        puuid TEXT PRIMARY KEY,
+                        summonerName TEXT,
+                        puuids TEXT,
+                        verified REAL
+                    )
+                    """)
+                empty = (
+                    self.connection.execute(
+                        "SELECT COUNT(*) FROM rosters"
+                    ).fetchone()[0]
+                    == 0
+                )
+            if (
+                empty
+                and self.legacy is not None
+                and os.path.exists(self.legacy)
+            ):
+                self.import_json(self.legacy)
+            return self.connection
+
+    def import_json(self, filename: str) -> None:
+        """Imports a json roster, treating its names as verified when the
+        file was last written.
+
+        Args:
+            filename (str): json roster path
+        """
+        print(f"Importing rosters from {filename} into {self.filename}")
+        with open(filename, "r", encoding="utf-8") as f:
+            rosters = json.load(f)
+        verified = os.path.getmtime(filename)
+        self.put_many(
+            [(puuid, entry, verified) for puuid, entry in rosters.items()]
+        )
+
+    def load(self) -> dict[str, dict[str, Any]]:
+        connection = self.connect()
+        with self.lock:
+            rows = connection.execute(
+                "SELECT puuid, summonerName, puuids FROM rosters"
+            ).fetchall()
+        return {
+            puuid: {"summonerName": name, "puuids": json.loads(puuids)}
+            for puuid, name, puuids in rows
+        }
+
+    def get(self, puuid: str) -> Optional[dict[str, Any]]:
+        connection = self.connect()
+        with self.lock:
+            row = connection.execute(
+                "SELECT summonerName, puuids FROM rosters WHERE puuid = ?",
+                (puuid,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"summonerName": row[0], "puuids": json.loads(row[1])}
+
+    def put(self, puuid: str, entry: dict[str, Any]) -> None:
+        self.put_many([(puuid, entry, time.time())])
+
+    def put_many(self, rows: list[tuple[str, dict[str, Any], float]]) -> None:
+        """Upserts (puuid, entry, verified) rows in one transaction.
+
+        Args:
+            rows (list[tuple[str, dict[str, Any], float]]): Rows to write
+        """
+        connection = self.connect()
+        with self.lock, connection:
+            connection.executemany(
+                """
+                INSERT INTO rosters (puuid, summonerName, puuids, verified)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(puuid) DO UPDATE SET
+                    summonerName = excluded.summonerName,
+                    puuids = excluded.puuids,
+                    verified = excluded.verified
+                """,
+                [
+                    (
+                        puuid,
+                        entry["summonerName"],
+                        json.dumps(entry["puuids"]),
+                        verified,
+                    )
+                    for puuid, entry, verified in rows
+                ],
+            )
+
+    def stale(self, ttl: float, limit: Optional[int] = None) -> list[str]:
+        """Returns puuids whose names were verified more than ttl seconds
+        ago.
+
+        Args:
+            ttl (float): Maximum age in seconds
+            limit (int, optional): Return at most this many. Defaults to
+                None, for all of them.
+
+        Returns:
+            list[str]: Stale puuids, oldest first
+        """
+        connection = self.connect()
+        with self.lock:
+            rows = connection.execute(
+                "SELECT puuid FROM rosters WHERE verified < ? "
+                "ORDER BY verified LIMIT ?",
+                (time.time() - ttl, -1 if limit is None else limit),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def flush(self) -> None:
+        # Every put is committed as it happens
+        pass
+
+
+def default_store():
+    """Returns the roster store selected by ROSTER_STORE."""
+    if ROSTER_STORE == "json":
+        return JsonRosterStore()
+    return SqliteRosterStore()
@@ -0,0 +1,450 @@
+import json
+import os
+import random
+import threading
+import time
+import pandas
+import pygsheets
+from googleapiclient.errors import HttpError
+from pygsheets.utils import format_addr
+from stats.profiler import stage
+from stats.ratelimit import RateLimiter
+from typing import Any, Callable
+
+# Set SHEETS_DIFF=0 to always rewrite full ranges
+DIFF = os.getenv("SHEETS_DIFF", "1") not in ("", "0")
+
+# Worksheets are written in full again after this many seconds, so values
+# edited by hand in the sheet are not kept forever by the diff
+FULL_WRITE_AFTER = float(os.getenv("SHEETS_FULL_WRITE_AFTER", "604800"))
+# Format of the published values cache, older caches are discarded
+PUBLISHED_VERSION = 2
+
+# Write requests per minute allowed by the Sheets API quota
+SHEETS_RATE = int(os.getenv("SHEETS_RATE", "60"))
+# Team pages rendered concurrently
+SHEETS_WORKERS = int(os.getenv("SHEETS_WORKERS", "4"))
+MAX_RETRIES = 8
+MAX_BACKOFF = 64
+# Retries of 5xx and connection errors inside every Sheets API call
+TRANSIENT_RETRIES = int(os.getenv("SHEETS_TRANSIENT_RETRIES", "3"))
+
+# Shared by every SheetWriter so parallel writers stay under the quota
+LIMITER = RateLimiter([(SHEETS_RATE, 60)])
+
+
+def share_quota(processes: int) -> None:
+    """Gives this process its share of the quota when several processes
+    write to Sheets with the same credentials.
+
+    Args:
+        processes (int): Number of processes sharing the quota
+    """
+    global LIMITER
+    LIMITER = RateLimiter([(max(1, SHEETS_RATE // processes), 60)])
+
+
+def grid(df: pandas.DataFrame, copy_head: bool = True) -> list[list[Any]]:
+    """Converts a DataFrame to the rows pygsheets' set_dataframe writes.
+
+    Args:
+        df (pandas.DataFrame): Table to convert
+        copy_head (bool, optional): Include the column names as the first
+            row. Defaults to True.
+
+    Returns:
+        list[list[Any]]: Rows of cell values
+    """
+    df = df.copy()
+    for column in df.select_dtypes("Int64"):
+        df[column] = df[column].astype("unicode").replace("<NA>", "NaN")
+    values = df.fillna("NaN").astype("unicode").values.tolist()
+    if copy_head:
+        values.insert(0, df.columns.tolist())
+    return values
+
+
+def rectangles(
+    cells: set[tuple[int, int]],
+) -> list[tuple[tuple[int, int], int, int]]:
+    """Covers a set of cells with rectangles that contain no other cells.
+
+    Changed cells in a row are joined into runs, and runs spanning the same
+    columns in consecutive rows are stacked.
+
+    Args:
+        cells (set[tuple[int, int]]): (row, column) of every changed cell
+
+    Returns:
+        list[tuple[tuple[int, int], int, int]]: (start, rows, cols) of each
+            rectangle
+    """
+    runs = []
+    for row, col in sorted(cells):
+        if len(runs) > 0 and runs[-1][0] == row and runs[-1][2] == col - 1:
+            runs[-1][2] = col
+        else:
+            runs.append([row, col, col])
+
+    open_spans = {}
+    done = []
+    for row, first, last in runs:
+        span = open_spans.get((first, last))
+        if span is not None and span[1] == row - 1:
+            span[1] = row
+            continue
+        if span is not None:
+            done.append((first, last, *span))
+        open_spans[(first, last)] = [row, row]
+    done.extend(
+        (first, last, *span) for (first, last), span in open_spans.items()
+    )
+
+    return [
+        ((top, first), bottom - top + 1, last - first + 1)
+        for first, last, top, bottom in sorted(
+            done, key=lambda r: (r[2], r[0])
+        )
+    ]
+
+
+def shrunk(
+    old: dict[str, list[int]], new: dict[tuple[int, int], tuple[int, int]]
+) -> set[tuple[int, int]]:
+    """Finds the cells of previously published blocks that the blocks now
+    written at the same start no longer cover.
+
+    Args:
+        old (dict[str, list[int]]): "row:col" of each published block's top
+            left cell to its [rows, cols]
+        new (dict[tuple[int, int], tuple[int, int]]): (row, column) of each
+            written block's top left cell to its (rows, cols)
+
+    Returns:
+        set[tuple[int, int]]: (row, column) of every cell left over
+    """
+    cells = set()
+    for key, (rows, cols) in old.items():
+        start = tuple(int(i) for i in key.split(":"))
+        if start not in new:
+            continue
+        new_rows, new_cols = new[start]
+        cells.update(
+            (start[0] + i, start[1] + j)
+            for i in range(rows)
+            for j in range(cols)
+            if i >= new_rows or j >= new_cols
+        )
+    return cells
+
+
+def a1_range(title: str, start: tuple[int, int], rows: int, cols: int) -> str:
+    """Builds an A1 range label including the worksheet title.
+
+    Args:
+        title (str): Title of the worksheet
+        start (tuple[int, int]): (row, column) of the top left cell, 1-based
+        rows (int): Number of rows
+        cols (int): Number of columns
+
+    Returns:
+        str: e.g. "'Team Name'!A1:C4"
+    """
+    title = title.replace("'", "''")
+    end = (start[0] + max(rows, 1) - 1, start[1] + max(cols, 1) - 1)
+    return (
+        f"'{title}'!{format_addr(tuple(start), output='label')}:"
+        f"{format_addr(end, output='label')}"
+    )
+
+
+class SheetWriter:
+    def __init__(
+        self,
+        spreadsheet: pygsheets.Spreadsheet,
+        parse=True,
+        diff: bool = DIFF,
+        directory: str = "data",
+        limiter: RateLimiter = None,
+        full: bool = None,
+    ):
+        """Collects value writes for a spreadsheet and sends them all in a
+        single batch update request.
+
+        In diff mode the values last published to each worksheet are kept in
+        data/sheets-<spreadsheet id>.json, and only cells that differ from
+        them are sent, grouped into rectangular ranges. When a block
+        written at the same start as before is smaller, the cells it no
+        longer covers are cleared. Sheets that were never published by this
+        writer, or not written in full for FULL_WRITE_AFTER seconds, are
+        written in full, and so is every sheet when the cache is missing or
+        unreadable. Cells edited by hand in the sheet are only overwritten
+        by these full writes.
+
+        Writers are safe to share between threads. Every request waits for
+        the shared rate limiter, and requests rejected with 429 are retried
+        with exponential backoff.
+
+        Args:
+            spreadsheet (pygsheets.Spreadsheet): Spreadsheet to write to
+            parse (bool, optional): Parse values as if typed by a user, so
+                that formulas like =IMAGE(...) work. Defaults to True.
+            diff (bool, optional): Only send changed cells. Defaults to
+                DIFF.
+            directory (str, optional): Directory of the published values
+                cache. Defaults to "data".
+            limiter (RateLimiter, optional): Limits write requests.
+                Defaults to the module's LIMITER.
+            full (bool, optional): Write every sheet in full. Defaults to
+                the SHEETS_FULL_WRITE environment variable.
+        """
+        self.spreadsheet = spreadsheet
+        self.parse = parse
+        self.diff = diff
+        if full is None:
+            full = os.getenv("SHEETS_FULL_WRITE", "") not in ("", "0")
+        self.full = full
+        self.filename = os.path.join(
+            directory, f"sheets-{spreadsheet.id}.json"
+        )
+        self.ranges = []
+        self.cells = {}
+        self.blocks = {}
+        self.published = None
+        self.requests = 0
+        self.limiter = limiter if limiter is not None else LIMITER
+        self.lock = threading.Lock()
+        self.publish_lock = threading.Lock()
+
+    def load_published(self) -> dict[str, dict[str, Any]]:
+        if self.published is not None:
+            return self.published
+        self.published = {}
+        if not os.path.exists(self.filename):
+            return self.published
+        try:
+            with open(self.filename, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except ValueError:
+            cache = {}
+        if cache.get("version") == PUBLISHED_VERSION:
+            self.published = cache["sheets"]
+        else:
+            print(f"Ignoring outdated {self.filename}, writing sheets in full")
+        return self.published
+
+    def set_value(
+        self, wks: pygsheets.Worksheet, addr: tuple[int, int], value: Any
+    ) -> None:
+        """Buffers a single cell, like wks.cell(addr).value = value.
+
+        Args:
+            wks (pygsheets.Worksheet): Worksheet to write to
+            addr (tuple[int, int]): (row, column) of the cell, 1-based
+            value (Any): New value
+        """
+        self.set_values(wks, addr, [[value]])
+
+    def set_values(
+        self,
+        wks: pygsheets.Worksheet,
+        start: tuple[int, int],
+        values: list[list[Any]],
+    ) -> None:
+        """Buffers a block of rows starting at start.
+
+        Args:
+            wks (pygsheets.Worksheet): Worksheet to write to
+            start (tuple[int, int]): (row, column) of the top left cell
+            values (list[list[Any]]): Rows of cell values
+        """
+        if len(values) == 0:
+            return
+        with self.lock:
+            cols = max(len(row) for row in values)
+            if self.diff:
+                cells = self.cells.setdefault(wks.title, {})
+                for i, row in enumerate(values):
+                    for j, value in enumerate(row):
+                        cells[(start[0] + i, start[1] + j)] = value
+                blocks = self.blocks.setdefault(wks.title, {})
+                blocks[tuple(start)] = (len(values), cols)
+                return
+            self.ranges.append(
+                (a1_range(wks.title, start, len(values), cols), values)
+            )
+
+    def set_dataframe(
+        self,
+        wks: pygsheets.Worksheet,
+        df: pandas.DataFrame,
+        start: tuple[int, int],
+        copy_head: bool = True,
+    ) -> None:
+        """Buffers a DataFrame, like wks.set_dataframe(df, start).
+
+        Args:
+            wks (pygsheets.Worksheet): Worksheet to write to
+            df (pandas.DataFrame): Table to write
+            start (tuple[int, int]): (row, column) of the top left cell
+            copy_head (bool, optional): Write the column names as the first
+                row. Defaults to True.
+        """
+        self.set_values(wks, start, grid(df, copy_head))
+
+    def diff_ranges(
+        self,
+        buffered: dict[str, dict[tuple[int, int], Any]],
+        blocks: dict[str, dict[tuple[int, int], tuple[int, int]]],
+    ) -> tuple[list[tuple[str, list[list[Any]]]], int, set[str]]:
+        """Turns buffered cells into ranges of the cells that changed since
+        they were last published.
+
+        Cells of published blocks that the new blocks no longer cover are
+        added to buffered as empty values.
+
+        Args:
+            buffered (dict[str, dict[tuple[int, int], Any]]): Worksheet
+                title to cell values by (row, column)
+            blocks (dict[str, dict[tuple[int, int], tuple[int, int]]]):
+                Worksheet title to the (rows, cols) of each written block by
+                its top left cell
+
+        Returns:
+            tuple[list, int, set[str]]: (label, values) of each changed
+                range, the number of buffered cells left unchanged and the
+                titles of the worksheets written in full
+        """
+        with self.publish_lock:
+            published = self.load_published()
+            previous = {
+                title: dict(published.get(title, {})) for title in buffered
+            }
+        ranges = []
+        unchanged = 0
+        full = set()
+        for title, cells in buffered.items():
+            sheet = previous[title]
+            for addr in shrunk(sheet.get("blocks", {}), blocks[title]):
+                cells.setdefault(addr, "")
+            published_cells = sheet.get("cells", {})
+            if (
+                self.full
+                or time.time() - sheet.get("written", 0) > FULL_WRITE_AFTER
+            ):
+                full.add(title)
+                changed = set(cells)
+            else:
+                changed = {
+                    addr
+                    for addr, value in cells.items()
+                    if published_cells.get(f"{addr[0]}:{addr[1]}") != value
+                }
+            unchanged += len(cells) - len(changed)
+            for start, rows, cols in rectangles(changed):
+                values = [
+                    [cells[(start[0] + i, start[1] + j)] for j in range(cols)]
+                    for i in range(rows)
+                ]
+                ranges.append((a1_range(title, start, rows, cols), values))
+        return ranges, unchanged, full
+
+    def save_published(
+        self,
+        buffered: dict[str, dict[tuple[int, int], Any]],
+        blocks: dict[str, dict[tuple[int, int], tuple[int, int]]],
+        full: set[str],
+    ) -> None:
+        with self.publish_lock:
+            published = self.load_published()
+            written = time.time()
+            for title, cells in buffered.items():
+                sheet = published.setdefault(
+                    title, {"written": 0, "blocks": {}, "cells": {}}
+                )
+                if title in full:
+                    sheet["written"] = written
+                for (row, col), size in blocks[title].items():
+                    sheet["blocks"][f"{row}:{col}"] = list(size)
+                for (row, col), value in cells.items():
+                    sheet["cells"][f"{row}:{col}"] = value
+            with open(self.filename, "w") as f:
+                json.dump(
+                    {"version": PUBLISHED_VERSION, "sheets": published}, f
+                )
+
+    def execute(self, request: Callable[[], Any]) -> Any:
+        """Sends a request once the rate limiter allows it, backing off and
+        retrying when the quota is exhausted.
+
+        Args:
+            request (Callable[[], Any]): Sends the request
+
+        Returns:
+            Any: Whatever request returns
+        """
+        for attempt in range(MAX_RETRIES):
+            with stage("quota"):
+                self.limiter.acquire()
+            try:
+                return request()
+            except HttpError as e:
+                if e.resp.status != 429 or attempt == MAX_RETRIES - 1:
+                    raise
+                delay = float(
+                    e.resp.get("retry-after")
+                    or min(2**attempt, MAX_BACKOFF) + random.random()
+                )
+                print(f"Sheets quota exceeded, retrying in {delay:.1f} s")
+                self.limiter.pause(delay)
+
+    def flush(self) -> int:
+        """Sends every buffered range in one request.
+
+        Other threads may keep buffering while the request is waiting for
+        quota; their writes go out with the next flush.
+
+        Returns:
+            int: Number of cells written
+        """
+        with self.lock:
+            ranges, self.ranges = self.ranges, []
+            buffered, self.cells = self.cells, {}
+            blocks, self.blocks = self.blocks, {}
+
+        unchanged = 0
+        full = set()
+        if self.diff:
+            changed, unchanged, full = self.diff_ranges(buffered, blocks)
+            ranges += changed
+        cells = sum(len(row) for _, values in ranges for row in values)
+        if self.diff:
+            print(
+                f"{cells} cells changed in {len(ranges)} ranges, "
+                f"{unchanged} unchanged"
+                + (f", {len(full)} sheets written in full" if full else "")
+            )
+        elif cells > 0:
+            print(f"Writing {len(ranges)} ranges ({cells} cells)")
+
+        if len(ranges) > 0:
+            data = [
+                {
+                    "dataFilter": {"a1Range": label},
+                    "values": values,
+                    "majorDimension": "ROWS",
+                }
+                for label, values in ranges
+            ]
+            sheet = self.spreadsheet.client.sheet
+            with stage("sheets"):
+                self.execute(
+                    lambda: sheet.values_batch_update_by_data_filter(
+                        self.spreadsheet.id, data, self.parse
+                    )
+                )
+            with self.lock:
+                self.requests += 1
+        if self.diff:
+            self.save_published(buffered, blocks, full)
+        return cells
@@ -0,0 +1,129 @@
+import json
+import os
+import pandas
+from typing import Any, Optional
+
+try:
+    import pyarrow
+    import pyarrow.feather
+except ImportError:
+    pyarrow = None
+
+# Bump whenever the layout of a snapshot changes; older snapshots are
+# ignored and rebuilt from the json they were made from.
+SCHEMA_VERSION = 1
+SCHEMA_KEY = b"stats.schema"
+
+
+def snapshot_file(filename: str) -> str:
+    """Returns the Arrow snapshot path kept next to a json cache file.
+
+    Args:
+        filename (str): json cache file, e.g. "data/platperformances.json"
+
+    Returns:
+        str: Snapshot path, e.g. "data/platperformances.arrow"
+    """
+    return os.path.splitext(filename)[0] + ".arrow"
+
+
+def write_snapshot(data: list[dict[str, Any]], filename: str) -> None:
+    """Writes a typed, uncompressed Arrow snapshot of a json payload.
+
+    Does nothing if pyarrow is not installed.
+
+    Args:
+        data (list[dict[str, Any]]): Parsed json payload
+        filename (str): json cache file the payload was written to
+    """
+    if pyarrow is None:
+        return
+    table = pyarrow.Table.from_pandas(
+        pandas.DataFrame.from_records(data), preserve_index=False
+    )
+    metadata = dict(table.schema.metadata or {})
+    metadata[SCHEMA_KEY] = str(SCHEMA_VERSION).encode()
+    table = table.replace_schema_metadata(metadata)
+
+    path = snapshot_file(filename)
+    print(f"Writing snapshot to {path}")
+    pyarrow.feather.write_feather(table, path, compression="uncompressed")
+
+
+def read_snapshot(filename: str) -> Optional[pandas.DataFrame]:
+    """Loads the snapshot of a json cache file, memory-mapped.
+
+    Args:
+        filename (str): json cache file
+
+    Returns:
+        Optional[pandas.DataFrame]: The payload as a DataFrame, or None if
+            pyarrow is missing or the snapshot is absent, older than the
+            json, unreadable or of another schema version
+    """
+    path = snapshot_file(filename)
+    if pyarrow is None or not os.path.exists(path):
+        return None
+    modified = os.path.getmtime(path)
+    if os.path.exists(filename) and modified < os.path.getmtime(filename):
+        print(f"Snapshot {path} is older than {filename}, ignoring it")
+        return None
+
+    try:
+        table = pyarrow.feather.read_table(path, memory_map=True)
+    except (pyarrow.ArrowInvalid, OSError) as e:
+        print(f"Could not read snapshot {path}: {e}")
+        return None
+
+    version = (table.schema.metadata or {}).get(SCHEMA_KEY)
+    if version != str(SCHEMA_VERSION).encode():
+        print(f"Snapshot {path} has schema {version}, ignoring it")
+        return None
+
+    print(f"Importing matches from {path}")
+    # Arrow-backed columns keep pointing into the memory map, where numpy
+    # ones would be copied out of it
+    return table.to_pandas(types_mapper=pandas.ArrowDtype)
+
+
+def read_frame(filename: str) -> pandas.DataFrame:
+    """Loads a cached payload as a DataFrame, preferring the snapshot.
+
+    Falls back to the json file, and rewrites the snapshot from it when
+    the snapshot could not be used. The frame comes from the snapshot
+    whenever pyarrow is installed, so its columns are Arrow-backed either
+    way.
+
+    Args:
+        filename (str): json cache file
+
+    Returns:
+        pandas.DataFrame: One row per record
+    """
+    df = read_snapshot(filename)
+    if df is not None:
+        return df
+    print(f"Importing matches from {filename}")
+    with open(filename, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    write_snapshot(data, filename)
+    df = read_snapshot(filename)
+    if df is not None:
+        return df
+    return pandas.DataFrame.from_records(data)
+
+
+def to_records(df: pandas.DataFrame) -> list[dict[str, Any]]:
+    """Converts a snapshot frame back into json-like records.
+
+    Integer columns with missing values come back as ints and None rather
+    than floats and NaN, matching json.load.
+
+    Args:
+        df (pandas.DataFrame): Frame from read_frame
+
+    Returns:
+        list[dict[str, Any]]: One dict per row
+    """
+    df = df.convert_dtypes()
+    return df.astype(object).where(df.notna(), None).to_dict("records")
@@ -0,0 +1,291 @@
+import pandas
+from stats.snapshot import to_records
+from typing import Any, Optional
+
+
+class PerformanceStore:
+    """Columnar copy of a league's performances and team performances.
+
+    The raw API payloads are converted to typed DataFrames exactly once so
+    that Players, Teams, Champions and TeamPage can share a single ingest.
+    Repeated string columns (team, role, puuid, ...) are stored as pandas
+    categoricals.
+    """
+
+    CATEGORICAL = ["matchId", "puuid", "team", "opponent", "role", "conf"]
+
+    def __init__(
+        self,
+        performances: list[dict[str, Any]] = None,
+        teamperformances: list[dict[str, Any]] = None,
+    ):
+        """Builds the columnar tables from API payloads.
+
+        Args:
+            performances (list[dict[str, Any]], optional): Player performances
+                from /performances/<league>. Defaults to None.
+            teamperformances (list[dict[str, Any]], optional): Team
+                performances from /teamperformances/<league>. Defaults to
+                None.
+        """
+        self.performance_records = performances or []
+        self.teamperformance_records = teamperformances or []
+
+        print("Building performance store...")
+        self.performances = self.frame(self.performance_records)
+        self.teamperformances = self.frame(
+            self.teamperformance_records, exclude=["bans"]
+        )
+        self.bans = self.ban_frame(self.teamperformance_records)
+        print("Performance store built.")
+
+    @classmethod
+    def from_frames(
+        cls,
+        performances: pandas.DataFrame,
+        teamperformances: pandas.DataFrame,
+    ) -> "PerformanceStore":
+        """Builds a store from already columnar payloads, e.g. snapshots
+        loaded by read_frame. The frames are not copied, so Arrow-backed
+        columns stay memory-mapped, and the record lists are only rebuilt
+        if something asks for them.
+
+        Args:
+            performances (pandas.DataFrame): Player performances
+            teamperformances (pandas.DataFrame): Team performances, with
+                bans as a column of lists
+
+        Returns:
+            PerformanceStore: Store over the given frames
+        """
+        print("Building performance store...")
+        store = cls.__new__(cls)
+        store._performance_records = None
+        store._teamperformance_records = None
+        store.performances = cls.categorize(performances)
+
+        bans = cls.ban_rows([])
+        if "bans" in teamperformances.columns:
+            bans = cls.explode_bans(teamperformances)
+            teamperformances = teamperformances.drop(columns=["bans"])
+        store.teamperformances = cls.categorize(teamperformances)
+        store.bans = bans
+        print("Performance store built.")
+        return store
+
+    @property
+    def performance_records(self) -> list[dict[str, Any]]:
+        if self._performance_records is None:
+            self._performance_records = to_records(self.performances)
+        return self._performance_records
+
+    @performance_records.setter
+    def performance_records(self, records: list[dict[str, Any]]) -> None:
+        self._performance_records = records
+
+    @property
+    def teamperformance_records(self) -> list[dict[str, Any]]:
+        if self._teamperformance_records is None:
+            records = to_records(self.teamperformances)
+            bans = {}
+            for ban in self.bans.itertuples(index=False):
+                bans.setdefault((ban.matchId, ban.team), []).append(
+                    {
+                        "championId": int(ban.championId),
+                        "pickTurn": int(ban.pickTurn),
+                    }
+                )
+            for tp in records:
+                tp["bans"] = bans.get((tp["matchId"], tp["team"]), [])
+            self._teamperformance_records = records
+        return self._teamperformance_records
+
+    @teamperformance_records.setter
+    def teamperformance_records(self, records: list[dict[str, Any]]) -> None:
+        self._teamperformance_records = records
+
+    def select(self, matchIds: set[str]) -> "PerformanceStore":
+        """Returns a new store holding only the given matches.
+
+        Args:
+            matchIds (set[str]): matchIds to keep
+
+        Returns:
+            PerformanceStore: Store over copies of the matching rows
+        """
+        store = type(self).__new__(type(self))
+        store._performance_records = None
+        store._teamperformance_records = None
+        for name in ["performances", "teamperformances", "bans"]:
+            df = getattr(self, name)
+            if "matchId" in df.columns:
+                df = df[df["matchId"].isin(matchIds)].reset_index(drop=True)
+            setattr(store, name, df)
+        return store
+
+    @classmethod
+    def frame(
+        cls,
+        records: list[dict[str, Any]],
+        exclude: Optional[list[str]] = None,
+    ) -> pandas.DataFrame:
+        """Converts a list of records into a typed DataFrame.
+
+        Args:
+            records (list[dict[str, Any]]): Records from the API
+            exclude (list[str], optional): Nested fields to leave out.
+                Defaults to None.
+
+        Returns:
+            pandas.DataFrame: One row per record, categorical keys
+        """
+        df = pandas.DataFrame.from_records(
+            records, exclude=exclude if len(records) > 0 else None
+        )
+        return cls.categorize(df)
+
+    @classmethod
+    def categorize(cls, df: pandas.DataFrame) -> pandas.DataFrame:
+        """Stores the repeated key columns of a table as categoricals.
+
+        Args:
+            df (pandas.DataFrame): Table to convert
+
+        Returns:
+            pandas.DataFrame: New table sharing every other column with df
+        """
+        return df.assign(
+            **{
+                column: df[column].astype("category")
+                for column in cls.CATEGORICAL
+                if column in df.columns
+            }
+        )
+
+    @classmethod
+    def explode_bans(
+        cls, teamperformances: pandas.DataFrame
+    ) -> pandas.DataFrame:
+        """Flattens a column of ban lists, as ban_frame does for records.
+
+        Arrow-backed lists are split without visiting the bans in Python.
+
+        Args:
+            teamperformances (pandas.DataFrame): Team performances, with
+                bans as a column of lists
+
+        Returns:
+            pandas.DataFrame: One row per ban
+        """
+        df = (
+            teamperformances[
+                ["matchId", "team", "opponent", "blueside", "bans"]
+            ]
+            .explode("bans", ignore_index=True)
+            .dropna(subset=["bans"])
+        )
+        bans = df.pop("bans")
+        if isinstance(bans.dtype, pandas.ArrowDtype):
+            fields = {
+                field: bans.struct.field(field)
+                for field in ["championId", "pickTurn"]
+            }
+        else:
+            fields = pandas.DataFrame(
+                bans.tolist(), bans.index, ["championId", "pickTurn"]
+            )
+        df = df.assign(
+            championId=fields["championId"], pickTurn=fields["pickTurn"]
+        )
+        return df.reset_index(drop=True).astype(
+            {
+                "matchId": "category",
+                "team": "category",
+                "opponent": "category",
+                "blueside": bool,
+                "championId": "int64",
+                "pickTurn": "int64",
+            }
+        )
+
+    @classmethod
+    def ban_frame(
+        cls, teamperformances: list[dict[str, Any]]
+    ) -> pandas.DataFrame:
+        """Flattens the nested bans of each team performance.
+
+        Args:
+            teamperformances (list[dict[str, Any]]): Team performances
+
+        Returns:
+            pandas.DataFrame: One row per ban with matchId, team, opponent,
+                blueside, championId and pickTurn
+        """
+        return cls.ban_rows(
+            [
+                (
+                    tp["matchId"],
+                    tp["team"],
+                    tp["opponent"],
+                    tp["blueside"],
+                    ban["championId"],
+                    ban["pickTurn"],
+                )
+                for tp in teamperformances
+                for ban in tp["bans"]
+            ]
+        )
+
+    @classmethod
+    def ban_rows(cls, rows: list[tuple]) -> pandas.DataFrame:
+        """Builds the ban table from flattened ban tuples.
+
+        Args:
+            rows (list[tuple]): (matchId, team, opponent, blueside,
+                championId, pickTurn) tuples
+
+        Returns:
+            pandas.DataFrame: One row per ban
+        """
+        df = pandas.DataFrame.from_records(
+            rows,
+            columns=[
+                "matchId",
+                "team",
+                "opponent",
+                "blueside",
+                "championId",
+                "pickTurn",
+            ],
+        )
+        for column in ["matchId", "team", "opponent"]:
+            df[column] = df[column].astype("category")
+        return df
+
+
+def records(data) -> list[dict[str, Any]]:
+    """Returns the raw performance records behind data.
+
+    Args:
+        data: Either a list of performances or a PerformanceStore
+
+    Returns:
+        list[dict[str, Any]]: The player performance records
+    """
+    if isinstance(data, PerformanceStore):
+        return data.performance_records
+    return data
+
+
+def team_records(data) -> list[dict[str, Any]]:
+    """Returns the raw team performance records behind data.
+
+    Args:
+        data: Either a list of team performances or a PerformanceStore
+
+    Returns:
+        list[dict[str, Any]]: The team performance records
+    """
+    if isinstance(data, PerformanceStore):
+        return data.teamperformance_records
+    return data
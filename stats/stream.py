@@ -0,0 +1,273 @@
+import codecs
+import json
+import os
+import time
+import pandas
+import requests
+from stats.champions import Champions
+from stats.download import conditional_headers, save_meta
+from stats.players import Players
+from stats.store import PerformanceStore
+from stats.teams import Teams
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 5000
+
+
+def iter_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """Incrementally parses a top-level json array from byte chunks.
+
+    Only the element currently being parsed is buffered, so memory does
+    not grow with the length of the array.
+
+    Args:
+        chunks (Iterable[bytes]): Raw utf-8 json, split anywhere
+
+    Yields:
+        Any: Each element of the array, in order
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    started = False
+    done = False
+
+    def feed(chunk: bytes, final: bool = False) -> Iterator[Any]:
+        nonlocal buffer, started, done
+        buffer += utf8.decode(chunk, final)
+        position = 0
+        while not done:
+            while position < len(buffer) and buffer[position] in " \t\r\n,":
+                position += 1
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Expected a json array")
+                started = True
+                position += 1
+                continue
+            if buffer[position] == "]":
+                done = True
+                break
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                break
+            if end == len(buffer) and not final:
+                # A number may continue in the next chunk
+                break
+            position = end
+            yield item
+        buffer = buffer[position:]
+
+    for chunk in chunks:
+        yield from feed(chunk)
+    yield from feed(b"", final=True)
+    if not done:
+        raise ValueError("Unterminated json array")
+
+
+def read_chunks(filename: str) -> Iterator[bytes]:
+    """Reads a file in CHUNK_SIZE pieces.
+
+    Args:
+        filename (str): File to read
+
+    Yields:
+        bytes: Consecutive chunks of the file
+    """
+    with open(filename, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+
+def tee_chunks(response: requests.Response, filename: str) -> Iterator[bytes]:
+    """Passes a response body through while writing it to filename.
+
+    The body goes to <filename>.part first and only replaces the cache
+    once it has been read completely.
+
+    Args:
+        response (requests.Response): Streamed response
+        filename (str): Cache file for the response body
+
+    Yields:
+        bytes: Consecutive chunks of the decoded body
+    """
+    part = filename + ".part"
+    size = 0
+    with open(part, "wb") as f:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            f.write(chunk)
+            size += len(chunk)
+            yield chunk
+    os.replace(part, filename)
+    save_meta(response, filename)
+    print(f"{response.url}: streamed {size} bytes to {filename}")
+
+
+def stream_records(
+    url: Optional[str], filename: str, s: requests.Session = None
+) -> Iterator[dict[str, Any]]:
+    """Streams the records of an endpoint, teeing the raw body to filename.
+
+    The cached file is streamed instead if url is None or the server
+    answers 304.
+
+    Args:
+        url (Optional[str]): Endpoint to download, or None to only read the
+            cache
+        filename (str): Cache file for the response body
+        s (requests.Session, optional): Session to send the request on.
+            Defaults to plain requests.
+
+    Yields:
+        dict[str, Any]: Each record of the payload
+    """
+    if url is None:
+        print(f"Streaming matches from {filename}")
+        yield from iter_array(read_chunks(filename))
+        return
+
+    start = time.perf_counter()
+    response = (s or requests).get(
+        url, headers=conditional_headers(filename), stream=True
+    )
+    with response:
+        response.raise_for_status()
+        elapsed = time.perf_counter() - start
+        if response.status_code == 304:
+            print(f"{url}: not modified ({elapsed * 1000:.0f} ms)")
+            yield from iter_array(read_chunks(filename))
+            return
+        print(f"Streaming matches from {url} to {filename}")
+        yield from iter_array(tee_chunks(response, filename))
+
+
+def batched(
+    records: Iterable[dict[str, Any]], size: int = BATCH_SIZE
+) -> Iterator[list[dict[str, Any]]]:
+    """Groups records into lists of about size, never splitting the rows of
+    a match between two lists.
+
+    Args:
+        records (Iterable[dict[str, Any]]): Records, with the rows of a
+            match next to each other
+        size (int, optional): Batch size, exceeded only to finish a match.
+            Defaults to BATCH_SIZE.
+
+    Yields:
+        list[dict[str, Any]]: Consecutive batches
+    """
+    batch = []
+    for record in records:
+        if len(batch) >= size and record["matchId"] != batch[-1]["matchId"]:
+            yield batch
+            batch = []
+        batch.append(record)
+    if len(batch) > 0:
+        yield batch
+
+
+def ingest(
+    records: Iterable[dict[str, Any]],
+    sinks: list[Callable[[list[dict[str, Any]]], None]],
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """Pushes records into every sink one batch at a time.
+
+    Args:
+        records (Iterable[dict[str, Any]]): Records, e.g. from
+            stream_records
+        sinks (list[Callable]): Functions that take a batch of records
+        batch_size (int, optional): Records per batch. Defaults to
+            BATCH_SIZE.
+
+    Returns:
+        int: Number of records ingested
+    """
+    n = 0
+    for batch in batched(records, batch_size):
+        for sink in sinks:
+            sink(batch)
+        n += len(batch)
+    return n
+
+
+def stream_league(
+    performances: Iterable[dict[str, Any]],
+    teamperformances: Iterable[dict[str, Any]],
+    players: Players,
+    teams: Teams,
+    champions: Champions,
+    batch_size: int = BATCH_SIZE,
+    select: Callable[[str, pandas.DataFrame], pandas.DataFrame] = None,
+) -> None:
+    """Streams a league's performances into its aggregators.
+
+    Only one batch of records is held at a time, so peak memory depends on
+    batch_size and the size of the aggregates, not on the archive.
+
+    Args:
+        performances (Iterable[dict[str, Any]]): Player performances, e.g.
+            from stream_records
+        teamperformances (Iterable[dict[str, Any]]): Team performances
+        players (Players): Receives player performances
+        teams (Teams): Receives team performances
+        champions (Champions): Receives picks and bans
+        batch_size (int, optional): Records per batch. Defaults to
+            BATCH_SIZE.
+        select (Callable, optional): Called with "performances",
+            "teamperformances" or "bans" and every batch of that table,
+            returns the rows to count. Defaults to counting every row.
+    """
+
+    def rows(kind: str, frame: pandas.DataFrame) -> pandas.DataFrame:
+        return frame if select is None else select(kind, frame)
+
+    def add_performances(batch: list[dict[str, Any]]) -> None:
+        frame = rows("performances", PerformanceStore.frame(batch))
+        players.add_frame(frame)
+        champions.add_frame(frame)
+
+    def add_teamperformances(batch: list[dict[str, Any]]) -> None:
+        frame = rows(
+            "teamperformances", PerformanceStore.frame(batch, exclude=["bans"])
+        )
+        bans = rows("bans", PerformanceStore.ban_frame(batch))
+        teams.add_frame(frame)
+        champions.add_team_frame(frame, bans)
+
+    n = ingest(performances, [add_performances], batch_size)
+    print(f"Ingested {n} performances.")
+    n = ingest(teamperformances, [add_teamperformances], batch_size)
+    print(f"Ingested {n} team performances.")
+
+
+class Payload:
+    def __init__(
+        self, url: Optional[str], filename: str, s: requests.Session = None
+    ):
+        """An endpoint whose records can be streamed more than once.
+
+        The first pass streams url, teeing it to filename, and every later
+        pass reads filename.
+
+        Args:
+            url (Optional[str]): Endpoint to download, or None to only read
+                the cache
+            filename (str): Cache file for the response body
+            s (requests.Session, optional): Session to send the request on.
+                Defaults to plain requests.
+        """
+        self.url = url
+        self.filename = filename
+        self.session = s
+
+    def __call__(self) -> Iterator[dict[str, Any]]:
+        url, self.url = self.url, None
+        return stream_records(url, self.filename, self.session)
@@ -0,0 +1,350 @@
+import math
+import numpy
+import pandas
+from stats.snapshot import to_records
+from typing import Any
+
+ROLES = ["TOP", "JUNGLE", "MIDDLE", "BOTTOM", "UTILITY"]
+
+# Champion keys drawn for picks and bans, like Data Dragon's 1..160
+CHAMPIONS = 160
+PICKS = 10
+BANS = 10
+
+# Uniform (low, high) ranges of per-player stats, high included
+PLAYER_STATS = {
+    "kills": (0, 12),
+    "deaths": (0, 10),
+    "assists": (0, 16),
+    "cs": (20, 350),
+    "gold": (5000, 18000),
+    "xp": (6000, 20000),
+    "dmg": (3000, 40000),
+    "vs": (10, 120),
+    "w": (5, 60),
+    "cw": (0, 15),
+    "wc": (0, 40),
+    "solokills": (0, 3),
+    "doubles": (0, 3),
+    "gold8": (2000, 3500),
+    "xp8": (2500, 4500),
+    "cs8": (10, 80),
+    "gold14": (4000, 7000),
+    "xp14": (5000, 9000),
+    "cs14": (20, 140),
+    "k15": (0, 4),
+    "a15": (0, 4),
+    "d15": (0, 4),
+    "k25": (0, 8),
+    "a25": (0, 8),
+    "d25": (0, 8),
+}
+
+# Chance of a player getting at least one of these in a game
+RARE = {
+    "triples": 0.1,
+    "quadras": 0.03,
+    "pentas": 0.01,
+}
+
+# Lane differences, as own stat minus the opposing player in the same role
+DIFFS = {
+    "gd8": "gold8",
+    "xpd8": "xp8",
+    "csd8": "cs8",
+    "gd14": "gold14",
+    "xpd14": "xp14",
+    "csd14": "cs14",
+}
+
+# Side totals copied onto every player of the side
+TOTALS = {
+    "tk": "kills",
+    "td": "deaths",
+    "ta": "assists",
+    "tgold": "gold",
+    "tdmg": "dmg",
+    "tvs": "vs",
+    "tk15": "k15",
+    "td15": "d15",
+    "ta15": "a15",
+    "tk25": "k25",
+    "td25": "d25",
+    "ta25": "a25",
+}
+
+# Team performance fields summed over the side's players
+TEAM_SUMS = {
+    "k": "kills",
+    "d": "deaths",
+    "a": "assists",
+    "cs": "cs",
+    "gold": "gold",
+    "xp": "xp",
+    "dmg": "dmg",
+    "vs": "vs",
+    "w": "w",
+    "cw": "cw",
+    "wc": "wc",
+    "gd14": "gd14",
+    "xpd14": "xpd14",
+    "csd14": "csd14",
+    "k15": "k15",
+    "a15": "a15",
+    "d15": "d15",
+    "k25": "k25",
+    "a25": "a25",
+    "d25": "d25",
+}
+
+# Objectives taken by a side, and the field counting them for the opponent
+OBJECTIVES = {
+    "bKills": ("bGiven", (0, 2)),
+    "dKills": ("dGiven", (0, 4)),
+    "tKills": ("tGiven", (0, 11)),
+    "hKills": ("hGiven", (0, 2)),
+}
+
+# Firsts taken by exactly one side of every match
+FIRSTS = ["fb", "bFirst", "dFirst", "tFirst", "hFirst"]
+
+
+class SyntheticLeague:
+    def __init__(
+        self,
+        teams: int = 10,
+        weeks: int = 1,
+        games: int = 2,
+        subs: int = 2,
+        seed: int = 0,
+        conf: str = "plat",
+    ):
+        """Generates a league's /performances, /teamperformances and /teams
+        payloads with every field the stats read, for benchmarks and offline
+        runs.
+
+        Every week pairs the teams at random for a series of games. Stats
+        are random but consistent: team totals add up over their players,
+        lane differences mirror the opposing player, and every first is
+        taken by exactly one side. The same arguments always give the same
+        league.
+
+        Args:
+            teams (int, optional): Number of teams, an odd one out sits out
+                each week. Defaults to 10.
+            weeks (int, optional): Number of weeks. Defaults to 1.
+            games (int, optional): Games per series. Defaults to 2.
+            subs (int, optional): Players per team and role. Defaults to 2.
+            seed (int, optional): Random seed. Defaults to 0.
+            conf (str, optional): League name in the API. Defaults to
+                "plat".
+        """
+        if teams < 2:
+            raise ValueError("A league needs at least 2 teams")
+        self.conf = conf
+        self.rng = numpy.random.default_rng(seed)
+        self.teams = [
+            {
+                "code": f"T{i:02d}",
+                "name": f"Team {i:02d}",
+                "logo": f"https://example.com/logos/T{i:02d}.png",
+            }
+            for i in range(teams)
+        ]
+        self.puuids = numpy.array(
+            [
+                [
+                    [f"{team['code']}-{role}-{k}" for k in range(subs)]
+                    for role in ROLES
+                ]
+                for team in self.teams
+            ]
+        )
+        self.schedule(weeks, games)
+        self.performances = self.player_frame()
+        self.teamperformances = self.team_frame()
+
+    @classmethod
+    def for_rows(
+        cls, rows: int, teams: int = 10, games: int = 2, **kwargs
+    ) -> "SyntheticLeague":
+        """Generates a league with at least the given number of player
+        performances, adding weeks as needed.
+
+        Args:
+            rows (int): Player performances wanted
+            teams (int, optional): Number of teams. Defaults to 10.
+            games (int, optional): Games per series. Defaults to 2.
+
+        Returns:
+            SyntheticLeague: Generated league
+        """
+        per_week = teams // 2 * games * 2 * len(ROLES)
+        weeks = max(1, math.ceil(rows / per_week))
+        return cls(teams=teams, weeks=weeks, games=games, **kwargs)
+
+    def schedule(self, weeks: int, games: int) -> None:
+        """Draws the pairings of every week and the blue side of every
+        game."""
+        pairs = len(self.teams) // 2
+        sides = numpy.stack(
+            [
+                self.rng.permutation(len(self.teams))[: 2 * pairs]
+                for _ in range(weeks)
+            ]
+        ).reshape(weeks * pairs, 2)
+        self.sides = numpy.repeat(sides, games, axis=0)
+        swap = self.rng.random(len(self.sides)) < 0.5
+        self.sides[swap] = self.sides[swap][:, ::-1]
+
+        matches = len(self.sides)
+        self.week = numpy.repeat(numpy.arange(1, weeks + 1), pairs * games)
+        self.game = numpy.tile(numpy.arange(1, games + 1), weeks * pairs)
+        self.matchIds = numpy.char.add(
+            f"{self.conf.upper()}_", numpy.arange(1, matches + 1).astype(str)
+        )
+        self.time = self.rng.integers(1200, 2400, matches, endpoint=True)
+        blue_win = self.rng.random(matches) < 0.5
+        self.win = numpy.stack([blue_win, ~blue_win], axis=1)
+
+    def player_frame(self) -> pandas.DataFrame:
+        """Builds the player performances, 2 sides x 5 roles per match."""
+        matches = len(self.sides)
+        shape = (matches, 2, len(ROLES))
+
+        role = numpy.broadcast_to(numpy.arange(len(ROLES)), shape)
+        team = numpy.broadcast_to(self.sides[:, :, None], shape)
+        # Starters play most games
+        subs = self.puuids.shape[2]
+        sub = self.rng.random(shape) < 0.2
+        k = numpy.where(sub, self.rng.integers(0, subs, shape), 0)
+
+        # Distinct keys within a match: a start and a step coprime to 160
+        units = [u for u in range(1, CHAMPIONS) if math.gcd(u, CHAMPIONS) == 1]
+        start = self.rng.integers(0, CHAMPIONS, matches)
+        step = self.rng.choice(units, matches)
+        self.champions = (
+            start[:, None] + step[:, None] * numpy.arange(PICKS + BANS)
+        ) % CHAMPIONS + 1
+
+        stats = {
+            field: self.rng.integers(low, high, shape, endpoint=True)
+            for field, (low, high) in PLAYER_STATS.items()
+        }
+        for field, chance in RARE.items():
+            stats[field] = (self.rng.random(shape) < chance).astype(
+                numpy.int64
+            )
+        for field, stat in DIFFS.items():
+            stats[field] = stats[stat] - stats[stat][:, ::-1]
+        for field, stat in TOTALS.items():
+            stats[field] = numpy.broadcast_to(
+                stats[stat].sum(axis=2, keepdims=True), shape
+            )
+        jgmins = self.rng.integers(8, 13, shape, endpoint=True).astype(float)
+        jgmins[:, :, numpy.arange(len(ROLES)) != ROLES.index("JUNGLE")] = (
+            numpy.nan
+        )
+        stats["jgmins"] = jgmins
+
+        # First blood goes to one player, against one on the other side
+        self.first_blood = self.rng.integers(0, 2, matches)
+        fb = numpy.zeros(shape, dtype=bool)
+        fbv = numpy.zeros(shape, dtype=bool)
+        rows = numpy.arange(matches)
+        fb[rows, self.first_blood, self.rng.integers(0, 5, matches)] = True
+        fbv[rows, 1 - self.first_blood, self.rng.integers(0, 5, matches)] = (
+            True
+        )
+        self.stats = stats
+
+        columns = {
+            "matchId": numpy.broadcast_to(self.matchIds[:, None, None], shape),
+            "puuid": self.puuids[team, role, k],
+            "team": numpy.array([t["code"] for t in self.teams])[team],
+            "role": numpy.array(ROLES)[role],
+            "champid": self.champions[:, :PICKS].reshape(shape),
+            "win": numpy.broadcast_to(self.win[:, :, None], shape),
+            "blueside": numpy.broadcast_to(
+                numpy.array([True, False])[None, :, None], shape
+            ),
+            "time": numpy.broadcast_to(self.time[:, None, None], shape),
+            **stats,
+            "fb": fb,
+            "fbv": fbv,
+        }
+        return pandas.DataFrame(
+            {name: values.reshape(-1) for name, values in columns.items()}
+        )
+
+    def team_frame(self) -> pandas.DataFrame:
+        """Builds the team performances, one per side of every match."""
+        matches = len(self.sides)
+        shape = (matches, 2)
+        codes = numpy.array([t["code"] for t in self.teams])
+
+        columns = {
+            "matchId": numpy.broadcast_to(self.matchIds[:, None], shape),
+            "team": codes[self.sides],
+            "opponent": codes[self.sides[:, ::-1]],
+            "win": self.win,
+            "blueside": numpy.broadcast_to(numpy.array([True, False]), shape),
+            "time": numpy.broadcast_to(self.time[:, None], shape),
+            "week": numpy.broadcast_to(self.week[:, None], shape),
+            "game": numpy.broadcast_to(self.game[:, None], shape),
+            # One game every 90 minutes from 2022-06-01
+            "startTime": numpy.broadcast_to(
+                1654041600000 + numpy.arange(matches)[:, None] * 5400000,
+                shape,
+            ),
+            "conf": numpy.full(shape, self.conf),
+        }
+        for field, stat in TEAM_SUMS.items():
+            columns[field] = self.stats[stat].sum(axis=2)
+        columns["ow"] = self.rng.integers(0, 10, shape, endpoint=True)
+        for field, (given, (low, high)) in OBJECTIVES.items():
+            columns[field] = self.rng.integers(low, high, shape, endpoint=True)
+            columns[given] = columns[field][:, ::-1]
+        for field in FIRSTS:
+            side = (
+                self.first_blood
+                if field == "fb"
+                else self.rng.integers(0, 2, matches)
+            )
+            columns[field] = numpy.arange(2) == side[:, None]
+
+        df = pandas.DataFrame(
+            {name: values.reshape(-1) for name, values in columns.items()}
+        )
+        bans = self.champions[:, PICKS:].reshape(matches * 2, BANS // 2)
+        df["bans"] = [
+            [
+                {"championId": int(key), "pickTurn": turn}
+                for turn, key in enumerate(keys, 1)
+            ]
+            for keys in bans.tolist()
+        ]
+        return df
+
+    def performance_records(self) -> list[dict[str, Any]]:
+        """Returns the player performances as /performances json records."""
+        return to_records(self.performances)
+
+    def teamperformance_records(self) -> list[dict[str, Any]]:
+        """Returns the team performances as /teamperformances json
+        records."""
+        return to_records(self.teamperformances)
+
+    def names(self) -> dict[str, str]:
+        """Returns a summoner name for every puuid of the league."""
+        return {
+            puuid: f"Summoner {puuid}" for puuid in self.puuids.reshape(-1)
+        }
+
+    def champion_data(self) -> dict[str, list[str]]:
+        """Returns a Data Dragon champion map, {key: [id, name]}, covering
+        every key drawn."""
+        return {
+            str(key): [f"Champion{key}", f"Champion {key}"]
+            for key in range(1, CHAMPIONS + 1)
+        }
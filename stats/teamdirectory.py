@@ -0,0 +1,109 @@
+import pandas
+from stats.formatting import image
+from typing import Any, Iterable, Union
+
+
+class UnknownTeamError(KeyError):
+    def __init__(self, codes: Iterable[str]):
+        """Raised when a team code is not in the league's team list.
+
+        Args:
+            codes (Iterable[str]): Codes that were not found
+        """
+        self.codes = sorted({str(code) for code in codes})
+        super().__init__(f"Unknown team codes: {', '.join(self.codes)}")
+
+    def __str__(self) -> str:
+        return self.args[0]
+
+
+class TeamDirectory:
+    def __init__(self, teams: list[dict[str, Any]]):
+        """Team metadata indexed by team code, built once from the
+        /teams/<league> payload.
+
+        The empty code "" stands for no team, e.g. a champion nobody
+        played, and maps to "".
+
+        Args:
+            teams (list[dict[str, Any]]): Team records, each with a code,
+                name and logo. The first record of a code wins.
+        """
+        self.records = {}
+        for team in teams:
+            self.records.setdefault(team["code"], team)
+        self.names = {
+            code: team["name"] for code, team in self.records.items()
+        }
+        self.logos = {
+            code: team["logo"] for code, team in self.records.items()
+        }
+
+    @classmethod
+    def of(cls, teams: Union["TeamDirectory", list, None]):
+        """Wraps a team payload, passing directories and None through."""
+        if teams is None or isinstance(teams, TeamDirectory):
+            return teams
+        return cls(teams)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.records
+
+    def codes(self) -> list[str]:
+        """Returns every team code, in payload order."""
+        return list(self.records)
+
+    def get(self, code: str) -> dict[str, Any]:
+        """Returns the record of a team.
+
+        Raises:
+            UnknownTeamError: If code is not a known team
+        """
+        try:
+            return self.records[code]
+        except KeyError:
+            raise UnknownTeamError([code]) from None
+
+    def name(self, code: str) -> str:
+        return "" if code == "" else self.get(code)["name"]
+
+    def logo(self, code: str) -> str:
+        return "" if code == "" else self.get(code)["logo"]
+
+    def image(self, code: str) -> str:
+        return f'=IMAGE("{self.logo(code)}")'
+
+    def lookup(self, column: pandas.Series, field: dict) -> pandas.Series:
+        """Maps a column of team codes through one field.
+
+        Args:
+            column (pandas.Series): Team codes
+            field (dict): Code to value, e.g. self.names
+
+        Raises:
+            UnknownTeamError: If any code is not a known team
+
+        Returns:
+            pandas.Series: Value for every code
+        """
+        codes = column.astype(object)
+        unknown = ~codes.isin(self.records.keys()) & codes.ne("")
+        if unknown.any():
+            raise UnknownTeamError(codes[unknown].unique())
+        return codes.map(field).where(codes.ne(""), "")
+
+    def map_names(self, column: pandas.Series) -> pandas.Series:
+        """Maps a column of team codes to team names."""
+        return self.lookup(column, self.names)
+
+    def map_logos(self, column: pandas.Series) -> pandas.Series:
+        """Maps a column of team codes to logo urls."""
+        return self.lookup(column, self.logos)
+
+    def map_images(self, column: pandas.Series) -> pandas.Series:
+        """Maps a column of team codes to =IMAGE() formulas of their
+        logos."""
+        return image(self.map_logos(column))
@@ -1,8 +1,32 @@
 from stats.roster import Roster
 from stats.players import Players
-import requests
+from stats.store import PerformanceStore
+from stats.teamdirectory import TeamDirectory
+from stats.ddragon import static_data
 import pandas
 
+# Team performance fields shown in a team's match history
+HISTORY = ["matchId", "win", "opponent", "week", "game", "conf"]
+
+# Player performance fields shown for every role of a match
+PERFORMANCE = ["champid", "puuid", "kills", "deaths", "assists"]
+
+
+def rows(df: pandas.DataFrame, columns: list[str]) -> list[tuple]:
+    """Returns some columns of a table as row tuples.
+
+    Converts whole columns at once, which is much faster than to_dict when
+    they are Arrow-backed.
+
+    Args:
+        df (pandas.DataFrame): Table
+        columns (list[str]): Columns to take, in tuple order
+
+    Returns:
+        list[tuple]: One tuple per row
+    """
+    return list(zip(*(df[column].to_numpy().tolist() for column in columns)))
+
 
 class TeamPage:
     def __init__(
@@ -15,24 +39,40 @@ class TeamPage:
         dict[matchId, MatchDTO] from Riot Games match-v5 API
 
         Args:
-            data (dict, optional): _description_. Defaults to None.
+            performances (dict, optional): Performances, or a
+                PerformanceStore holding both tables. Defaults to None.
+            teamperformances (dict, optional): Team performances. Defaults
+                to None.
+            teams (dict, optional): Team metadata or a TeamDirectory.
+                Defaults to None.
         """
-        self.data = teamperformances
-        self.players = performances
-        self.teams = teams
-        self.ids = None
+        if not isinstance(performances, PerformanceStore):
+            performances = PerformanceStore(performances, teamperformances)
+        self.store = performances
+        self.teams = TeamDirectory.of(teams)
         self.names = None
+        self.perfs = None
+        self.histories = None
         self.roster = Roster()
-        self.roster.load_data()
-        self.bans = {}
-        self.bana = {}
+        self.bans = None
+        self.bana = None
 
     def short_history(self, teamcode):
-        history = sorted(
-            list(filter(lambda item: item["team"] == teamcode, self.data)),
-            key=lambda k: (k["week"], k["game"], k["startTime"]),
-            reverse=True,
-        )
+        perfs = self.store.performances
+        self.roster.prefetch(perfs["puuid"][perfs["team"] == teamcode])
+        self.set_histories()
+        frame = self.store.teamperformances
+        history = [
+            dict(zip(HISTORY, row))
+            for row in rows(
+                frame.iloc[self.histories.get(teamcode, [])].sort_values(
+                    ["week", "game", "startTime"],
+                    ascending=False,
+                    kind="stable",
+                ),
+                HISTORY,
+            )
+        ]
 
         table = {
             "top_champ": [],
@@ -121,44 +161,40 @@ class TeamPage:
 
         return df
 
-    def set_ids(self):
-        if self.ids is None:
-            self.ids = {
-                int(v["key"]): v["id"]
-                for (k, v) in requests.get(
-                    "http://ddragon.leagueoflegends.com/cdn/12.13.1/data/en_US/champion.json"
-                )
-                .json()["data"]
-                .items()
-            }
+    def prepare(self):
+        """Builds every lookup table up front, so that pages can then be
+        rendered from several threads at once."""
+        self.roster.prefetch(self.store.performances["puuid"])
+        self.set_names()
+        self.set_perfs()
+        self.set_histories()
+        self.set_bans()
 
     def set_names(self):
         if self.names is None:
-            self.names = {
-                int(v["key"]): v["name"]
-                for (k, v) in requests.get(
-                    "http://ddragon.leagueoflegends.com/cdn/12.13.1/data/en_US/champion.json"
-                )
-                .json()["data"]
-                .items()
+            self.names = static_data().names
+
+    def set_perfs(self):
+        if self.perfs is None:
+            keys = ["team", "matchId", "role"]
+            perfs = self.store.performances.drop_duplicates(keys)
+            self.perfs = {
+                row[:3]: dict(zip(PERFORMANCE, row[3:]))
+                for row in rows(perfs, keys + PERFORMANCE)
             }
 
+    def set_histories(self):
+        if self.histories is None:
+            self.histories = self.store.teamperformances.groupby(
+                "team", observed=True, sort=False
+            ).indices
+
     def img(self, key):
-        self.set_ids()
-        return f'=IMAGE("http://ddragon.leagueoflegends.com/cdn/12.16.1/img/champion/{self.ids[key]}.png")'
+        return f'=IMAGE("{static_data().image(key)}")'
 
     def perf(self, teamcode, matchId, role):
-        result = list(
-            filter(
-                lambda item: item["team"] == teamcode
-                and item["matchId"] == matchId
-                and item["role"] == role,
-                self.players,
-            )
-        )
-        if len(result) == 0:
-            return None
-        return result[0]
+        self.set_perfs()
+        return self.perfs.get((teamcode, matchId, role))
 
     def kda(self, perf):
         k = perf["kills"]
@@ -173,55 +209,73 @@ class TeamPage:
         self.roster.dump_data()
 
     def team_name(self, code):
-        return list(filter(lambda item: item["code"] == code, self.teams))[0][
-            "name"
-        ]
+        return self.teams.name(code)
 
     def link(self, match_id):
         return f"http://api.brycenaddison.com/match/{match_id}"
 
     def logo(self, code):
-        link = list(filter(lambda item: item["code"] == code, self.teams))[0][
-            "logo"
-        ]
-        return f'=IMAGE("{link}")'
+        return self.teams.image(code)
 
     def team_codes(self):
-        return [team["code"] for team in self.teams]
+        return self.teams.codes()
 
-    def banned_against(self, teamcode):
-        games = list(
-            filter(lambda item: item["opponent"] == teamcode, self.data)
-        )
+    def set_bans(self):
+        if self.bans is None:
+            self.bans = self.ban_table(self.store.bans, "team")
+            self.bana = self.ban_table(self.store.bans, "opponent")
 
-        return self.banned(games)
+    def ban_table(self, bans, key):
+        """Counts bans per team and champion in one pass.
 
-    def banned_by(self, teamcode):
-        games = list(filter(lambda item: item["team"] == teamcode, self.data))
+        Args:
+            bans (pandas.DataFrame): Flattened bans from the store
+            key (str): Column to count by, "team" or "opponent"
 
-        return self.banned(games)
+        Returns:
+            dict[str, pandas.Series]: Sparse rows of the team x champion ban
+                count matrix, championIds in the order the team first met
+                them
+        """
+        counts = bans.groupby([key, "championId"], observed=True, sort=False)
+        return {
+            team: row.droplevel(0)
+            for team, row in counts.size().groupby(level=0, sort=False)
+        }
 
-    def banned(self, games):
-        bans = {}
+    def banned_against(self, teamcode, k=None):
+        self.set_bans()
+        return self.banned(self.bana, teamcode, k)
 
-        for game in games:
-            for ban in game["bans"]:
-                if ban["championId"] not in bans:
-                    bans[ban["championId"]] = 1
-                else:
-                    bans[ban["championId"]] += 1
+    def banned_by(self, teamcode, k=None):
+        self.set_bans()
+        return self.banned(self.bans, teamcode, k)
 
-        table = {"icon": [], "name": [], "count": []}
+    def banned(self, table, teamcode, k=None):
+        """Most banned champions for a team, most bans first.
 
-        for champId, count in bans.items():
-            table["icon"].append(self.img(champId))
-            table["name"].append(self.champ_name(champId))
-            table["count"].append(count)
+        Args:
+            table (dict[str, pandas.Series]): Ban counts from ban_table
+            teamcode (str): Team code to look up
+            k (int, optional): Only return the top k champions. Defaults to
+                None.
 
-        return pandas.DataFrame(table).sort_values(
-            ["count"],
-            ascending=[False],
-            ignore_index=True,
+        Returns:
+            pandas.DataFrame: icon, name and count of each banned champion
+        """
+        counts = table.get(teamcode, pandas.Series(dtype="int64"))
+
+        if k is None:
+            counts = counts.sort_values(ascending=False, kind="stable")
+        else:
+            counts = counts.nlargest(k)
+
+        return pandas.DataFrame(
+            {
+                "icon": [self.img(champId) for champId in counts.index],
+                "name": [self.champ_name(champId) for champId in counts.index],
+                "count": counts.to_numpy(),
+            }
         )
 
     def champ_name(self, key):
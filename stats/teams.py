@@ -1,116 +1,204 @@
 import json
+import operator
 import pandas
-import datetime
+from stats.cache import FrameCache
+from stats.counters import CounterTable
+from stats.store import PerformanceStore
+
+# Counters that are plain sums of a team performance field
+SUMS = {
+    "time": "time",
+    "kills": "k",
+    "deaths": "d",
+    "assists": "a",
+    "cs": "cs",
+    "gold": "gold",
+    "xp": "xp",
+    "dmg": "dmg",
+    "vs": "vs",
+    "w": "w",
+    "cw": "cw",
+    "wc": "wc",
+    "ow": "ow",
+    "gd14": "gd14",
+    "xpd14": "xpd14",
+    "csd14": "csd14",
+    "k15": "k15",
+    "a15": "a15",
+    "d15": "d15",
+    "k25": "k25",
+    "a25": "a25",
+    "d25": "d25",
+    "barons": "bKills",
+    "dragons": "dKills",
+    "towers": "tKills",
+    "heralds": "hKills",
+    "obarons": "bGiven",
+    "odragons": "dGiven",
+    "oheralds": "hGiven",
+    "otowers": "tGiven",
+}
+
+# Counters that count the performances where a flag is set
+FLAGS = {
+    "fb": "fb",
+    "fbarons": "bFirst",
+    "fdragons": "dFirst",
+    "ftowers": "tFirst",
+    "fheralds": "hFirst",
+}
+
+# Every counter kept per team, in output order
+COLUMNS = [
+    "n",
+    "wins",
+    "losses",
+    "time",
+    "kills",
+    "deaths",
+    "assists",
+    "cs",
+    "gold",
+    "xp",
+    "dmg",
+    "vs",
+    "w",
+    "cw",
+    "wc",
+    "ow",
+    "fb",
+    "gd14",
+    "xpd14",
+    "csd14",
+    "k15",
+    "a15",
+    "d15",
+    "k25",
+    "a25",
+    "d25",
+    "fbarons",
+    "fdragons",
+    "ftowers",
+    "fheralds",
+    "barons",
+    "dragons",
+    "towers",
+    "heralds",
+    "obarons",
+    "odragons",
+    "oheralds",
+    "otowers",
+    "bluewins",
+    "bluegames",
+    "redwins",
+    "redgames",
+]
 
 
 class Teams:
+    # Raw counters saved by stats.checkpoint, everything else is derived
+    CHECKPOINT = ["counters"]
+
     def __init__(self, data: dict = None):
         """Initializes champion stats, can process data from
         dict[matchId, MatchDTO] from Riot Games match-v5 API
 
         Args:
-            data (dict, optional): _description_. Defaults to None.
+            data (dict, optional): Team performances or a PerformanceStore.
+                Defaults to None.
         """
-        self.teams = {}
+        self.counters = CounterTable(["team"], COLUMNS)
+        self.positions = self.counters.positions(
+            ["n", "wins", "losses"]
+            + list(SUMS)
+            + list(FLAGS)
+            + ["bluewins", "bluegames", "redwins", "redgames"]
+        )
+        self.sums = operator.itemgetter(*SUMS.values())
+        self.flags = operator.itemgetter(*FLAGS.values())
+        self.cache = FrameCache()
         if data is not None:
             self.add_all_performances(data)
 
-    def verify_team(self, team):
-        if team not in self.teams:
-            self.teams[team] = {
-                "team": team,
-                "n": 0,
-                "wins": 0,
-                "losses": 0,
-                "time": 0,
-                "kills": 0,
-                "deaths": 0,
-                "assists": 0,
-                "cs": 0,
-                "gold": 0,
-                "xp": 0,
-                "dmg": 0,
-                "vs": 0,
-                "w": 0,
-                "cw": 0,
-                "wc": 0,
-                "ow": 0,
-                "fb": 0,
-                "gd14": 0,
-                "xpd14": 0,
-                "csd14": 0,
-                "k15": 0,
-                "a15": 0,
-                "d15": 0,
-                "k25": 0,
-                "a25": 0,
-                "d25": 0,
-                "fbarons": 0,
-                "fdragons": 0,
-                "ftowers": 0,
-                "fheralds": 0,
-                "barons": 0,
-                "dragons": 0,
-                "towers": 0,
-                "heralds": 0,
-                "obarons": 0,
-                "odragons": 0,
-                "oheralds": 0,
-                "otowers": 0,
-                "bluewins": 0,
-                "bluegames": 0,
-                "redwins": 0,
-                "redgames": 0,
-            }
+    def verify_team(self, team) -> int:
+        return self.counters.row(team, (team,))
 
     def add_performance(self, p):
-        d = self.teams[p["team"]]
-        d["n"] += 1
-        d["wins" if p["win"] else "losses"] += 1
-        d["time"] += p["time"]
-        d["kills"] += p["k"]
-        d["deaths"] += p["d"]
-        d["assists"] += p["a"]
-        d["cs"] += p["cs"]
-        d["gold"] += p["gold"]
-        d["xp"] += p["xp"]
-        d["dmg"] += p["dmg"]
-        d["vs"] += p["vs"]
-        d["w"] += p["w"]
-        d["cw"] += p["cw"]
-        d["wc"] += p["wc"]
-        d["ow"] += p["ow"]
-        d["fb"] += 1 if p["fb"] else 0
-        d["gd14"] += p["gd14"]
-        d["xpd14"] += p["xpd14"]
-        d["csd14"] += p["csd14"]
-        d["k15"] += p["k15"]
-        d["a15"] += p["a15"]
-        d["d15"] += p["d15"]
-        d["k25"] += p["k25"]
-        d["a25"] += p["a25"]
-        d["d25"] += p["d25"]
-        d["fbarons"] += 1 if p["bFirst"] else 0
-        d["fdragons"] += 1 if p["dFirst"] else 0
-        d["ftowers"] += 1 if p["tFirst"] else 0
-        d["fheralds"] += 1 if p["hFirst"] else 0
-        d["barons"] += p["bKills"]
-        d["dragons"] += p["dKills"]
-        d["towers"] += p["tKills"]
-        d["heralds"] += p["hKills"]
-        d["obarons"] += p["bGiven"]
-        d["odragons"] += p["dGiven"]
-        d["oheralds"] += p["hGiven"]
-        d["otowers"] += p["tGiven"]
-        d["bluewins"] += 1 if (p["blueside"] and p["win"]) else 0
-        d["bluegames"] += 1 if p["blueside"] else 0
-        d["redwins"] += 1 if (not p["blueside"] and p["win"]) else 0
-        d["redgames"] += 0 if p["blueside"] else 1
+        self.cache.invalidate()
+        win = p["win"]
+        blue = p["blueside"]
+        self.counters.add(
+            self.counters.ids[p["team"]],
+            self.positions,
+            (
+                1,
+                win,
+                not win,
+                *self.sums(p),
+                *map(bool, self.flags(p)),
+                blue and win,
+                blue,
+                not blue and win,
+                not blue,
+            ),
+        )
 
     def add_all_performances(self, data):
-        for p in data:
-            self.verify_team(p["team"])
-            self.add_performance(p)
+        if isinstance(data, PerformanceStore):
+            frame = data.teamperformances
+        else:
+            frame = PerformanceStore.frame(data, exclude=["bans"])
+        self.add_frame(frame)
+
+    def add_frame(self, frame: pandas.DataFrame) -> None:
+        """Adds a batch of team performances with one grouped sum.
+
+        Produces the same counters as calling add_performance for every row.
+
+        Args:
+            frame (pandas.DataFrame): Team performances, one row each
+        """
+        if len(frame) == 0:
+            return
+        self.cache.invalidate()
+
+        win = frame["win"].astype(bool)
+        blue = frame["blueside"].astype(bool)
+
+        counters = pandas.DataFrame(
+            {
+                "team": frame["team"].astype(object),
+                "n": 1,
+                "wins": win,
+                "losses": ~win,
+            }
+        )
+        for counter, field in SUMS.items():
+            counters[counter] = frame[field]
+        for counter, field in FLAGS.items():
+            counters[counter] = frame[field].astype(bool)
+        counters["bluewins"] = blue & win
+        counters["bluegames"] = blue
+        counters["redwins"] = ~blue & win
+        counters["redgames"] = ~blue
+
+        totals = counters.groupby("team", sort=False).sum()
+
+        self.counters.add_rows(
+            [self.verify_team(team) for team in totals.index],
+            self.counters.positions(totals.columns),
+            totals.to_numpy(dtype="float64"),
+        )
+
+    def subtract(self, other: "Teams") -> None:
+        """Takes away team performances counted by other, e.g. the old rows
+        of a corrected match.
+
+        Args:
+            other (Teams): Stats of team performances counted here before
+        """
+        self.cache.invalidate()
+        self.counters.subtract(other.counters)
 
     def dump_data(self, filename: str = "output.json") -> None:
         """Dumps champion stats dict to json file.
@@ -122,21 +210,31 @@ class Teams:
 
         print(f"Dumping data to {filename}")
         with open(filename, "w") as f:
-            json.dump(self.teams, f, indent=4)
+            json.dump(self.counters.to_dict(), f, indent=4)
 
     def dataframe(self) -> pandas.DataFrame:
+        """Outputs the summary dataframe, rebuilt only after new data is
+        added
+
+        Returns:
+            pandas.DataFrame: Copy of the cached dataframe
+        """
+        return self.cache.get(self.build_dataframe)
+
+    def build_dataframe(self) -> pandas.DataFrame:
         """Outputs champion stat summary as a dataframe
 
         Returns:
             pandas.DataFrame: Dataframe of champion summary stats
         """
         print("Exporting dataframe...")
-        df = pandas.DataFrame().from_records(list(self.teams.values()))
+        df = self.counters.frame()
 
         df["win%"] = df["wins"] / df["n"]
-        df["gt"] = (df["time"] / df["n"]).apply(
-            lambda x: datetime.timedelta(seconds=x)
-        )
+        # Rounded to microseconds to match datetime.timedelta
+        df["gt"] = pandas.to_timedelta(
+            df["time"] / df["n"], unit="s"
+        ).dt.round("us")
         df["kd"] = (df["kills"]) / df["deaths"]
         df["k/g"] = df["kills"] / df["n"]
         df["d/g"] = df["deaths"] / df["n"]
@@ -0,0 +1,26 @@
+import pytest
+from stats.benchmark import offline
+from stats.store import PerformanceStore
+from stats.synthetic import SyntheticLeague
+
+
+@pytest.fixture(scope="module")
+def league():
+    """A small generated league, run offline: Data Dragon and Riot are
+    answered from caches written for it."""
+    league = SyntheticLeague(teams=6, weeks=3, seed=1)
+    with offline(league):
+        yield league
+
+
+@pytest.fixture(scope="module")
+def records(league):
+    """The league's /performances and /teamperformances json records."""
+    return league.performance_records(), league.teamperformance_records()
+
+
+@pytest.fixture
+def store(league):
+    return PerformanceStore.from_frames(
+        league.performances, league.teamperformances
+    )
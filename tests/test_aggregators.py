@@ -0,0 +1,86 @@
+import pandas
+import pytest
+from stats.champions import Champions
+from stats.players import Players
+from stats.store import PerformanceStore
+from stats.teampage import TeamPage
+from stats.teams import Teams
+
+
+def test_players_frame_matches_records(league, records, store):
+    performances, _ = records
+    expected = Players(performances, league.teams).dataframe()
+    pandas.testing.assert_frame_equal(
+        Players(store, league.teams).dataframe(), expected
+    )
+
+
+def test_teams_frame_matches_records(records, store):
+    _, teamperformances = records
+    expected = Teams(teamperformances).dataframe()
+    pandas.testing.assert_frame_equal(Teams(store).dataframe(), expected)
+
+
+def test_champions_frame_matches_records(records, store):
+    expected = Champions(*records)
+    champions = Champions(store)
+    assert champions.champions == expected.champions
+    assert champions.n == expected.n
+    pandas.testing.assert_frame_equal(
+        champions.dataframe(), expected.dataframe()
+    )
+
+
+def test_champions_drop_duplicate_matches(league, records):
+    performances, teamperformances = records
+    expected = Champions(performances, teamperformances).dataframe()
+
+    repeated = Champions(
+        performances + performances[:7],
+        teamperformances + teamperformances[:3],
+    )
+    assert repeated.duplicates == 10
+    pandas.testing.assert_frame_equal(repeated.dataframe(), expected)
+
+    store = PerformanceStore.from_frames(
+        pandas.concat(
+            [league.performances, league.performances.iloc[:7]],
+            ignore_index=True,
+        ),
+        pandas.concat(
+            [league.teamperformances, league.teamperformances.iloc[:3]],
+            ignore_index=True,
+        ),
+    )
+    repeated = Champions(store)
+    assert repeated.duplicates == 10
+    pandas.testing.assert_frame_equal(repeated.dataframe(), expected)
+
+
+def test_summaries_match_stat_summary(store):
+    champions = Champions(store)
+    summaries = champions.summaries().to_dict("records")
+    assert len(summaries) == len(champions.names)
+
+    for championId, summary in zip(champions.names, summaries):
+        for column, value in champions.get_stat_summary(championId).items():
+            fast = summary[column]
+            if pandas.isna(value):
+                assert pandas.isna(fast), column
+                continue
+            assert fast == value, column
+            assert isinstance(fast, type(value)), column
+
+
+@pytest.mark.parametrize("k", [None, 3])
+def test_banned_by_counts_bans(league, store, k):
+    page = TeamPage(store, teams=league.teams)
+    bans = store.bans
+    for code in page.team_codes():
+        table = page.banned_by(code, k)
+        counts = bans[bans["team"] == code]["championId"].value_counts()
+        assert (
+            table["count"].tolist()
+            == sorted(counts.tolist(), reverse=True)[: len(table)]
+        )
+        assert k is None or len(table) == min(k, len(counts))
@@ -0,0 +1,84 @@
+import os
+import pytest
+from stats.benchmark import offline
+from stats.champions import Champions
+from stats.players import Players
+from stats.store import PerformanceStore
+from stats.synthetic import SyntheticLeague
+from stats.teampage import TeamPage
+from stats.teams import Teams
+
+pytest.importorskip("pytest_benchmark")
+
+# Player performances in the benchmarked league
+ROWS = int(os.getenv("BENCHMARK_ROWS", "20000"))
+
+
+@pytest.fixture(scope="module")
+def league():
+    league = SyntheticLeague.for_rows(ROWS)
+    with offline(league):
+        yield league
+
+
+@pytest.fixture(scope="module")
+def store(league):
+    return PerformanceStore.from_frames(
+        league.performances, league.teamperformances
+    )
+
+
+@pytest.fixture(scope="module")
+def players(league, store):
+    return Players(store, league.teams)
+
+
+@pytest.fixture(scope="module")
+def page(league, store):
+    page = TeamPage(store, teams=league.teams)
+    page.prepare()
+    return page
+
+
+def test_store(benchmark, league):
+    benchmark(
+        PerformanceStore.from_frames,
+        league.performances,
+        league.teamperformances,
+    )
+
+
+def test_players(benchmark, league, store):
+    benchmark(Players, store, league.teams)
+
+
+def test_players_dataframe(benchmark, players):
+    benchmark(players.build_dataframe)
+
+
+def test_teams(benchmark, store):
+    benchmark(Teams, store)
+
+
+def test_teams_dataframe(benchmark, store):
+    benchmark(Teams(store).build_dataframe)
+
+
+def test_champions(benchmark, store):
+    benchmark(Champions, store)
+
+
+def test_champions_dataframe(benchmark, store):
+    benchmark(Champions(store).build_dataframe)
+
+
+def test_short_history(benchmark, page):
+    benchmark(lambda: [page.short_history(c) for c in page.team_codes()])
+
+
+def test_banned_by(benchmark, page):
+    benchmark(lambda: [page.banned_by(c) for c in page.team_codes()])
+
+
+def test_playerlist(benchmark, page, players):
+    benchmark(lambda: [page.playerlist(c, players) for c in page.team_codes()])
@@ -0,0 +1,161 @@
+import copy
+import pandas
+import pytest
+from stats.champions import Champions
+from stats.checkpoint import Checkpoint, combine, match_digests
+from stats.players import Players
+from stats.teams import Teams
+
+
+def run(
+    league, directory, performances, teamperformances, name="test", force=False
+):
+    """Counts a payload through a checkpoint.
+
+    Returns:
+        tuple: matchIds counted, then the players, teams and champions
+            tables
+    """
+    players, teams, champions = (
+        Players(None, league.teams),
+        Teams(),
+        Champions(),
+    )
+    new = Checkpoint(name, str(directory)).apply(
+        lambda: iter(performances),
+        lambda: iter(teamperformances),
+        players,
+        teams,
+        champions,
+        force=force,
+        batch_size=37,
+    )
+    return new, players.dataframe(), teams.dataframe(), champions.dataframe()
+
+
+def assert_same(tables, expected):
+    # Teams keep the order they were first counted in
+    for table, full in zip(tables, expected):
+        pandas.testing.assert_frame_equal(
+            table.sort_values(list(table.columns[:3]), ignore_index=True),
+            full.sort_values(list(full.columns[:3]), ignore_index=True),
+        )
+
+
+def split(records, weeks):
+    """Returns the records of the matches of the first weeks."""
+    performances, teamperformances = records
+    early = {tp["matchId"] for tp in teamperformances if tp["week"] <= weeks}
+    return (
+        [p for p in performances if p["matchId"] in early],
+        [tp for tp in teamperformances if tp["matchId"] in early],
+    )
+
+
+@pytest.fixture
+def full(league, records, tmp_path):
+    _, *tables = run(league, tmp_path, *records, name="full", force=True)
+    return tables
+
+
+def test_counts_only_new_matches(league, records, full, tmp_path):
+    first = run(league, tmp_path, *split(records, 2))[0]
+    new, *tables = run(league, tmp_path, *records)
+    assert len(new) > 0 and new.isdisjoint(first)
+    assert new | first == {p["matchId"] for p in records[0]}
+    assert_same(tables, full)
+
+    new, *tables = run(league, tmp_path, *records)
+    assert new == set()
+    assert_same(tables, full)
+
+
+def test_corrected_match_is_recounted_alone(league, records, tmp_path, capsys):
+    run(league, tmp_path, *records)
+    performances = copy.deepcopy(records[0])
+    performances[3]["kills"] += 5
+    performances[3]["jgmins"] = 2.5
+    teamperformances = copy.deepcopy(records[1])
+    teamperformances[7]["bans"] = teamperformances[7]["bans"][1:]
+
+    new, *tables = run(league, tmp_path, performances, teamperformances)
+    assert new == {performances[3]["matchId"], teamperformances[7]["matchId"]}
+    out = capsys.readouterr().out
+    assert "Took 2 matches out" in out and "Rebuilding" not in out
+    _, *expected = run(
+        league,
+        tmp_path,
+        performances,
+        teamperformances,
+        name="full",
+        force=True,
+    )
+    assert_same(tables, expected)
+
+    # The log now holds the corrected rows, and they can be taken out too
+    new, *tables = run(league, tmp_path, *records)
+    assert new == {performances[3]["matchId"], teamperformances[7]["matchId"]}
+    _, *expected = run(league, tmp_path, *records, name="full", force=True)
+    assert_same(tables, expected)
+
+
+def test_missing_matches_are_taken_out(league, records, tmp_path, capsys):
+    run(league, tmp_path, *records)
+    early = split(records, 2)
+
+    new, *tables = run(league, tmp_path, *early)
+    assert new == set()
+    assert "Rebuilding" not in capsys.readouterr().out
+    _, *expected = run(league, tmp_path, *early, name="full", force=True)
+    assert_same(tables, expected)
+
+
+def test_lost_row_log_rebuilds(league, records, tmp_path, capsys):
+    run(league, tmp_path, *records)
+    (tmp_path / "testcheckpoint.rows").unlink()
+    performances = copy.deepcopy(records[0])
+    performances[3]["kills"] += 5
+
+    new, *tables = run(league, tmp_path, performances, records[1])
+    assert "Rebuilding" in capsys.readouterr().out
+    assert new == {p["matchId"] for p in performances}
+    _, *expected = run(
+        league, tmp_path, performances, records[1], name="full", force=True
+    )
+    assert_same(tables, expected)
+
+
+def test_high_water_mark(league, records, tmp_path):
+    run(league, tmp_path, *split(records, 2))
+    early = Checkpoint("test", str(tmp_path)).load()["newest"]
+    run(league, tmp_path, *records)
+    newest = Checkpoint("test", str(tmp_path)).load()["newest"]
+
+    assert early["week"] == 2 and newest["week"] == 3
+    last = max(
+        records[1], key=lambda tp: (tp["week"], tp["game"], tp["startTime"])
+    )
+    assert newest == {
+        "week": last["week"],
+        "game": last["game"],
+        "startTime": last["startTime"],
+        "matchId": last["matchId"],
+    }
+
+
+def test_digests_ignore_batches_and_column_order(store):
+    frame = store.teamperformances
+    whole = match_digests(frame)
+
+    parts = {}
+    for part in [frame.iloc[::2], frame.iloc[1::2]]:
+        combine(parts, match_digests(part[part.columns[::-1]]))
+    assert parts == whole
+
+    changed = frame.assign(k=frame["k"] + (frame.index == 0))
+    digests = match_digests(changed)
+    first = frame["matchId"].iloc[0]
+    assert digests[first] != whole[first]
+    assert {m: d for m, d in digests.items() if m != first} == {
+        m: d for m, d in whole.items() if m != first
+    }
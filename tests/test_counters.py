@@ -0,0 +1,81 @@
+import copy
+import numpy
+import pandas
+import pytest
+from stats.champions import Champions
+from stats.counters import CounterTable
+from stats.players import Players
+from stats.store import PerformanceStore
+from stats.stream import stream_league
+from stats.teams import Teams
+
+
+@pytest.fixture(scope="module")
+def fractional(records):
+    """The league's records with jgmins and time that are not whole."""
+    performances, teamperformances = copy.deepcopy(records)
+    for p in performances:
+        p["time"] += 0.3
+        if p["jgmins"] is not None:
+            p["jgmins"] += 0.6
+    for tp in teamperformances:
+        tp["time"] += 0.3
+    return performances, teamperformances
+
+
+def row_wise(league, performances, teamperformances):
+    """Builds every aggregator one add_performance call at a time."""
+    players = Players(None, league.teams)
+    for p in performances:
+        players.verify_player(p["puuid"], p["team"], p["role"])
+        players.add_performance(p)
+    teams = Teams()
+    for tp in teamperformances:
+        teams.verify_team(tp["team"])
+        teams.add_performance(tp)
+    return players, teams, Champions(performances, teamperformances)
+
+
+@pytest.mark.parametrize("data", ["records", "fractional"])
+def test_frames_match_row_wise(league, request, data):
+    performances, teamperformances = request.getfixturevalue(data)
+    expected = row_wise(league, performances, teamperformances)
+
+    store = PerformanceStore(performances, teamperformances)
+    batched = Players(None, league.teams), Teams(), Champions()
+    stream_league(performances, teamperformances, *batched, batch_size=7)
+    for built in [
+        (Players(store, league.teams), Teams(store), Champions(store)),
+        batched,
+    ]:
+        for aggregator, row in zip(built, expected):
+            pandas.testing.assert_frame_equal(
+                aggregator.dataframe(), row.dataframe()
+            )
+
+
+def test_fractional_counters_are_kept(league, fractional):
+    performances, teamperformances = fractional
+    teams = Teams(PerformanceStore(performances, teamperformances))
+    times = {}
+    for tp in teamperformances:
+        times[tp["team"]] = times.get(tp["team"], 0) + tp["time"]
+    for team, counters in teams.counters.to_dict().items():
+        assert counters["time"] == pytest.approx(times[team])
+        assert isinstance(counters["time"], float)
+        assert isinstance(counters["kills"], int)
+
+
+def test_counter_table_types():
+    table = CounterTable(["key"], ["whole", "fraction"])
+    positions = table.positions(["whole", "fraction"])
+    table.add(table.row("a", ("a",)), positions, (2, 10.6))
+    table.add_rows(
+        [table.row("b", ("b",))], positions, numpy.array([[3.0, 0.25]])
+    )
+    assert table.records() == [
+        {"key": "a", "whole": 2, "fraction": 10.6},
+        {"key": "b", "whole": 3, "fraction": 0.25},
+    ]
+    assert table.frame().dtypes.tolist()[1:] == ["int64", "float64"]
+    assert table.total("whole") == 5
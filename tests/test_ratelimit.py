@@ -0,0 +1,74 @@
+import pytest
+import stats.ratelimit as ratelimit
+from stats.ratelimit import RateLimiter, TokenBucket
+
+
+class Clock:
+    """Stands in for the time module of stats.ratelimit, sleeping
+    instantly."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit, "time", clock)
+    return clock
+
+
+# Limits are powers of two, so that the fake clock adds up exactly
+
+
+def test_bucket_allows_a_burst_then_the_rate(clock):
+    bucket = TokenBucket(4, 8)
+    for _ in range(4):
+        bucket.acquire()
+    assert clock.now == 1000.0
+
+    bucket.acquire()
+    assert clock.now == 1002.0
+    bucket.acquire()
+    assert clock.now == 1004.0
+
+
+def test_bucket_refills_up_to_capacity(clock):
+    bucket = TokenBucket(2, 2)
+    for _ in range(2):
+        bucket.acquire()
+    clock.now += 64
+    for _ in range(2):
+        bucket.acquire()
+    assert clock.now == 1064.0
+    bucket.acquire()
+    assert clock.now == 1065.0
+
+
+def test_limiter_waits_for_the_strictest_bucket(clock):
+    limiter = RateLimiter([(4, 1), (8, 16)])
+    for _ in range(4):
+        limiter.acquire()
+    assert clock.now == 1000.0
+    for _ in range(4):
+        limiter.acquire()
+    assert clock.now == 1001.0
+
+    # The second bucket has refilled half a token by now, and the other
+    # half takes another second after the first bucket lets this through
+    limiter.acquire()
+    assert clock.now == 1002.0
+
+
+def test_pause_holds_back_callers(clock):
+    limiter = RateLimiter([(4, 1)])
+    limiter.pause(32)
+    limiter.pause(4)
+    limiter.acquire()
+    assert clock.now == 1032.0
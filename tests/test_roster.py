@@ -0,0 +1,43 @@
+import time
+from stats.roster import Roster
+from stats.rosterstore import SqliteRosterStore
+
+
+def test_refresh_stale_is_capped_and_skips_errors(tmp_path, capsys):
+    store = SqliteRosterStore(
+        str(tmp_path / "rosters.db"), str(tmp_path / "rosters.json")
+    )
+    old = time.time() - 30 * 24 * 60 * 60
+    store.put_many(
+        [
+            (
+                f"p{i}",
+                {"summonerName": f"old {i}", "puuids": [f"p{i}"]},
+                old + i,
+            )
+            for i in range(5)
+        ]
+    )
+
+    def fetch_summoner(puuid):
+        if puuid == "p0":
+            raise RuntimeError("404 Not Found")
+        return f"new {puuid[1:]}"
+
+    roster = Roster(store=store)
+    roster.fetch_summoner = fetch_summoner
+    roster.refresh_stale(limit=3).join(10)
+
+    names = {
+        puuid: entry["summonerName"] for puuid, entry in store.load().items()
+    }
+    assert names == {
+        "p0": "old 0",
+        "p1": "new 1",
+        "p2": "new 2",
+        "p3": "old 3",
+        "p4": "old 4",
+    }
+    assert "Could not refresh p0: 404 Not Found" in capsys.readouterr().out
+    # The failed name stays stale for the next run
+    assert store.stale(24 * 60 * 60) == ["p0", "p3", "p4"]
@@ -0,0 +1,161 @@
+import json
+import random
+import pytest
+from pygsheets.utils import format_addr
+from stats import sheets
+from stats.ratelimit import RateLimiter
+from stats.sheets import SheetWriter, a1_range, rectangles, shrunk
+
+
+def covered(boxes):
+    cells = []
+    for (top, left), rows, cols in boxes:
+        cells.extend(
+            (row, col)
+            for row in range(top, top + rows)
+            for col in range(left, left + cols)
+        )
+    return cells
+
+
+def test_rectangles_join_runs_and_stack_rows():
+    cells = {(0, 0), (0, 1), (0, 2), (1, 0), (1, 1), (1, 2), (3, 5)}
+    assert rectangles(cells) == [((0, 0), 2, 3), ((3, 5), 1, 1)]
+
+
+def test_rectangles_split_on_gaps():
+    cells = {(0, 0), (0, 2), (1, 0), (2, 0)}
+    assert rectangles(cells) == [((0, 0), 3, 1), ((0, 2), 1, 1)]
+
+
+def test_rectangles_empty():
+    assert rectangles(set()) == []
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rectangles_cover_exactly_the_cells(seed):
+    rng = random.Random(seed)
+    cells = {
+        (row, col)
+        for row in range(30)
+        for col in range(12)
+        if rng.random() < 0.4
+    }
+    boxes = covered(rectangles(cells))
+    assert len(boxes) == len(set(boxes))
+    assert set(boxes) == cells
+
+
+def test_a1_range():
+    assert a1_range("Players", (1, 1), 2, 3) == "'Players'!A1:C2"
+    assert a1_range("Players", (10, 27), 1, 1) == "'Players'!AA10:AA10"
+    assert a1_range("Bob's", (1, 1), 0, 0) == "'Bob''s'!A1:A1"
+
+
+class Worksheet:
+    def __init__(self, title):
+        self.title = title
+
+
+class Spreadsheet:
+    """Applies batch updates to a dict of cells by (title, row, column)."""
+
+    id = "test"
+
+    def __init__(self):
+        self.cells = {}
+        self.written = []
+        spreadsheet = self
+
+        class Values:
+            def values_batch_update_by_data_filter(self, id, data, parse):
+                for write in data:
+                    title, label = write["dataFilter"]["a1Range"].split("!")
+                    top, left = format_addr(label.split(":")[0], "tuple")
+                    for i, row in enumerate(write["values"]):
+                        for j, value in enumerate(row):
+                            cell = (title.strip("'"), top + i, left + j)
+                            spreadsheet.cells[cell] = value
+                            spreadsheet.written.append(cell)
+
+        self.client = type("Client", (), {"sheet": Values()})()
+
+
+def publish(tmp_path, sheet, blocks, **kwargs):
+    writer = SheetWriter(
+        sheet,
+        directory=tmp_path,
+        limiter=RateLimiter([(100, 1)]),
+        **kwargs,
+    )
+    for start, values in blocks:
+        writer.set_values(Worksheet("Page"), start, values)
+    sheet.written = []
+    writer.flush()
+    return sheet.written
+
+
+def table(rows, cols, value="x"):
+    return [[f"{value}{i}{j}" for j in range(cols)] for i in range(rows)]
+
+
+def test_shrunk():
+    old = {"1:1": [3, 2], "1:5": [2, 2]}
+    assert shrunk(old, {(1, 1): (2, 1)}) == {(1, 2), (2, 2), (3, 1), (3, 2)}
+    assert shrunk(old, {(1, 1): (4, 3)}) == set()
+
+
+def test_unchanged_cells_are_not_written(tmp_path):
+    sheet = Spreadsheet()
+    publish(tmp_path, sheet, [((1, 1), table(3, 2))])
+    values = table(3, 2)
+    values[1][1] = "changed"
+    written = publish(tmp_path, sheet, [((1, 1), values)])
+    assert written == [("Page", 2, 2)]
+
+
+def test_shrinking_table_clears_the_rows_left_over(tmp_path):
+    sheet = Spreadsheet()
+    publish(tmp_path, sheet, [((1, 1), table(4, 3)), ((1, 6), table(2, 1))])
+    publish(tmp_path, sheet, [((1, 1), table(2, 2)), ((1, 6), table(2, 1))])
+    expected = {
+        ("Page", row + 1, col + 1): "" if row >= 2 or col >= 2 else value
+        for row, values in enumerate(table(4, 3))
+        for col, value in enumerate(values)
+    }
+    assert {k: v for k, v in sheet.cells.items() if k[2] <= 3} == expected
+    assert sheet.cells[("Page", 2, 6)] == "x10"
+
+    # The cleared cells are published, so they are not cleared again
+    assert publish(tmp_path, sheet, [((1, 1), table(2, 2))]) == []
+
+
+def test_full_write_on_request(tmp_path):
+    sheet = Spreadsheet()
+    publish(tmp_path, sheet, [((1, 1), table(2, 2))])
+    sheet.cells[("Page", 1, 1)] = "edited by hand"
+    assert publish(tmp_path, sheet, [((1, 1), table(2, 2))]) == []
+    assert len(publish(tmp_path, sheet, [((1, 1), table(2, 2))], full=True))
+    assert sheet.cells[("Page", 1, 1)] == "x00"
+
+
+def test_full_write_after_a_while(tmp_path, monkeypatch):
+    sheet = Spreadsheet()
+    publish(tmp_path, sheet, [((1, 1), table(2, 2))])
+    assert publish(tmp_path, sheet, [((1, 1), table(2, 2))]) == []
+    after = sheets.FULL_WRITE_AFTER
+    monkeypatch.setattr(sheets, "FULL_WRITE_AFTER", -1)
+    assert len(publish(tmp_path, sheet, [((1, 1), table(2, 2))])) == 4
+    monkeypatch.setattr(sheets, "FULL_WRITE_AFTER", after)
+    assert publish(tmp_path, sheet, [((1, 1), table(2, 2))]) == []
+
+
+@pytest.mark.parametrize("cache", ["{not json", '{"Page": {"1:1": "x00"}}'])
+def test_unreadable_or_outdated_cache_writes_in_full(tmp_path, cache):
+    sheet = Spreadsheet()
+    publish(tmp_path, sheet, [((1, 1), table(2, 2))])
+    with open(tmp_path / "sheets-test.json", "w") as f:
+        f.write(cache)
+    assert len(publish(tmp_path, sheet, [((1, 1), table(2, 2))])) == 4
+    with open(tmp_path / "sheets-test.json") as f:
+        assert json.load(f)["version"] == sheets.PUBLISHED_VERSION
@@ -0,0 +1,76 @@
+import json
+import pandas
+import pytest
+from stats.champions import Champions
+from stats.players import Players
+from stats.stream import batched, iter_array, stream_league, stream_records
+from stats.teams import Teams
+
+PAYLOAD = [
+    {"matchId": "NA1_1", "name": "Zoë", "kills": 12, "time": 1834.5},
+    {"text": 'brackets ] [ and "quotes", commas', "none": None},
+    [1, [2, [3]], {"a": []}],
+    -7,
+    "naïve ✓",
+    {},
+]
+
+
+def split(data: bytes, size: int) -> list[bytes]:
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 64, 1 << 16])
+def test_iter_array_splits_anywhere(size):
+    data = json.dumps(PAYLOAD, ensure_ascii=False, indent=1).encode()
+    assert list(iter_array(split(data, size))) == PAYLOAD
+
+
+def test_iter_array_keeps_numbers_split_across_chunks():
+    assert list(iter_array([b"[12", b"34, 5", b".25]"])) == [1234, 5.25]
+
+
+def test_iter_array_empty():
+    assert list(iter_array([b" [ ", b"] "])) == []
+
+
+@pytest.mark.parametrize("data", [b'{"a": 1}', b"[1, 2", b'[{"a": 1}'])
+def test_iter_array_rejects_bad_payloads(data):
+    with pytest.raises(ValueError):
+        list(iter_array(split(data, 2)))
+
+
+def test_stream_records_reads_cache(tmp_path, records):
+    performances, _ = records
+    filename = tmp_path / "performances.json"
+    filename.write_text(json.dumps(performances))
+    assert list(stream_records(None, str(filename))) == performances
+
+
+def test_batched_keeps_matches_together(records):
+    performances, _ = records
+    batches = list(batched(performances, 7))
+    assert sum(batches, []) == performances
+    for before, after in zip(batches, batches[1:]):
+        assert len(before) >= 7
+        assert before[-1]["matchId"] != after[0]["matchId"]
+
+
+@pytest.mark.parametrize("batch_size", [1, 37, 100000])
+def test_stream_matches_full_ingest(league, records, store, batch_size):
+    players, teams, champions = (
+        Players(None, league.teams),
+        Teams(),
+        Champions(),
+    )
+    stream_league(*records, players, teams, champions, batch_size)
+
+    pandas.testing.assert_frame_equal(
+        players.dataframe(), Players(store, league.teams).dataframe()
+    )
+    pandas.testing.assert_frame_equal(
+        teams.dataframe(), Teams(store).dataframe()
+    )
+    pandas.testing.assert_frame_equal(
+        champions.dataframe(), Champions(store).dataframe()
+    )
@@ -0,0 +1,97 @@
+import threading
+import httplib2
+import pygsheets
+import pytest
+from googleapiclient.errors import HttpError
+from stats.__main__ import update_teampages
+from stats.players import Players
+from stats.ratelimit import RateLimiter
+from stats.sheets import SheetWriter
+from stats.teampage import TeamPage
+
+
+class Worksheet:
+    def __init__(self, title):
+        self.title = title
+
+
+class Spreadsheet:
+    """Records which threads touch pygsheets, and the batch updates."""
+
+    id = "test"
+
+    def __init__(self, titles, writes=None):
+        self.titles = titles
+        self.threads = []
+        self.batches = []
+        self.writes = writes or (lambda: None)
+        spreadsheet = self
+
+        class Values:
+            def values_batch_update_by_data_filter(self, id, data, parse):
+                spreadsheet.writes()
+                spreadsheet.batches.append(data)
+
+        self.client = type("Client", (), {"sheet": Values()})()
+
+    def worksheets(self, sheet_property=None, value=None):
+        self.threads.append(threading.current_thread())
+        if sheet_property is None:
+            return [Worksheet(title) for title in self.titles]
+        if value not in self.titles:
+            raise pygsheets.exceptions.WorksheetNotFound()
+        return [Worksheet(value)]
+
+    def worksheet_by_title(self, title):
+        return self.worksheets("title", title)[0]
+
+
+def test_worksheets_are_resolved_before_rendering(league, store, capsys):
+    names = [team["name"] for team in league.teams]
+    sheet = Spreadsheet(names[1:])
+    update_teampages(
+        TeamPage(store, teams=league.teams),
+        Players(store, league.teams),
+        sheet,
+        workers=4,
+    )
+
+    assert set(sheet.threads) == {threading.main_thread()}
+    assert f"No template page found for {names[0]}" in capsys.readouterr().out
+    titles = {
+        write["dataFilter"]["a1Range"].split("!")[0].strip("'")
+        for batch in sheet.batches
+        for write in batch
+    }
+    assert titles == set(names[1:])
+
+
+def test_quota_errors_are_retried():
+    attempts = []
+
+    def writes():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise HttpError(
+                httplib2.Response({"status": 429, "retry-after": "0"}), b""
+            )
+
+    sheet = Spreadsheet(["Page"], writes)
+    writer = SheetWriter(sheet, diff=False, limiter=RateLimiter([(100, 1)]))
+    writer.set_value(Worksheet("Page"), (1, 1), "x")
+    assert writer.flush() == 1
+    assert len(attempts) == 3 and len(sheet.batches) == 1
+
+
+def test_other_errors_are_raised():
+    def writes():
+        raise HttpError(httplib2.Response({"status": 400}), b"")
+
+    writer = SheetWriter(
+        Spreadsheet(["Page"], writes),
+        diff=False,
+        limiter=RateLimiter([(100, 1)]),
+    )
+    writer.set_value(Worksheet("Page"), (1, 1), "x")
+    with pytest.raises(HttpError):
+        writer.flush()